@@ -0,0 +1,150 @@
+"""In-memory stand-in for the Sheets ``spreadsheets.values`` endpoints.
+
+``FakeSheetsService`` mimics the googleapiclient resource used by
+GoogleSheetsClient (get / append / update / batchUpdate), so
+``BenchSheetsClient`` runs the real client code (write-behind batching,
+retries) against it. Every executed request counts as one Sheets call and
+can be slowed down or failed with a retryable HTTP 503.
+"""
+import random
+import re
+import threading
+import time
+from typing import Optional, Dict, Any, List, Tuple, Callable
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+from google_sheets_client import GoogleSheetsClient
+
+_A1 = re.compile(r"^(?P<c1>[A-Z]+)(?P<r1>\d*)(?::(?P<c2>[A-Z]+)(?P<r2>\d*))?$")
+
+
+def _col(letters: str) -> int:
+    n = 0
+    for ch in letters:
+        n = n * 26 + ord(ch) - 64
+    return n - 1
+
+
+def parse_range(range_: str) -> Tuple[str, int, Optional[int], int, Optional[int]]:
+    """'tab!B2:D' -> (tab, first_row0, last_row0 or None, first_col0, last_col0 or None)."""
+    sheet, a1 = range_.split("!", 1)
+    m = _A1.match(a1)
+    if not m:
+        raise ValueError(f"Unsupported range {range_}")
+    r1 = int(m.group("r1")) - 1 if m.group("r1") else 0
+    c1 = _col(m.group("c1"))
+    if m.group("c2") is None:
+        # Single cell, or a whole column when no row was given.
+        r2 = r1 if m.group("r1") else None
+        return sheet, r1, r2, c1, c1
+    r2 = int(m.group("r2")) - 1 if m.group("r2") else None
+    return sheet, r1, r2, c1, _col(m.group("c2"))
+
+
+class _Request:
+    def __init__(self, service: "FakeSheetsService", name: str, fn: Callable[[], Dict[str, Any]]) -> None:
+        self.service = service
+        self.name = name
+        self.fn = fn
+
+    def execute(self, http: Any = None) -> Dict[str, Any]:
+        return self.service.run(self.name, self.fn)
+
+
+class FakeSheetsService:
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.sheets: Dict[str, List[List[Any]]] = {}
+        self.calls: Dict[str, int] = {}
+        self.injected_errors = 0
+        self._lock = threading.Lock()
+
+    def run(self, name: str, fn: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        if self.latency or self.jitter:
+            time.sleep(self.latency + random.uniform(0, self.jitter))
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+            if self.error_rate and random.random() < self.error_rate:
+                self.injected_errors += 1
+                raise HttpError(httplib2.Response({"status": "503"}), b"backend error")
+            return fn()
+
+    def total_calls(self) -> int:
+        with self._lock:
+            return sum(self.calls.values())
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.calls = {}
+            self.injected_errors = 0
+
+    # --- googleapiclient resource shape ------------------------------------
+
+    def spreadsheets(self) -> "FakeSheetsService":
+        return self
+
+    def values(self) -> "FakeSheetsService":
+        return self
+
+    def get(self, spreadsheetId: str, range: str) -> _Request:  # noqa: A002
+        def run() -> Dict[str, Any]:
+            sheet, r1, r2, c1, c2 = parse_range(range)
+            rows = self.sheets.get(sheet, [])
+            end = len(rows) if r2 is None else r2 + 1
+            values = [list(row[c1:(None if c2 is None else c2 + 1)]) for row in rows[r1:end]]
+            while values and not any(values[-1]):
+                values.pop()
+            return {"range": range, "values": values} if values else {"range": range}
+
+        return _Request(self, "get", run)
+
+    def append(self, spreadsheetId: str, range: str, valueInputOption: str, insertDataOption: str, body: Dict[str, Any]) -> _Request:  # noqa: A002
+        def run() -> Dict[str, Any]:
+            sheet = range.split("!", 1)[0]
+            rows = self.sheets.setdefault(sheet, [])
+            first = len(rows) + 1
+            rows.extend(list(v) for v in body["values"])
+            return {"updates": {"updatedRange": f"{sheet}!A{first}:Z{len(rows)}"}}
+
+        return _Request(self, "append", run)
+
+    def _write(self, range_: str, values: List[List[Any]]) -> None:
+        sheet, r1, _, c1, _ = parse_range(range_)
+        rows = self.sheets.setdefault(sheet, [])
+        for offset, new in enumerate(values):
+            while len(rows) <= r1 + offset:
+                rows.append([])
+            row = rows[r1 + offset]
+            while len(row) < c1 + len(new):
+                row.append("")
+            row[c1:c1 + len(new)] = list(new)
+
+    def update(self, spreadsheetId: str, range: str, valueInputOption: str, body: Dict[str, Any]) -> _Request:  # noqa: A002
+        def run() -> Dict[str, Any]:
+            self._write(range, body["values"])
+            return {"updatedRange": range}
+
+        return _Request(self, "update", run)
+
+    def batchUpdate(self, spreadsheetId: str, body: Dict[str, Any]) -> _Request:
+        def run() -> Dict[str, Any]:
+            for item in body["data"]:
+                self._write(item["range"], item["values"])
+            return {"totalUpdatedRows": len(body["data"])}
+
+        return _Request(self, "batchUpdate", run)
+
+
+class BenchSheetsClient(GoogleSheetsClient):
+    """The real GoogleSheetsClient wired to a FakeSheetsService."""
+
+    def __init__(self, service: FakeSheetsService, **kwargs: Any) -> None:
+        super().__init__(spreadsheet_id="bench", credentials_file="", **kwargs)
+        self._service_obj = service
+
+    def _http(self) -> Any:
+        return None
@@ -0,0 +1,168 @@
+"""Local stand-in for the Telegram Bot API.
+
+Serves ``/bot<token>/<method>`` for the methods the bot uses. Updates are
+queued with ``push_update`` and handed out by ``getUpdates`` honouring the
+offset. Every other call is recorded with its arrival time, so a driver can
+measure how long the bot took to answer each update. Latency and errors
+(429 with retry_after, or 500) can be injected per call.
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Dict, Any, List, Tuple
+from urllib.parse import parse_qs, urlparse
+
+# Calls that answer an update; used to match replies to injected updates.
+REPLY_METHODS = ("sendMessage", "sendPhoto", "setMessageReaction", "answerCallbackQuery")
+
+
+class FakeTelegram:
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        retry_after: int = 1,
+        bot_id: int = 1000,
+        bot_username: str = "bench_bot",
+    ) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.bot_info = {"id": bot_id, "is_bot": True, "username": bot_username}
+        self._updates: List[Dict[str, Any]] = []
+        self._next_update_id = 1
+        self._cond = threading.Condition()
+        self._lock = threading.Lock()
+        self._file_ids = 0
+        # (method, chat_id, monotonic arrival time)
+        self.calls: List[Tuple[str, str, float]] = []
+        self.injected_errors = 0
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    # --- driver API ---------------------------------------------------------
+
+    def push_update(self, update: Dict[str, Any]) -> float:
+        """Queue an update for getUpdates; returns its enqueue time."""
+        with self._cond:
+            update = dict(update, update_id=self._next_update_id)
+            self._next_update_id += 1
+            self._updates.append(update)
+            self._cond.notify_all()
+        return time.monotonic()
+
+    def reply_calls(self) -> List[Tuple[str, str, float]]:
+        with self._lock:
+            return [c for c in self.calls if c[0] in REPLY_METHODS]
+
+    def method_counts(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        with self._lock:
+            for method, _, _ in self.calls:
+                counts[method] = counts.get(method, 0) + 1
+        return counts
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.calls = []
+            self.injected_errors = 0
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Serve in a background thread; returns the API root URL."""
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+                pass
+
+            def do_GET(self) -> None:
+                url = urlparse(self.path)
+                self._dispatch(url.path, {k: v[0] for k, v in parse_qs(url.query).items()})
+
+            def do_POST(self) -> None:
+                url = urlparse(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                content_type = self.headers.get("Content-Type", "")
+                params: Dict[str, Any] = {}
+                if content_type.startswith("application/json") and body:
+                    params = json.loads(body)
+                elif content_type.startswith("application/x-www-form-urlencoded"):
+                    params = {k: v[0] for k, v in parse_qs(body.decode()).items()}
+                elif content_type.startswith("multipart/form-data"):
+                    # Good enough for the bench: only chat_id matters.
+                    marker = b'name="chat_id"\r\n\r\n'
+                    if marker in body:
+                        params["chat_id"] = body.split(marker, 1)[1].split(b"\r\n", 1)[0].decode()
+                params.update({k: v[0] for k, v in parse_qs(url.query).items()})
+                self._dispatch(url.path, params)
+
+            def _dispatch(self, path: str, params: Dict[str, Any]) -> None:
+                method = path.rstrip("/").rsplit("/", 1)[-1]
+                status, payload = fake.handle(method, params)
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="fake-telegram", daemon=True).start()
+        return f"http://{host}:{self._server.server_address[1]}"
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    # --- Bot API ------------------------------------------------------------
+
+    def handle(self, method: str, params: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        if method == "getUpdates":
+            return 200, {"ok": True, "result": self._get_updates(params)}
+        if method == "getMe":
+            return 200, {"ok": True, "result": self.bot_info}
+
+        if self.latency or self.jitter:
+            time.sleep(self.latency + random.uniform(0, self.jitter))
+        if self.error_rate and random.random() < self.error_rate:
+            with self._lock:
+                self.injected_errors += 1
+            if random.random() < 0.5:
+                return 429, {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": "Too Many Requests",
+                    "parameters": {"retry_after": self.retry_after},
+                }
+            return 500, {"ok": False, "error_code": 500, "description": "Internal Server Error"}
+
+        with self._lock:
+            self.calls.append((method, str(params.get("chat_id", "")), time.monotonic()))
+        if method == "sendPhoto":
+            with self._lock:
+                self._file_ids += 1
+                file_id = f"bench-file-{self._file_ids}"
+            return 200, {"ok": True, "result": {"message_id": 1, "photo": [{"file_id": file_id}]}}
+        if method == "sendMessage":
+            return 200, {"ok": True, "result": {"message_id": 1, "text": params.get("text", "")}}
+        return 200, {"ok": True, "result": True}
+
+    def _get_updates(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        offset = int(params.get("offset") or 0)
+        # Long poll, but return quickly so the bench can shut down.
+        timeout = min(float(params.get("timeout") or 0), 0.5)
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                ready = [u for u in self._updates if u["update_id"] >= offset]
+                if ready or time.monotonic() >= deadline:
+                    # Updates below the offset were confirmed; forget them.
+                    self._updates = ready
+                    return ready[:100]
+                self._cond.wait(deadline - time.monotonic())
@@ -0,0 +1,310 @@
+"""Throughput/latency benchmark for bot_polling.py and daily_broadcast.py.
+
+Runs the real bot and broadcast code against bench/fake_telegram.py (over
+HTTP) and bench/fake_sheets.py (in-process), then reports p50/p95/p99
+latency, updates/sec and Sheets calls per update for each scenario:
+
+- next_storm: many private chats send /start_john and then /next a few times
+- group_chat: members of one busy group reply to the bot (reaction + link)
+- broadcast:  daily_broadcast to N groups under the Telegram rate limits
+
+    python bench/run_bench.py
+    python bench/run_bench.py --scenario next_storm --users 500 --tg-latency 0.05
+    python bench/run_bench.py --scenario broadcast --groups 500 --json out.json
+"""
+import argparse
+import datetime
+import json
+import logging
+import math
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Optional, Dict, Any, List, Tuple, Deque
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), "src"))
+sys.path.insert(0, HERE)
+
+from fake_telegram import FakeTelegram  # noqa: E402
+
+SCENARIOS = ("next_storm", "group_chat", "broadcast")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=SCENARIOS + ("all",), default="all")
+    parser.add_argument("--users", type=int, default=200, help="next_storm: private chats")
+    parser.add_argument("--rounds", type=int, default=3, help="next_storm: /next per user")
+    parser.add_argument("--members", type=int, default=50, help="group_chat: group members")
+    parser.add_argument("--messages", type=int, default=500, help="group_chat: messages sent")
+    parser.add_argument("--groups", type=int, default=500, help="broadcast: groups")
+    parser.add_argument("--workers", type=int, default=4, help="BOT_WORKERS")
+    parser.add_argument("--storage", choices=("sheets", "sqlite"), default="sheets")
+    parser.add_argument("--tg-latency", type=float, default=0.02, help="seconds per Telegram call")
+    parser.add_argument("--tg-jitter", type=float, default=0.01)
+    parser.add_argument("--tg-error-rate", type=float, default=0.0)
+    parser.add_argument("--sheets-latency", type=float, default=0.15, help="seconds per Sheets call")
+    parser.add_argument("--sheets-jitter", type=float, default=0.05)
+    parser.add_argument("--sheets-error-rate", type=float, default=0.0)
+    parser.add_argument("--global-rate", type=float, default=30, help="broadcast: messages/s overall")
+    parser.add_argument("--timeout", type=float, default=300, help="per-scenario timeout in seconds")
+    parser.add_argument("--json", help="also write the report to this file")
+    parser.add_argument("--log-level", default="WARNING")
+    return parser.parse_args()
+
+
+def configure_env(api_root: str, args: argparse.Namespace, data_dir: str) -> None:
+    """Settings must be in the environment before config is imported."""
+    os.environ.update(
+        {
+            "TELEGRAM_BOT_TOKEN": "bench",
+            "SPREADSHEET_ID": "bench",
+            "TELEGRAM_API_ROOT": api_root,
+            "DATA_DIR": data_dir,
+            "POLL_TIMEOUT_SECONDS": "1",
+            "BOT_WORKERS": str(args.workers),
+            "STORAGE_BACKEND": args.storage,
+            "SQLITE_PATH": os.path.join(data_dir, "bench.sqlite3"),
+            # Measure real Sheets reads instead of disk snapshots.
+            "PLAN_SNAPSHOT_DIR": "",
+            "RETRY_BASE_DELAY_SECONDS": "0.05",
+            "TELEGRAM_GLOBAL_RATE": str(args.global_rate),
+        }
+    )
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    # Nearest-rank percentile.
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def seed_sheets(service: Any, members: int) -> None:
+    service.sheets["plan"] = [["Day", "Ref", "Title", "Verse_Text", "Image_URL"]] + [
+        [str(day), f"요한복음 {day}장", f"Title {day}", f"Verse {day}", ""] for day in range(1, 67)
+    ]
+    service.sheets["progress"] = [["user_id", "username", "current_day", "last_read_at", "group_ids"]]
+    service.sheets["groups"] = [["chat_id", "plan_sheet", "start_date", "timezone", "notification_time"]]
+    service.sheets["logs"] = [["ts", "chat_id", "chat_type", "username", "command", "status", "note"]]
+    # Part of the group is already linked, as in a long-running chat.
+    for i in range(members // 2):
+        service.sheets["progress"].append([str(20000 + i), f"member{i}", "3", "", "-100999"])
+
+
+def private_message(chat_id: int, text: str) -> Dict[str, Any]:
+    return {
+        "message": {
+            "message_id": 1,
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "username": f"user{chat_id}"},
+            "text": text,
+        }
+    }
+
+
+def group_reply(group_id: int, user_id: int, bot_info: Dict[str, Any], message_id: int) -> Dict[str, Any]:
+    return {
+        "message": {
+            "message_id": message_id,
+            "chat": {"id": group_id, "type": "supergroup"},
+            "from": {"id": user_id, "is_bot": False, "username": f"member{user_id}"},
+            "text": "아멘",
+            "reply_to_message": {"message_id": 1, "from": bot_info},
+        }
+    }
+
+
+def match_latencies(sent: Dict[str, Deque[float]], replies: List[Tuple[str, str, float]]) -> List[float]:
+    """Pair each chat's replies with its updates in order."""
+    latencies = []
+    for _, chat_id, at in sorted(replies, key=lambda r: r[2]):
+        queue = sent.get(chat_id)
+        if queue:
+            latencies.append(at - queue.popleft())
+    return latencies
+
+
+def summarize(name: str, count: int, elapsed: float, latencies: List[float], sheets_calls: int,
+              telegram: FakeTelegram, sheets: Any) -> Dict[str, Any]:
+    return {
+        "scenario": name,
+        "updates": count,
+        "answered": len(latencies),
+        "seconds": round(elapsed, 3),
+        "per_second": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "sheets_calls": sheets_calls,
+        "sheets_calls_per_update": round(sheets_calls / count, 3) if count else 0.0,
+        "telegram_calls": telegram.method_counts(),
+        "injected_errors": {"telegram": telegram.injected_errors, "sheets": sheets.injected_errors},
+    }
+
+
+def run_bot_scenario(name: str, args: argparse.Namespace, telegram: FakeTelegram, make_updates: Any) -> Dict[str, Any]:
+    import config
+    import bot_polling
+    from fake_sheets import FakeSheetsService, BenchSheetsClient
+    from retry import RetryPolicy
+
+    service = FakeSheetsService(args.sheets_latency, args.sheets_jitter, args.sheets_error_rate)
+    seed_sheets(service, args.members)
+
+    class BenchBot(bot_polling.BotPolling):
+        stopped = threading.Event()
+
+        @staticmethod
+        def _build_sheets_client(spreadsheet_id: Optional[str] = None) -> BenchSheetsClient:
+            return BenchSheetsClient(
+                service,
+                retry_policy=RetryPolicy(base_delay=config.RETRY_BASE_DELAY, deadline=config.SHEETS_CALL_DEADLINE),
+                write_behind=config.SHEETS_WRITE_BEHIND,
+                flush_interval=config.SHEETS_FLUSH_INTERVAL,
+                batch_size=config.SHEETS_BATCH_SIZE,
+                max_pending=config.SHEETS_MAX_PENDING_WRITES,
+            )
+
+        def get_updates(self) -> list:
+            if self.stopped.is_set():
+                raise SystemExit
+            return super().get_updates()
+
+    bot = BenchBot()
+    # Steady state: the plan and indexes are loaded before the clock starts.
+    bot.plan_repo.ensure_loaded()
+    bot.progress_repo.ensure_loaded()
+    telegram.reset_stats()
+    service.reset_stats()
+    poller = threading.Thread(target=bot.poll, name="bench-poll", daemon=True)
+    poller.start()
+
+    updates = make_updates(telegram.bot_info)
+    sent: Dict[str, Deque[float]] = defaultdict(deque)
+    started = time.monotonic()
+    for chat_id, update in updates:
+        sent[str(chat_id)].append(telegram.push_update(update))
+    deadline = started + args.timeout
+    while len(telegram.reply_calls()) < len(updates) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    elapsed = time.monotonic() - started
+
+    BenchBot.stopped.set()
+    poller.join(timeout=5)
+    if bot.dispatcher:
+        bot.dispatcher.close()
+    bot.close_storage()
+    latencies = match_latencies(sent, telegram.reply_calls())
+    return summarize(name, len(updates), elapsed, latencies, service.total_calls(), telegram, service)
+
+
+def next_storm(args: argparse.Namespace) -> Any:
+    def make(bot_info: Dict[str, Any]) -> List[Tuple[int, Dict[str, Any]]]:
+        updates = []
+        for command in ["/start_john"] + ["/next"] * args.rounds:
+            for i in range(args.users):
+                chat_id = 10000 + i
+                updates.append((chat_id, private_message(chat_id, command)))
+        return updates
+
+    return make
+
+
+def group_chat(args: argparse.Namespace) -> Any:
+    def make(bot_info: Dict[str, Any]) -> List[Tuple[int, Dict[str, Any]]]:
+        group_id = -100999
+        return [
+            (group_id, group_reply(group_id, 20000 + (i % args.members), bot_info, 100 + i))
+            for i in range(args.messages)
+        ]
+
+    return make
+
+
+def run_broadcast_scenario(args: argparse.Namespace, telegram: FakeTelegram) -> Dict[str, Any]:
+    import config
+    import daily_broadcast
+    from fake_sheets import FakeSheetsService, BenchSheetsClient
+    from rate_limiter import TelegramRateLimiter
+    from retry import RetryPolicy
+
+    service = FakeSheetsService(args.sheets_latency, args.sheets_jitter, args.sheets_error_rate)
+    seed_sheets(service, 0)
+    start_date = (datetime.date.today() - datetime.timedelta(days=4)).isoformat()
+    for i in range(args.groups):
+        service.sheets["groups"].append([str(-200000 - i), "plan", start_date, "Asia/Seoul", "08:00"])
+    client = BenchSheetsClient(service, retry_policy=RetryPolicy(base_delay=config.RETRY_BASE_DELAY))
+    if config.STORAGE_BACKEND == "sqlite":
+        # Give load_groups a fresh database; its first call imports the fake
+        # groups sheet, so do that once outside the measurement.
+        config.SQLITE_PATH = os.path.join(config.DATA_DIR, "broadcast.sqlite3")
+        daily_broadcast.load_groups(client)
+    service.reset_stats()
+    telegram.reset_stats()
+
+    started = time.monotonic()
+    groups = daily_broadcast.load_groups(client)
+    plan_repos: Dict[str, Any] = {}
+    today = daily_broadcast._now()
+    jobs = [job for job in (daily_broadcast.prepare_job(g, today, client, plan_repos, force_send=True) for g in groups) if job]
+    limiter = TelegramRateLimiter(
+        global_rate=config.TELEGRAM_GLOBAL_RATE,
+        per_chat_rate=config.TELEGRAM_CHAT_RATE,
+        per_group_per_minute=config.TELEGRAM_GROUP_PER_MINUTE,
+    )
+    results = daily_broadcast.run_broadcast(jobs, limiter, workers=config.BROADCAST_WORKERS)
+    elapsed = time.monotonic() - started
+    latencies = [r["elapsed"] for r in results if r["status"] == "sent"]
+    report = summarize("broadcast", len(groups), elapsed, latencies, service.total_calls(), telegram, service)
+    report["failed"] = sum(1 for r in results if r["status"] == "failed")
+    return report
+
+
+def print_report(reports: List[Dict[str, Any]]) -> None:
+    header = f"{'scenario':<12}{'updates':>9}{'answered':>10}{'secs':>9}{'per_s':>9}{'p50ms':>9}{'p95ms':>9}{'p99ms':>9}{'sheets':>8}{'sh/upd':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in reports:
+        print(
+            f"{r['scenario']:<12}{r['updates']:>9}{r['answered']:>10}{r['seconds']:>9}{r['per_second']:>9}"
+            f"{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}{r['sheets_calls']:>8}{r['sheets_calls_per_update']:>8}"
+        )
+    for r in reports:
+        print(f"{r['scenario']}: telegram calls {r['telegram_calls']}, injected errors {r['injected_errors']}")
+
+
+def main() -> None:
+    args = parse_args()
+    telegram = FakeTelegram(args.tg_latency, args.tg_jitter, args.tg_error_rate)
+    api_root = telegram.start()
+    data_dir = tempfile.mkdtemp(prefix="bench-")
+    configure_env(api_root, args, data_dir)
+    logging.basicConfig(level=args.log_level)
+    logging.getLogger().setLevel(args.log_level)
+
+    scenarios = SCENARIOS if args.scenario == "all" else (args.scenario,)
+    reports = []
+    for name in scenarios:
+        if name == "next_storm":
+            reports.append(run_bot_scenario(name, args, telegram, next_storm(args)))
+        elif name == "group_chat":
+            reports.append(run_bot_scenario(name, args, telegram, group_chat(args)))
+        else:
+            reports.append(run_broadcast_scenario(args, telegram))
+    telegram.stop()
+
+    print_report(reports)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
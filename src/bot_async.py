@@ -0,0 +1,165 @@
+"""asyncio engine for the polling bot (BOT_ENGINE=async).
+
+The long poll and every Telegram call go through one pooled
+``httpx.AsyncClient`` on the event loop. Handlers keep their blocking
+Sheets access, so each update runs in a worker thread via
+``asyncio.to_thread``; updates from the same chat are serialized with a
+per-chat lock and at most ``BOT_WORKERS`` updates run at once. Messages sent
+by a handler are awaited (the handler needs their outcome), while typing
+indicators, callback answers and reactions are scheduled on the loop and
+never awaited inline.
+"""
+import asyncio
+import logging
+import time
+from typing import Optional, Dict, Any, Set
+
+try:
+    import httpx
+except ImportError:  # optional dependency, only needed for this engine
+    httpx = None  # type: ignore
+
+import config
+import constants
+import metrics
+from bot_polling import BotPolling, POLL_TIMEOUT
+
+
+class AsyncBotPolling(BotPolling):
+    use_dispatcher = False
+
+    def __init__(self) -> None:
+        if httpx is None:
+            raise RuntimeError("BOT_ENGINE=async requires httpx (pip install httpx)")
+        super().__init__()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client: Optional["httpx.AsyncClient"] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._chat_locks: Dict[str, asyncio.Lock] = {}
+        self._chat_waiting: Dict[str, int] = {}
+        # Touched only on the loop thread; worker threads go through _fire.
+        self._background: Set["asyncio.Task[Any]"] = set()
+
+    # --- transport ----------------------------------------------------------
+
+    async def _call(self, method: str, payload: Dict[str, Any], check: bool = True) -> Dict[str, Any]:
+        assert self._client is not None
+        started = time.perf_counter()
+        try:
+            response = await self._client.post(f"{config.TELEGRAM_API_BASE_URL}/{method}", json=payload)
+        except Exception as exc:
+            metrics.registry.inc("telegram_errors_total", method=method, error=type(exc).__name__)
+            raise
+        finally:
+            metrics.registry.observe("telegram_request_seconds", time.perf_counter() - started, method=method)
+        if response.status_code >= 400:
+            metrics.registry.inc("telegram_errors_total", method=method, error=str(response.status_code))
+        if check:
+            response.raise_for_status()
+        return response.json()
+
+    def _fire(self, method: str, payload: Dict[str, Any]) -> None:
+        """Schedule a side call on the loop without waiting for it."""
+
+        async def run() -> None:
+            try:
+                await self._call(method, payload, check=False)
+            except Exception:
+                logging.warning("%s failed", method, exc_info=True)
+
+        # Handlers run in to_thread workers, so hand the task over to the loop
+        # thread rather than touching _background from here.
+        self._loop.call_soon_threadsafe(self._spawn, run())
+
+    def send_message(self, chat_id: int, text: str, reply_markup: Optional[Dict[str, Any]] = None) -> None:
+        payload: Dict[str, Any] = {"chat_id": chat_id, "text": text, "parse_mode": "HTML"}
+        if reply_markup is not None:
+            payload["reply_markup"] = reply_markup
+        # Called from a handler thread: run the send on the loop and wait for it.
+        asyncio.run_coroutine_threadsafe(self._call("sendMessage", payload), self._loop).result()
+
+    def send_typing(self, chat_id: int) -> None:
+        self._fire("sendChatAction", {"chat_id": chat_id, "action": "typing"})
+
+    def answer_callback_query(self, callback_query_id: str, text: str = "") -> None:
+        payload: Dict[str, Any] = {"callback_query_id": callback_query_id}
+        if text:
+            payload["text"] = text
+        self._fire("answerCallbackQuery", payload)
+
+    def set_message_reaction(self, chat_id: str, message_id: int, emoji: str = constants.EMOJI_REACTION) -> None:
+        self._fire(
+            "setMessageReaction",
+            {"chat_id": chat_id, "message_id": message_id, "reaction": [{"type": "emoji", "emoji": emoji}]},
+        )
+
+    # --- engine -------------------------------------------------------------
+
+    async def get_updates_async(self) -> list:
+        assert self._client is not None
+        params: Dict[str, Any] = {"timeout": POLL_TIMEOUT}
+        if self.offset:
+            params["offset"] = self.offset
+        response = await self._client.get(
+            f"{config.TELEGRAM_API_BASE_URL}/getUpdates", params=params, timeout=POLL_TIMEOUT + 10
+        )
+        response.raise_for_status()
+        return response.json().get("result", [])
+
+    async def _handle_in_order(self, key: str, upd: dict) -> None:
+        lock = self._chat_locks.setdefault(key, asyncio.Lock())
+        self._chat_waiting[key] = self._chat_waiting.get(key, 0) + 1
+        try:
+            async with lock:
+                async with self._slots:
+                    await asyncio.to_thread(self.handle_update, upd)
+        finally:
+            self._chat_waiting[key] -= 1
+            if not self._chat_waiting[key]:
+                # Nobody else is queued for this chat; drop its lock.
+                del self._chat_waiting[key]
+                del self._chat_locks[key]
+
+    def _spawn(self, coro: Any) -> None:
+        task = asyncio.ensure_future(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def run(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._slots = asyncio.Semaphore(max(1, config.BOT_WORKERS))
+        limits = httpx.Limits(max_connections=max(10, config.BOT_WORKERS * 2))
+        async with httpx.AsyncClient(timeout=config.REQUEST_TIMEOUT, limits=limits) as client:
+            self._client = client
+            try:
+                while True:
+                    try:
+                        updates = await self.get_updates_async()
+                        for upd in updates:
+                            self._spawn(self._handle_in_order(self.chat_key(upd), upd))
+                        if updates:
+                            self.offset = updates[-1]["update_id"] + 1
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception as exc:  # noqa: BLE001
+                        logging.error("Error in polling loop: %s", exc, exc_info=True)
+                        await asyncio.sleep(3)
+            finally:
+                pending = list(self._background)
+                if pending:
+                    await asyncio.gather(*pending, return_exceptions=True)
+
+
+def main() -> None:
+    bot = AsyncBotPolling()
+    metrics.serve_from_config()
+    try:
+        asyncio.run(bot.run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        bot.close_storage()
+
+
+if __name__ == "__main__":
+    main()
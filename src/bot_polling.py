@@ -1,28 +1,49 @@
 import datetime
+import html
 import json
 import logging
 import time
 import os
-from typing import Optional, Dict, Any, Set
+import threading
+from typing import Optional, Dict, Any, Set, Callable, List, Tuple, TypeVar
 
 import requests
 
 import config
 import constants
+import telegram_client
 from google_sheets_client import GoogleSheetsClient
+from retry import RetryPolicy
 from plan_repository import PlanRepository
+from plan_registry import PlanRegistry
+from sqlite_storage import SqliteStorage
 from progress_repository import ProgressRepository
+import progress_shards
 from group_repository import GroupRepository
 from log_repository import LogRepository
+from update_dispatcher import UpdateDispatcher
+from debouncer import Debouncer
+from read_stats import ReadStats
 import keyboard_factory
+import message_builder
+import metrics
+from message_builder import build_plan_text  # noqa: F401  (re-exported)
 
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s [%(levelname)s] %(message)s",
 )
 
+T = TypeVar("T")
+
 POLL_TIMEOUT = int(os.environ.get("POLL_TIMEOUT_SECONDS", str(config.POLL_TIMEOUT)))
 
+# Commands with their own metrics label; anything else is counted as "/other".
+COMMANDS = frozenset({
+    "/register_group", "/set_start_date", "/set_date", "/set_time", "/ask", "/start", "/start_john",
+    "/next", "/status", "/repeat", "/previous", "/today_group", "/reload", "/stats",
+})
+
 WELCOME_INLINE_KEYBOARD = None
 if config.BOT_USERNAME:
     bot_link = f"https://t.me/{config.BOT_USERNAME}"
@@ -44,21 +65,19 @@ def send_message(
     text: str,
     reply_markup: Optional[Dict[str, Any]] = None,
 ) -> None:
-    url = f"{config.TELEGRAM_API_BASE_URL}/sendMessage"
     payload = {"chat_id": chat_id, "text": text, "parse_mode": "HTML"}
     if reply_markup is not None:
         payload["reply_markup"] = reply_markup
-    response = requests.post(url, json=payload, timeout=config.REQUEST_TIMEOUT)
+    response = telegram_client.get_client().post("sendMessage", json=payload)
     response.raise_for_status()
 
 
 def answer_callback_query(callback_query_id: str, text: str = "") -> None:
     """Acknowledge a callback query to stop the loading animation."""
-    url = f"{config.TELEGRAM_API_BASE_URL}/answerCallbackQuery"
     payload = {"callback_query_id": callback_query_id}
     if text:
         payload["text"] = text
-    requests.post(url, json=payload, timeout=config.REQUEST_TIMEOUT)
+    telegram_client.get_client().post("answerCallbackQuery", json=payload)
 
 
 def send_photo(
@@ -72,9 +91,8 @@ def send_photo(
     if len(caption) > 1000:
         try:
             # 1. Send Photo (empty caption)
-            url = f"{config.TELEGRAM_API_BASE_URL}/sendPhoto"
             payload = {"chat_id": chat_id, "photo": photo_url}
-            requests.post(url, json=payload, timeout=config.REQUEST_TIMEOUT)
+            telegram_client.get_client().post("sendPhoto", json=payload)
             
             # 2. Send Text (with markup)
             send_message(chat_id, caption, reply_markup)
@@ -85,7 +103,6 @@ def send_photo(
             return
 
     # Normal attempt for short captions
-    url = f"{config.TELEGRAM_API_BASE_URL}/sendPhoto"
     payload = {
         "chat_id": chat_id,
         "photo": photo_url,
@@ -96,7 +113,7 @@ def send_photo(
         payload["reply_markup"] = reply_markup
         
     try:
-        response = requests.post(url, json=payload, timeout=config.REQUEST_TIMEOUT)
+        response = telegram_client.get_client().post("sendPhoto", json=payload)
         response.raise_for_status()
     except requests.exceptions.HTTPError as e:
         if e.response.status_code == 400:
@@ -108,110 +125,230 @@ def send_photo(
 
 def set_message_reaction(chat_id: str, message_id: int, emoji: str = constants.EMOJI_REACTION) -> None:
     """React to a message with an emoji."""
-    url = f"{config.TELEGRAM_API_BASE_URL}/setMessageReaction"
     payload = {
         "chat_id": chat_id,
         "message_id": message_id,
         "reaction": [{"type": "emoji", "emoji": emoji}],
     }
     try:
-        requests.post(url, json=payload, timeout=config.REQUEST_TIMEOUT)
+        telegram_client.get_client().post("setMessageReaction", json=payload)
     except Exception:
         logging.warning("Failed to set reaction", exc_info=True)
 
 
 def send_typing(chat_id: int) -> None:
     """Send 'typing' action to give user feedback during waits."""
-    url = f"{config.TELEGRAM_API_BASE_URL}/sendChatAction"
-    requests.post(
-        url,
+    telegram_client.get_client().post(
+        "sendChatAction",
         json={"chat_id": chat_id, "action": "typing"},
-        timeout=config.REQUEST_TIMEOUT,
     )
 
 
-TOTAL_DAYS = 66
-
-def build_plan_text(day: int, plan_row: dict, personal: bool = True, header_prefix: Optional[str] = None) -> str:
-    prefix = header_prefix if header_prefix else ("개인" if personal else "공동체")
-    ref = plan_row.get("ref", "")
-    title = plan_row.get("title", "")
-    summary = plan_row.get("summary", "")
-    verse_text = plan_row.get("verse_text", "")
-    
-    mt = plan_row.get("mt", "").strip()
-    mk = plan_row.get("mk", "").strip()
-    lk = plan_row.get("lk", "").strip()
-    
-    # Helper to check if a parallel ref is valid (has content and not "독자 기록" or "-")
-    def is_valid_parallel(text: str) -> bool:
-        return bool(text) and text not in ("-", "독자 기록")
-    
-    has_parallel = is_valid_parallel(mt) or is_valid_parallel(mk) or is_valid_parallel(lk)
-    
-    progress_percent = int((day / TOTAL_DAYS) * 100)
-    
-    msg = f"[{prefix} DAY {day}] {ref} ({title})\n\n"
-    
-    if verse_text:
-        msg += f"<blockquote>{verse_text}</blockquote>\n\n"
-        
-    if has_parallel:
-        msg += "📖 함께 읽어보면 좋은 평행본문입니다:\n"
-        if is_valid_parallel(mt):
-            msg += f"• 마태(Mt): {mt}\n"
-        if is_valid_parallel(mk):
-            msg += f"• 마가(Mk): {mk}\n"
-        if is_valid_parallel(lk):
-            msg += f"• 누가(Lk): {lk}\n"
-        msg += "\n"
-    else:
-        pass
-        
-    if not personal:
-        # For community mode, keep original behavior (Summary)
-        msg += f"{constants.EMOJI_BOOK} 이런 내용입니다:\n{summary}\n\n"
-    
-    msg += "인상 깊은 구절이나 한 줄 소감을 보내주셔도 좋습니다.\n"
-    
-    if personal:
-        msg += "다음 퀘스트는 /next 로, 진행 현황은 /status 로 확인할 수 있어요."
-    else:
-        msg += f"진도율 : {day}/{TOTAL_DAYS} ({progress_percent}% 완료!)"
-        
-    return msg
-
-
 class BotPolling:
+    # Engines that schedule handlers themselves turn the thread pool off.
+    use_dispatcher = True
+
     def __init__(self) -> None:
+        started = time.perf_counter()
+        self.startup_timings: Dict[str, float] = {}
         self.offset: Optional[int] = None
         self.group_cache: Set[str] = set()
-        
-        # Fetch bot info dynamically
-        self.bot_info = {}
+        self.debouncer = Debouncer(config.CALLBACK_DEBOUNCE_SECONDS)
+        self.read_stats = ReadStats(
+            config.READ_STATS_PATH,
+            retention_days=config.READ_STATS_RETENTION_DAYS,
+            checkpoint_interval=config.READ_STATS_CHECKPOINT_SECONDS,
+        )
+        self.bot_info: Dict[str, Any] = {}
+        # Fast start polls right away and loads the rest in warm_up(); data
+        # a handler needs before then is loaded on first access.
+        fast_start = config.BOT_FAST_START
+        if not fast_start:
+            self._timed("getMe", self.load_bot_info)
+
+        # The SQLite backend only needs Sheets when it mirrors to it.
+        use_sqlite = config.STORAGE_BACKEND == "sqlite"
+        sheets_client: Optional[GoogleSheetsClient] = None
+        if not use_sqlite or config.SQLITE_MIRROR_TO_SHEETS:
+            sheets_client = self._build_sheets_client()
+        self.sheets_client = sheets_client
+        # Clients for progress shards kept in other spreadsheets
+        self.shard_clients: List[GoogleSheetsClient] = []
+        if sheets_client is not None and not fast_start:
+            self._timed("sheets_service", sheets_client.warm_up)
+        self.storage: Optional[SqliteStorage] = None
+        if use_sqlite:
+            self.storage = self._timed(
+                "sqlite",
+                lambda: SqliteStorage(config.SQLITE_PATH, sheets_client, mirror_interval=config.SQLITE_MIRROR_INTERVAL),
+            )
+
+        self.plans = PlanRegistry(
+            sheets_client,
+            max_size=config.PLAN_REGISTRY_SIZE,
+            ttl=config.PLAN_REGISTRY_TTL,
+            snapshot_dir=config.PLAN_SNAPSHOT_DIR or None,
+            factory=self.storage.plan_repository if self.storage else None,
+        )
+        if not fast_start:
+            self._timed("plan", self.plan_repo.ensure_loaded)
+        if self.storage is not None:
+            self.progress_repo = self.storage.progress_repository(config.PROGRESS_SHEET_NAME)
+            self.group_repo = self.storage.group_repository(config.GROUPS_SHEET_NAME)
+            self.log_repo = self.storage.log_repository(config.LOG_SHEET_NAME)
+        else:
+            self.progress_repo = self._build_progress_repo(sheets_client)
+            self.progress_repo.start_sync(config.PROGRESS_SYNC_INTERVAL)
+            self.group_repo = GroupRepository(
+                sheets_client, config.GROUPS_SHEET_NAME, ttl=config.GROUPS_CACHE_TTL, miss_ttl=config.GROUPS_MISS_TTL
+            )
+            self.log_repo = LogRepository(
+                sheets_client,
+                config.LOG_SHEET_NAME,
+                flush_size=config.LOG_FLUSH_SIZE,
+                flush_interval=config.LOG_FLUSH_INTERVAL,
+                buffer_size=config.LOG_BUFFER_SIZE,
+                spill_path=config.LOG_SPILL_PATH,
+            )
+        if not fast_start:
+            self._timed("groups", self.preload_group_cache)
+
+        # Handle different chats in parallel; BOT_WORKERS=0 keeps the serial loop.
+        self.dispatcher: Optional[UpdateDispatcher] = None
+        if self.use_dispatcher and config.BOT_WORKERS > 0:
+            self.dispatcher = UpdateDispatcher(
+                self.handle_update,
+                workers=config.BOT_WORKERS,
+                queue_size=config.BOT_WORKER_QUEUE_SIZE,
+            )
+
+        self.register_gauges()
+
+        self.startup_timings["ready"] = (time.perf_counter() - started) * 1000
+        logging.info("Bot ready to poll after %.1f ms", self.startup_timings["ready"])
+        if fast_start:
+            threading.Thread(target=self.warm_up, name="bot-warm-up", daemon=True).start()
+
+    @staticmethod
+    def _build_sheets_client(spreadsheet_id: Optional[str] = None) -> GoogleSheetsClient:
+        return GoogleSheetsClient(
+            spreadsheet_id=spreadsheet_id or config.SPREADSHEET_ID,
+            credentials_file=config.service_account_file(),
+            retry_policy=RetryPolicy(
+                max_attempts=config.RETRY_MAX_ATTEMPTS,
+                base_delay=config.RETRY_BASE_DELAY,
+                max_delay=config.RETRY_MAX_DELAY,
+                deadline=config.SHEETS_CALL_DEADLINE,
+            ),
+            write_behind=config.SHEETS_WRITE_BEHIND,
+            flush_interval=config.SHEETS_FLUSH_INTERVAL,
+            batch_size=config.SHEETS_BATCH_SIZE,
+            max_pending=config.SHEETS_MAX_PENDING_WRITES,
+        )
+
+    def _build_progress_repo(self, sheets_client: GoogleSheetsClient) -> Any:
+        """One progress tab, or a ShardedProgressRepository when PROGRESS_SHARDS is set."""
+        shards = progress_shards.parse_shards(config.PROGRESS_SHARDS, config.PROGRESS_SHEET_NAME)
+        if len(shards) == 1 and shards[0][0] is None:
+            return ProgressRepository(sheets_client, shards[0][1], miss_ttl=config.PROGRESS_MISS_TTL)
+        clients: Dict[Optional[str], GoogleSheetsClient] = {None: sheets_client}
+        for spreadsheet_id, _ in shards:
+            if spreadsheet_id not in clients:
+                clients[spreadsheet_id] = self._build_sheets_client(spreadsheet_id)
+                self.shard_clients.append(clients[spreadsheet_id])
+        logging.info("Progress is sharded across %s tabs", len(shards))
+        return progress_shards.ShardedProgressRepository([
+            ProgressRepository(clients[spreadsheet_id], tab, miss_ttl=config.PROGRESS_MISS_TTL)
+            for spreadsheet_id, tab in shards
+        ])
+
+    def register_gauges(self) -> None:
+        """Expose queue depths on /metrics."""
+        if self.dispatcher:
+            metrics.registry.register_gauge("bot_dispatcher_queue_depth", self.dispatcher.depth)
+        if self.sheets_client is not None:
+            metrics.registry.register_gauge("sheets_pending_writes", self.sheets_client.pending_writes)
+        metrics.registry.register_gauge("log_buffer_depth", self.log_repo.pending)
+        if self.storage is not None and self.storage.mirror is not None:
+            metrics.registry.register_gauge("sqlite_mirror_pending", self.storage.mirror.pending)
+
+    def close_storage(self) -> None:
+        """Flush logs, the Sheets mirror and queued Sheets writes."""
+        self.log_repo.close()
+        self.read_stats.close()
+        if self.storage is not None:
+            self.storage.close()
+        if self.sheets_client is not None:
+            self.sheets_client.close()
+        for client in self.shard_clients:
+            client.close()
+
+    @property
+    def plan_repo(self) -> PlanRepository:
+        """The default plan sheet, used for personal quests."""
+        return self.plans.get(config.PLAN_SHEET_NAME)
+
+    # --- Startup ------------------------------------------------------------
+
+    def _timed(self, phase: str, fn: Callable[[], T]) -> T:
+        """Run one startup phase and record how long it took (ms)."""
+        started = time.perf_counter()
         try:
-            me_resp = requests.get(f"{config.TELEGRAM_API_BASE_URL}/getMe", timeout=10)
+            return fn()
+        finally:
+            self.startup_timings[phase] = (time.perf_counter() - started) * 1000
+            logging.info("Startup phase %s took %.1f ms", phase, self.startup_timings[phase])
+
+    def load_bot_info(self) -> None:
+        """Fetch bot info (getMe); used to recognise replies to the bot."""
+        try:
+            me_resp = telegram_client.get_client().get("getMe")
             me_resp.raise_for_status()
             self.bot_info = me_resp.json().get("result", {})
             logging.info("Bot info loaded: %s", self.bot_info)
         except Exception:
             logging.warning("Failed to fetch bot info (getMe)", exc_info=True)
 
-        sheets_client = GoogleSheetsClient(
-            spreadsheet_id=config.SPREADSHEET_ID,
-            credentials_file=config.GOOGLE_SERVICE_ACCOUNT_FILE,
-        )
-        self.plan_repo = PlanRepository(sheets_client, config.PLAN_SHEET_NAME)
-        self.progress_repo = ProgressRepository(sheets_client, config.PROGRESS_SHEET_NAME)
-        self.group_repo = GroupRepository(sheets_client, config.GROUPS_SHEET_NAME)
-        self.log_repo = LogRepository(sheets_client, config.LOG_SHEET_NAME)
-        # preload existing groups to avoid duplicate welcome messages
+    def preload_group_cache(self) -> None:
+        """Preload existing groups to avoid duplicate welcome messages."""
         try:
             for g in self.group_repo.list_groups():
                 self.group_cache.add(str(g["chat_id"]))
         except Exception:
             logging.debug("Failed to preload group cache", exc_info=True)
 
+    def warm_up(self) -> None:
+        """Background half of a fast start: everything polling does not need."""
+        phases: List[Tuple[str, Callable[[], Any]]] = [
+            ("getMe", self.load_bot_info),
+            ("sheets_service", self.sheets_client.warm_up if self.sheets_client else lambda: None),
+            ("plan", lambda: self.plan_repo.ensure_loaded()),
+            ("progress", self.progress_repo.ensure_loaded),
+            ("groups", self.preload_group_cache),
+        ]
+        for phase, fn in phases:
+            try:
+                self._timed(phase, fn)
+            except Exception:
+                logging.error("Startup phase %s failed; it will load on first use", phase, exc_info=True)
+        logging.info("Background warm-up finished: %s", {k: round(v, 1) for k, v in self.startup_timings.items()})
+
+    # --- Telegram transport -------------------------------------------------
+    # Handlers talk to Telegram only through these methods so that other
+    # engines (see bot_async.py) can swap the transport.
+
+    def send_message(self, chat_id: int, text: str, reply_markup: Optional[Dict[str, Any]] = None) -> None:
+        send_message(chat_id, text, reply_markup)
+
+    def send_typing(self, chat_id: int) -> None:
+        send_typing(chat_id)
+
+    def answer_callback_query(self, callback_query_id: str, text: str = "") -> None:
+        answer_callback_query(callback_query_id, text)
+
+    def set_message_reaction(self, chat_id: str, message_id: int, emoji: str = constants.EMOJI_REACTION) -> None:
+        set_message_reaction(chat_id, message_id, emoji)
+
     def poll(self) -> None:
         while True:
             try:
@@ -223,149 +360,204 @@ class BotPolling:
                 time.sleep(3)
 
     def get_updates(self) -> list:
-        url = f"{config.TELEGRAM_API_BASE_URL}/getUpdates"
         params = {"timeout": POLL_TIMEOUT}
         if self.offset:
             params["offset"] = self.offset
         # Client timeout must be greater than server timeout (long polling)
-        response = requests.get(url, params=params, timeout=POLL_TIMEOUT + 10)
+        response = telegram_client.get_client().get("getUpdates", params=params, timeout=POLL_TIMEOUT + 10)
         response.raise_for_status()
         data = response.json()
         return data.get("result", [])
 
     def handle_updates(self, updates: list) -> None:
+        """Dispatch a batch of updates and advance the offset past it."""
+        if not updates:
+            return
         for upd in updates:
-            self.offset = upd["update_id"] + 1
-            
-            # 1. Handle Callback Queries (Inline Buttons)
-            if "callback_query" in upd:
-                try:
-                    self.handle_callback_query(upd["callback_query"])
-                except Exception as exc:
-                    logging.error("Error handling callback_query: %s", exc, exc_info=True)
-                continue
-
-            # 2. Handle My Chat Member (Bot added to group)
-            if "my_chat_member" in upd:
-                try:
-                    self.handle_my_chat_member(upd["my_chat_member"])
-                except Exception as exc:
-                    logging.error("Error handling my_chat_member: %s", exc, exc_info=True)
-                continue
-
-            message = upd.get("message")
-            if not message:
-                continue
-            
-            chat = message.get("chat", {})
-            chat_type = chat.get("type")
-            chat_id = str(chat.get("id"))
-            
-            # 3. Handle Group Replies (Reaction) & Auto-Linking
-            if chat_type in ("group", "supergroup"):
-                # Auto-Link User to Group
-                user = message.get("from")
-                if user and not user.get("is_bot"):
-                    user_id = str(user.get("id"))
-                    username = user.get("username", "")
-                    self.link_user_to_group(user_id, username, chat_id)
-
-                reply_to = message.get("reply_to_message")
-                if reply_to:
-                    # Check if reply is to the bot
-                    reply_from = reply_to.get("from", {})
-                    
-                    # Check if the message being replied to is from THIS bot
-                    is_reply_to_me = False
-                    my_username = self.bot_info.get("username")
-                    my_id = self.bot_info.get("id")
-                    
-                    if my_id and reply_from.get("id") == my_id:
-                        is_reply_to_me = True
-                    elif my_username and reply_from.get("username") == my_username:
-                        is_reply_to_me = True
-                    elif not my_id and not my_username and reply_from.get("is_bot") and reply_from.get("username") == config.BOT_USERNAME:
-                        # Fallback to config if getMe failed
-                        is_reply_to_me = True
-                        
-                    if is_reply_to_me:
-                         logging.info("Detected reply to bot in chat %s. Reacting...", chat_id)
-                         set_message_reaction(chat_id, message["message_id"], constants.EMOJI_REACTION)
-                         continue
-
-            # 4. Handle Commands
-            text = message.get("text") or ""
-            if not text.startswith("/"):
-                continue
+            if self.dispatcher:
+                self.dispatcher.submit(self.chat_key(upd), upd)
+            else:
+                self.handle_update(upd)
+        # Only move past the batch once every update has been accepted.
+        self.offset = updates[-1]["update_id"] + 1
+
+    @staticmethod
+    def chat_key(upd: dict) -> str:
+        """Key used to keep updates from the same chat in order."""
+        if "callback_query" in upd:
+            cb = upd["callback_query"]
+            chat = (cb.get("message") or {}).get("chat") or cb.get("from") or {}
+            return str(chat.get("id"))
+        for field in ("message", "edited_message", "my_chat_member"):
+            if field in upd:
+                return str(upd[field].get("chat", {}).get("id"))
+        return str(upd.get("update_id"))
+
+    @staticmethod
+    def handler_label(upd: dict) -> str:
+        """Low-cardinality name for what an update is, used as a metrics label."""
+        if "callback_query" in upd:
+            data = upd["callback_query"].get("data") or ""
+            return "callback:" + data.split(":", 1)[0]
+        if "my_chat_member" in upd:
+            return "my_chat_member"
+        message = upd.get("message")
+        if not message:
+            return "other"
+        text = message.get("text") or ""
+        if text.startswith("/"):
             command = text.split()[0]
-            
+            return command if command in COMMANDS else "/other"
+        if message.get("chat", {}).get("type") in ("group", "supergroup"):
+            return "group_message"
+        return "message"
+
+    def handle_update(self, upd: dict) -> None:
+        """Handle one update, recording how old it was and how long it took."""
+        message = upd.get("message")
+        if message and message.get("date"):
+            metrics.registry.observe("bot_update_age_seconds", max(0.0, time.time() - message["date"]))
+        with metrics.registry.time("bot_update_seconds", handler=self.handler_label(upd)):
+            self._route_update(upd)
+
+    def _count_error(self, upd: dict) -> None:
+        metrics.registry.inc("bot_update_errors_total", handler=self.handler_label(upd))
+
+    def _route_update(self, upd: dict) -> None:
+        # 1. Handle Callback Queries (Inline Buttons)
+        if "callback_query" in upd:
             try:
-                if chat_type in ("group", "supergroup"):
-                    if command == "/register_group":
-                        self.handle_register_group(message)
-                    elif command == "/set_start_date" or command == "/set_date":
-                        self.handle_set_start_date(message)
-                    elif command == "/set_time":
-                        self.handle_set_time(message)
-                    elif command == "/ask":
-                        self.handle_ask(message)
-                elif chat_type == "private":
-                    if command == "/start":
-                        self.handle_start_entry(message)
-                    elif command == "/start_john":
-                        self.handle_start(message)
-                    elif command == "/next":
-                        self.handle_next(message)
-                    elif command == "/status":
-                        self.handle_status(message)
-                    elif command == "/repeat":
-                        self.handle_repeat(message)
-                    elif command == "/previous":
-                        self.handle_previous(message)
-                    elif command == "/today_group":
-                        self.handle_today_group(message)
-                    elif command == "/reload":
-                        self.plan_repo.reload()
-                        send_message(int(chat_id), "Plan reloaded.")
-                    elif command == "/ask": # Allow /ask in private chats too
-                        self.handle_ask(message)
+                self.handle_callback_query(upd["callback_query"])
             except Exception as exc:
-                logging.error("Error handling update: %s", exc, exc_info=True)
-                self.log_event(message, command, "error", str(exc))
-            else:
-                self.log_event(message, command, "ok")
+                logging.error("Error handling callback_query: %s", exc, exc_info=True)
+                self._count_error(upd)
+            return
+
+        # 2. Handle My Chat Member (Bot added to group)
+        if "my_chat_member" in upd:
+            try:
+                self.handle_my_chat_member(upd["my_chat_member"])
+            except Exception as exc:
+                logging.error("Error handling my_chat_member: %s", exc, exc_info=True)
+                self._count_error(upd)
+            return
+
+        message = upd.get("message")
+        if not message:
+            return
+        
+        chat = message.get("chat", {})
+        chat_type = chat.get("type")
+        chat_id = str(chat.get("id"))
+        
+        # 3. Handle Group Replies (Reaction) & Auto-Linking
+        if chat_type in ("group", "supergroup"):
+            # Auto-Link User to Group
+            user = message.get("from")
+            if user and not user.get("is_bot"):
+                user_id = str(user.get("id"))
+                username = user.get("username", "")
+                self.link_user_to_group(user_id, username, chat_id)
+
+            reply_to = message.get("reply_to_message")
+            if reply_to:
+                # Check if reply is to the bot
+                reply_from = reply_to.get("from", {})
+                
+                # Check if the message being replied to is from THIS bot
+                is_reply_to_me = False
+                my_username = self.bot_info.get("username")
+                my_id = self.bot_info.get("id")
+                
+                if my_id and reply_from.get("id") == my_id:
+                    is_reply_to_me = True
+                elif my_username and reply_from.get("username") == my_username:
+                    is_reply_to_me = True
+                elif not my_id and not my_username and reply_from.get("is_bot") and reply_from.get("username") == config.BOT_USERNAME:
+                    # Fallback to config if getMe failed
+                    is_reply_to_me = True
+                    
+                if is_reply_to_me:
+                     logging.info("Detected reply to bot in chat %s. Reacting...", chat_id)
+                     self.set_message_reaction(chat_id, message["message_id"], constants.EMOJI_REACTION)
+                     return
+
+        # 4. Handle Commands
+        text = message.get("text") or ""
+        if not text.startswith("/"):
+            return
+        command = text.split()[0]
+        
+        try:
+            if chat_type in ("group", "supergroup"):
+                if command == "/register_group":
+                    self.handle_register_group(message)
+                elif command == "/set_start_date" or command == "/set_date":
+                    self.handle_set_start_date(message)
+                elif command == "/set_time":
+                    self.handle_set_time(message)
+                elif command == "/ask":
+                    self.handle_ask(message)
+                elif command == "/stats":
+                    self.handle_stats(message)
+            elif chat_type == "private":
+                if command == "/start":
+                    self.handle_start_entry(message)
+                elif command == "/start_john":
+                    self.handle_start(message)
+                elif command == "/next":
+                    self.handle_next(message)
+                elif command == "/status":
+                    self.handle_status(message)
+                elif command == "/repeat":
+                    self.handle_repeat(message)
+                elif command == "/previous":
+                    self.handle_previous(message)
+                elif command == "/today_group":
+                    self.handle_today_group(message)
+                elif command == "/reload":
+                    self.plans.reload_all()
+                    self.send_message(int(chat_id), "Plan reloaded.")
+                elif command == "/ask": # Allow /ask in private chats too
+                    self.handle_ask(message)
+        except Exception as exc:
+            logging.error("Error handling update: %s", exc, exc_info=True)
+            self._count_error(upd)
+            self.log_event(message, command, "error", str(exc))
+        else:
+            self.log_event(message, command, "ok")
 
     def handle_set_start_date(self, message: dict) -> None:
         chat_id = str(message["chat"]["id"])
         text = message.get("text", "")
         parts = text.split()
         if len(parts) != 2:
-            send_message(int(chat_id), "사용법: /set_date YYYY-MM-DD\n예: /set_date 2025-01-01")
+            self.send_message(int(chat_id), "사용법: /set_date YYYY-MM-DD\n예: /set_date 2025-01-01")
             return
         
         date_str = parts[1]
         try:
             new_date = datetime.datetime.strptime(date_str, "%Y-%m-%d").date()
         except ValueError:
-            send_message(int(chat_id), "날짜 형식이 올바르지 않습니다. YYYY-MM-DD 형식으로 입력해주세요.")
+            self.send_message(int(chat_id), "날짜 형식이 올바르지 않습니다. YYYY-MM-DD 형식으로 입력해주세요.")
             return
             
         try:
             success = self.group_repo.update_start_date(chat_id, new_date)
             if success:
-                send_message(int(chat_id), f"✅ 시작일이 {new_date}로 변경되었습니다.")
+                self.send_message(int(chat_id), f"✅ 시작일이 {new_date}로 변경되었습니다.")
             else:
-                send_message(int(chat_id), "⚠️ 그룹 정보를 찾을 수 없습니다. 먼저 봇을 그룹에 다시 초대해보세요.")
+                self.send_message(int(chat_id), "⚠️ 그룹 정보를 찾을 수 없습니다. 먼저 봇을 그룹에 다시 초대해보세요.")
         except Exception:
             logging.error("Failed to update start date", exc_info=True)
-            send_message(int(chat_id), "설정 변경 중 오류가 발생했습니다.")
+            self.send_message(int(chat_id), "설정 변경 중 오류가 발생했습니다.")
 
     def handle_set_time(self, message: dict) -> None:
         chat_id = str(message["chat"]["id"])
         text = message.get("text", "")
         parts = text.split()
         if len(parts) != 2:
-            send_message(int(chat_id), "사용법: /set_time HH:MM\n예: /set_time 08:00")
+            self.send_message(int(chat_id), "사용법: /set_time HH:MM\n예: /set_time 08:00")
             return
         
         time_str = parts[1]
@@ -373,18 +565,18 @@ class BotPolling:
             # Validate time format
             datetime.datetime.strptime(time_str, "%H:%M")
         except ValueError:
-            send_message(int(chat_id), "시간 형식이 올바르지 않습니다. HH:MM (24시간) 형식으로 입력해주세요.")
+            self.send_message(int(chat_id), "시간 형식이 올바르지 않습니다. HH:MM (24시간) 형식으로 입력해주세요.")
             return
 
         try:
             success = self.group_repo.update_notification_time(chat_id, time_str)
             if success:
-                send_message(int(chat_id), f"✅ 알림 시간이 {time_str}으로 변경되었습니다.")
+                self.send_message(int(chat_id), f"✅ 알림 시간이 {time_str}으로 변경되었습니다.")
             else:
-                send_message(int(chat_id), "⚠️ 그룹 정보를 찾을 수 없습니다.")
+                self.send_message(int(chat_id), "⚠️ 그룹 정보를 찾을 수 없습니다.")
         except Exception:
             logging.error("Failed to update notification time", exc_info=True)
-            send_message(int(chat_id), "설정 변경 중 오류가 발생했습니다.")
+            self.send_message(int(chat_id), "설정 변경 중 오류가 발생했습니다.")
 
     def handle_ask(self, message: dict) -> None:
         chat_id = message["chat"]["id"]
@@ -393,7 +585,7 @@ class BotPolling:
         content = text.replace("/ask", "", 1).strip()
         
         if not content:
-            send_message(chat_id, "건의할 내용을 입력해주세요.\n예: /ask 알림이 안 와요")
+            self.send_message(chat_id, "건의할 내용을 입력해주세요.\n예: /ask 알림이 안 와요")
             return
             
         # Send to Admin
@@ -402,34 +594,24 @@ class BotPolling:
             user = message.get("from", {})
             sender_info = f"User: {user.get('first_name', '')} ({user.get('username', 'NoUsername')}), ChatID: {chat_id}"
             admin_msg = f"📩 [건의사항 접수]\n{sender_info}\n\n내용:\n{content}"
-            send_message(admin_id, admin_msg)
+            self.send_message(admin_id, admin_msg)
             
             # Reply to User
-            send_message(chat_id, "확인 후 반영하겠습니다. 소중한 의견 감사합니다. 🙏")
+            self.send_message(chat_id, "확인 후 반영하겠습니다. 소중한 의견 감사합니다. 🙏")
         except Exception:
             logging.error("Failed to send ask to admin", exc_info=True)
-            send_message(chat_id, "건의사항 전송 중 오류가 발생했습니다.")
+            self.send_message(chat_id, "건의사항 전송 중 오류가 발생했습니다.")
 
     def link_user_to_group(self, user_id: str, username: str, group_id: str) -> None:
         """Add group_id to user's progress if not already present."""
         try:
-            progress = self.progress_repo.get_progress(user_id)
-            current_day = 1
-            group_ids = []
-            
-            if progress:
-                current_day = progress["current_day"]
-                group_ids = progress.get("group_ids", [])
-            
-            if group_id not in group_ids:
-                group_ids.append(group_id)
+            # Most group messages come from members linked long ago.
+            if self.progress_repo.is_linked(user_id, group_id):
+                return
+            # Atomic in the repository: the user's private chat may be
+            # running /next on another worker at the same time.
+            if self.progress_repo.add_group(user_id, username, group_id):
                 logging.info("Linking user %s to group %s", user_id, group_id)
-                self.progress_repo.upsert_progress(
-                    user_id=user_id,
-                    username=username,
-                    current_day=current_day,
-                    group_ids=group_ids
-                )
         except Exception:
             logging.error("Failed to link user to group", exc_info=True)
 
@@ -438,77 +620,145 @@ class BotPolling:
         data = cb.get("data")
         message = cb.get("message")
         if not message or not data:
-            answer_callback_query(cb_id)
+            self.answer_callback_query(cb_id)
             return
 
         chat_id = message["chat"]["id"]
         user_id = str(chat_id) # In private chat, chat_id is user_id
-        
-        # Debouncing could be added here if needed
-        
-        if data == "next":
-            answer_callback_query(cb_id, "다음 퀘스트를 불러옵니다...")
+
+        # A double tap delivers the same callback twice; handle it once.
+        key = (str(cb.get("from", {}).get("id", chat_id)), data, message.get("message_id"))
+        if not self.debouncer.begin(key):
+            metrics.registry.inc("bot_callback_debounced_total", data=data.split(":", 1)[0])
+            self.answer_callback_query(cb_id)
+            return
+        try:
+            self._handle_callback_data(cb, data, message, user_id)
+        finally:
+            self.debouncer.end(key)
+
+    def _handle_callback_data(self, cb: dict, data: str, message: dict, user_id: str) -> None:
+        cb_id = cb["id"]
+        if data == "group_read":
+            self.handle_group_read(cb, message)
+        elif data == "next":
+            # "Next" on an older quest message must not advance twice.
+            day = message_builder.shown_day(message.get("text", ""))
+            if day is not None and self._already_past(user_id, day):
+                self.answer_callback_query(cb_id, constants.MSG_NEXT_ALREADY_TAKEN.format(day=day))
+                return
+            self.answer_callback_query(cb_id, "다음 퀘스트를 불러옵니다...")
             self.handle_next(message) # Reuse handle_next logic
         elif data == "repeat":
-            answer_callback_query(cb_id, "다시 읽기")
+            self.answer_callback_query(cb_id, "다시 읽기")
             self.handle_repeat(message)
         elif data == "previous":
-            answer_callback_query(cb_id, "이전 퀘스트")
+            self.answer_callback_query(cb_id, "이전 퀘스트")
             self.handle_previous(message)
         elif data == "status":
-            answer_callback_query(cb_id)
+            self.answer_callback_query(cb_id)
             self.handle_status(message)
         else:
-            answer_callback_query(cb_id)
+            self.answer_callback_query(cb_id)
+
+    def group_today(self, group_id: str, thread_id: Optional[int] = None) -> datetime.date:
+        """Local date in the group's own timezone, the one its broadcast uses."""
+        try:
+            # Topic groups are registered as "<chat>_<thread>".
+            group = self.group_repo.find_by_chat(group_id, thread_id)
+        except Exception:
+            logging.warning("Failed to look up group %s; using the default timezone", group_id, exc_info=True)
+            group = None
+        tz_name = group.get("timezone") if group else None
+        if tz_name and config.ZoneInfo:
+            try:
+                return datetime.datetime.now(tz=config.ZoneInfo(tz_name)).date()
+            except Exception:
+                logging.warning("Invalid timezone %s for group %s; using the default", tz_name, group_id)
+        return today_date()
+
+    def handle_group_read(self, cb: dict, message: dict) -> None:
+        """Record a tap on the "아멘 / 읽음" button of a group broadcast."""
+        user = cb.get("from", {})
+        user_id = str(user.get("id"))
+        group_id = str(message["chat"]["id"])
+        name = user.get("first_name") or user.get("username") or ""
+        today = self.group_today(group_id, message.get("message_thread_id"))
+        if self.read_stats.record(group_id, user_id, name, today):
+            metrics.registry.inc("bot_group_reads_total")
+            self.answer_callback_query(cb["id"], constants.MSG_READ_RECORDED)
+        else:
+            self.answer_callback_query(cb["id"], constants.MSG_READ_ALREADY_RECORDED)
+        self.link_user_to_group(user_id, user.get("username", ""), group_id)
+
+    def handle_stats(self, message: dict) -> None:
+        """/stats in a group: today's readers and the leaderboard, from ReadStats."""
+        chat_id = message["chat"]["id"]
+        today = self.group_today(str(chat_id), message.get("message_thread_id"))
+        stats = self.read_stats.summary(str(chat_id), today)
+        text = constants.MSG_STATS_TODAY.format(date=today.isoformat(), count=stats["today"])
+        if stats["today_names"]:
+            text += ", ".join(html.escape(name) for name in stats["today_names"]) + "\n"
+        text += constants.MSG_STATS_TOTAL.format(total=stats["total"])
+        if stats["leaders"]:
+            text += constants.MSG_STATS_LEADERS_HEADER
+            text += "".join(
+                f"{rank}. {html.escape(name)} – {count}회\n" for rank, (name, count) in enumerate(stats["leaders"], start=1)
+            )
+        self.send_message(chat_id, text)
+
+    def _already_past(self, user_id: str, shown_day: int) -> bool:
+        """True once the user has received the quest after shown_day."""
+        progress = self.progress_repo.get_progress(user_id)
+        return bool(progress) and progress["current_day"] > shown_day + 1
 
     def handle_start(self, message: dict) -> None:
         chat_id = message["chat"]["id"]
         username = message["from"].get("username", "")
         user_id = chat_id
-        send_typing(chat_id)
+        self.send_typing(chat_id)
 
         progress = self.progress_repo.get_progress(user_id)
         if progress:
             current_day = progress["current_day"]
             text = constants.MSG_ALREADY_STARTED.format(current_day=current_day)
-            send_message(chat_id, text, reply_markup=keyboard_factory.get_quest_keyboard())
+            self.send_message(chat_id, text, reply_markup=keyboard_factory.get_quest_keyboard())
             return
 
         self.progress_repo.upsert_progress(
             user_id=str(user_id), username=username, current_day=1, last_read_at=""
         )
         text = constants.MSG_QUEST_START
-        send_message(chat_id, text, reply_markup=keyboard_factory.get_start_keyboard())
+        self.send_message(chat_id, text, reply_markup=keyboard_factory.get_start_keyboard())
 
     def handle_start_entry(self, message: dict) -> None:
         chat_id = message["chat"]["id"]
-        send_typing(chat_id)
+        self.send_typing(chat_id)
         text = constants.MSG_WELCOME
-        send_message(chat_id, text)
+        self.send_message(chat_id, text)
 
     def handle_next(self, message: dict) -> None:
         chat_id = message["chat"]["id"]
         username = message["from"].get("username", "")
         user_id = chat_id
-        send_typing(chat_id)
+        self.send_typing(chat_id)
 
         progress = self.progress_repo.get_progress(user_id)
         if not progress:
-            send_message(chat_id, "먼저 /start_john 으로 퀘스트를 시작해주세요.")
+            self.send_message(chat_id, "먼저 /start_john 으로 퀘스트를 시작해주세요.")
             return
 
         day = progress["current_day"]
-        plan_row = self.plan_repo.get_plan_by_day(day)
-        if not plan_row:
-            send_message(
+        rendered = self.plan_repo.get_rendered(day, message_builder.MODE_PERSONAL)
+        if not rendered:
+            self.send_message(
                 chat_id,
                 constants.MSG_NO_QUEST,
             )
             return
 
-        text = build_plan_text(day, plan_row, personal=True)
         # User requested NO photo in personal mode
-        send_message(chat_id, text, reply_markup=keyboard_factory.get_quest_keyboard())
+        self.send_message(chat_id, rendered["text"], reply_markup=rendered["reply_markup"])
 
         today_str = today_date().isoformat()
         self.progress_repo.upsert_progress(
@@ -521,11 +771,11 @@ class BotPolling:
     def handle_status(self, message: dict) -> None:
         chat_id = message["chat"]["id"]
         user_id = chat_id
-        send_typing(chat_id)
+        self.send_typing(chat_id)
 
         progress = self.progress_repo.get_progress(user_id)
         if not progress:
-            send_message(
+            self.send_message(
                 chat_id,
                 constants.MSG_NOT_STARTED,
             )
@@ -540,16 +790,16 @@ class BotPolling:
             text = constants.MSG_STATUS_HEADER + constants.MSG_STATUS_BODY.format(finished_day=finished_day, next_day=next_day, ref=ref, title=title)
         else:
             text = constants.MSG_STATUS_HEADER + constants.MSG_STATUS_FINISHED.format(finished_day=finished_day)
-        send_message(chat_id, text, reply_markup=keyboard_factory.get_quest_keyboard())
+        self.send_message(chat_id, text, reply_markup=keyboard_factory.get_quest_keyboard())
 
     def handle_repeat(self, message: dict) -> None:
         chat_id = message["chat"]["id"]
         user_id = chat_id
-        send_typing(chat_id)
+        self.send_typing(chat_id)
 
         progress = self.progress_repo.get_progress(user_id)
         if not progress:
-            send_message(
+            self.send_message(
                 chat_id,
                 constants.MSG_NOT_STARTED,
             )
@@ -557,29 +807,28 @@ class BotPolling:
 
         repeat_day = progress["current_day"] - 1
         if repeat_day <= 0:
-            send_message(
+            self.send_message(
                 chat_id, "아직 완료한 퀘스트가 없습니다. /next 로 첫 퀘스트를 받아보세요.", reply_markup=keyboard_factory.get_start_keyboard()
             )
             return
 
-        plan_row = self.plan_repo.get_plan_by_day(repeat_day)
-        if not plan_row:
-            send_message(chat_id, "직전 퀘스트 정보를 찾을 수 없습니다.")
+        rendered = self.plan_repo.get_rendered(repeat_day, message_builder.MODE_PERSONAL)
+        if not rendered:
+            self.send_message(chat_id, "직전 퀘스트 정보를 찾을 수 없습니다.")
             return
 
-        text = build_plan_text(repeat_day, plan_row, personal=True)
         # User requested NO photo in personal mode
-        send_message(chat_id, text, reply_markup=keyboard_factory.get_quest_keyboard())
+        self.send_message(chat_id, rendered["text"], reply_markup=rendered["reply_markup"])
 
     def handle_previous(self, message: dict) -> None:
         """Handle /previous command to show the day BEFORE the last completed one."""
         chat_id = message["chat"]["id"]
         user_id = chat_id
-        send_typing(chat_id)
+        self.send_typing(chat_id)
 
         progress = self.progress_repo.get_progress(user_id)
         if not progress:
-            send_message(chat_id, constants.MSG_NOT_STARTED)
+            self.send_message(chat_id, constants.MSG_NOT_STARTED)
             return
 
         # current_day is the NEXT pending quest.
@@ -588,22 +837,21 @@ class BotPolling:
         prev_day = progress["current_day"] - 2
         
         if prev_day <= 0:
-            send_message(chat_id, "이전 퀘스트가 없습니다.", reply_markup=keyboard_factory.get_quest_keyboard())
+            self.send_message(chat_id, "이전 퀘스트가 없습니다.", reply_markup=keyboard_factory.get_quest_keyboard())
             return
 
-        plan_row = self.plan_repo.get_plan_by_day(prev_day)
-        if not plan_row:
-            send_message(chat_id, "퀘스트 정보를 찾을 수 없습니다.")
+        rendered = self.plan_repo.get_rendered(prev_day, message_builder.MODE_PERSONAL)
+        if not rendered:
+            self.send_message(chat_id, "퀘스트 정보를 찾을 수 없습니다.")
             return
 
-        text = build_plan_text(prev_day, plan_row, personal=True)
-        send_message(chat_id, text, reply_markup=keyboard_factory.get_quest_keyboard())
+        self.send_message(chat_id, rendered["text"], reply_markup=rendered["reply_markup"])
 
     def handle_today_group(self, message: dict) -> None:
         """Show today's plan for the user's linked groups."""
         chat_id = message["chat"]["id"]
         user_id = str(chat_id)
-        send_typing(chat_id)
+        self.send_typing(chat_id)
         
         # 1. Get User's Linked Groups
         progress = self.progress_repo.get_progress(user_id)
@@ -625,13 +873,14 @@ class BotPolling:
                 # Or strictly require membership. Let's be friendly and show first one.
                 target_groups = [all_groups[0]]
             else:
-                send_message(chat_id, "등록된 그룹이 없습니다.", use_default_keyboard=True)
+                self.send_message(chat_id, "등록된 그룹이 없습니다.", use_default_keyboard=True)
                 return
 
         # 4. Send Plan for Each Target Group
         for group in target_groups:
             tz = group.get("timezone") or config.TIMEZONE
-            start_date = group["start_date"]
+            start_date = group.get("start_date") or config.START_DATE
+            plan_sheet = group.get("plan_sheet") or config.PLAN_SHEET_NAME
             # group_title = group.get("title", "공동체") # If we had title in repo
             
             try:
@@ -645,27 +894,27 @@ class BotPolling:
             day = (now_local.date() - start_date).days + 1
             
             if day <= 0:
-                send_message(chat_id, f"모임(ID:{group['chat_id']}) DAY가 아직 시작 전입니다.")
+                self.send_message(chat_id, f"모임(ID:{group['chat_id']}) DAY가 아직 시작 전입니다.")
                 continue
 
-            plan_row = self.plan_repo.get_plan_by_day(day)
-            if not plan_row:
-                send_message(chat_id, f"모임(ID:{group['chat_id']}) DAY {day} 정보를 찾지 못했습니다.")
+            rendered = self.plans.get(plan_sheet).get_rendered(day, message_builder.MODE_GROUP)
+            if not rendered:
+                self.send_message(chat_id, f"모임(ID:{group['chat_id']}) DAY {day} 정보를 찾지 못했습니다.")
                 continue
 
-            text = build_plan_text(day, plan_row, personal=True, header_prefix="모임")
+            text = rendered["text"]
             # Add a header to distinguish groups if multiple
             if len(target_groups) > 1:
                 text = f"📢 <b>그룹 {group['chat_id']}</b>\n\n" + text
                 
-            send_message(chat_id, text)
+            self.send_message(chat_id, text)
 
     def handle_register_group(self, message: dict) -> None:
         chat = message.get("chat", {})
         chat_type = chat.get("type", "")
         chat_id = str(chat.get("id"))
         if chat_type not in ("group", "supergroup"):
-            send_message(chat.get("id"), "이 명령은 그룹/슈퍼그룹에서만 사용할 수 있습니다.")
+            self.send_message(chat.get("id"), "이 명령은 그룹/슈퍼그룹에서만 사용할 수 있습니다.")
             return
         title = chat.get("title", "")
         plan_sheet = config.PLAN_SHEET_NAME
@@ -675,14 +924,14 @@ class BotPolling:
         try:
             self.group_repo.append_group(chat_id, plan_sheet, start_date, tz)
             self.group_cache.add(chat_id)
-            send_message(
+            self.send_message(
                 chat.get("id"),
                 f"그룹이 등록되었습니다.\nchat_id={chat_id}\nplan_sheet={plan_sheet}\nstart_date={start_date}\ntimezone={tz}",
             )
             self.log_event(message, "/register_group", "ok", f"title={title}")
         except Exception as exc:  # noqa: BLE001
             logging.error("Failed to register group: %s", exc, exc_info=True)
-            send_message(chat.get("id"), "그룹 등록 중 오류가 발생했습니다. 나중에 다시 시도해주세요.")
+            self.send_message(chat.get("id"), "그룹 등록 중 오류가 발생했습니다. 나중에 다시 시도해주세요.")
             self.log_event(message, "/register_group", "error", str(exc))
 
     def handle_my_chat_member(self, member_update: dict) -> None:
@@ -739,7 +988,7 @@ class BotPolling:
             "• 건의사항: `/ask 알림이 안 와요`\n\n"
             "개인 퀘스트는 DM에서 /start_john 으로 시작할 수 있어요."
         )
-        send_message(chat.get("id"), welcome_text, reply_markup=WELCOME_INLINE_KEYBOARD)
+        self.send_message(chat.get("id"), welcome_text, reply_markup=WELCOME_INLINE_KEYBOARD)
 
     def log_event(self, message: dict, command: str, status: str, note: str = "") -> None:
         try:
@@ -764,8 +1013,21 @@ class BotPolling:
 
 
 def main() -> None:
+    if config.BOT_ENGINE == "async":
+        import bot_async
+
+        bot_async.main()
+        return
+
     bot = BotPolling()
-    bot.poll()
+    metrics.serve_from_config()
+    try:
+        bot.poll()
+    finally:
+        if bot.dispatcher:
+            bot.dispatcher.close()
+        bot.close_storage()
+        telegram_client.get_client().close()
 
 
 if __name__ == "__main__":
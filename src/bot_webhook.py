@@ -0,0 +1,236 @@
+"""Webhook entry point: Telegram POSTs updates instead of us long-polling.
+
+Accepted updates go into a bounded queue that a single feeder thread hands
+to ``BotPolling.handle_updates``, i.e. the same per-chat worker pool the
+polling loop uses. When the queue is full the server answers 429 so
+Telegram retries later; once shutdown starts it answers 503 and drains
+what was already accepted before exiting.
+
+Run the server:
+    python src/bot_webhook.py
+
+Replay recorded updates (one JSON update per line, or a getUpdates
+response) against a running server, acting as a local fake Telegram:
+    python src/bot_webhook.py --replay updates.jsonl [--url http://127.0.0.1:8443/telegram]
+"""
+import argparse
+import hmac
+import ipaddress
+import json
+import logging
+import queue
+import signal
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, List, Dict, Any
+
+import requests
+
+import config
+import metrics
+import telegram_client
+from bot_polling import BotPolling
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def check_secret(host: str, secret: str) -> None:
+    """Refuse to accept unauthenticated updates from anywhere but this machine."""
+    if not secret and not is_loopback(host):
+        raise ValueError(
+            f"WEBHOOK_SECRET must be set when the webhook listens on {host}; "
+            "without it anyone who can reach the port can post updates as any user"
+        )
+
+
+class WebhookServer:
+    def __init__(
+        self,
+        bot: BotPolling,
+        host: str = "0.0.0.0",
+        port: int = 8443,
+        path: str = "/telegram",
+        secret: str = "",
+        queue_size: int = 1000,
+    ) -> None:
+        check_secret(host, secret)
+        if not secret:
+            logging.warning("WEBHOOK_SECRET is not set; accepting unauthenticated updates on %s", host)
+        self.bot = bot
+        self.path = path
+        self.secret = secret
+        self.queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=queue_size)
+        self.draining = False
+        self.stats = {"accepted": 0, "rejected_full": 0, "rejected_draining": 0, "unauthorized": 0}
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+        self._feeder = threading.Thread(target=self._feed, name="webhook-feeder", daemon=True)
+        metrics.registry.register_gauge("webhook_queue_depth", self.queue.qsize)
+
+    def _make_handler(self) -> type:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:  # noqa: N802
+                if self.path != server.path:
+                    self._reply(404)
+                    return
+                if server.secret and not hmac.compare_digest(
+                    self.headers.get(SECRET_HEADER, "").encode(), server.secret.encode()
+                ):
+                    server.stats["unauthorized"] += 1
+                    self._reply(401)
+                    return
+                if server.draining:
+                    server.stats["rejected_draining"] += 1
+                    self._reply(503)
+                    return
+                try:
+                    length = int(self.headers.get("Content-Length", "0"))
+                    update = json.loads(self.rfile.read(length))
+                except ValueError:
+                    self._reply(400)
+                    return
+                try:
+                    server.queue.put_nowait(update)
+                except queue.Full:
+                    server.stats["rejected_full"] += 1
+                    self._reply(429, retry_after=1)
+                    return
+                server.stats["accepted"] += 1
+                self._reply(200)
+
+            def _reply(self, status: int, retry_after: Optional[int] = None) -> None:
+                self.send_response(status)
+                if retry_after is not None:
+                    self.send_header("Retry-After", str(retry_after))
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+                logging.debug("webhook: " + format, *args)
+
+        return Handler
+
+    def _feed(self) -> None:
+        while True:
+            update = self.queue.get()
+            try:
+                if update is None:
+                    return
+                self.bot.handle_updates([update])
+            except Exception as exc:  # noqa: BLE001
+                logging.error("Error dispatching webhook update: %s", exc, exc_info=True)
+            finally:
+                self.queue.task_done()
+
+    def serve_forever(self) -> None:
+        self._feeder.start()
+        logging.info("Webhook listening on %s:%s%s", *self.httpd.server_address[:2], self.path)
+        self.httpd.serve_forever()
+
+    def shutdown(self) -> None:
+        """Stop accepting updates, then finish everything already accepted."""
+        self.draining = True
+        self.httpd.shutdown()
+        self.queue.join()
+        self.queue.put(None)
+        self._feeder.join()
+        if self.bot.dispatcher:
+            self.bot.dispatcher.close()
+        self.httpd.server_close()
+        logging.info("Webhook drained: %s", self.stats)
+
+
+def set_webhook(url: str, secret: str) -> None:
+    payload: Dict[str, Any] = {"url": url}
+    if secret:
+        payload["secret_token"] = secret
+    response = telegram_client.get_client().post("setWebhook", json=payload)
+    response.raise_for_status()
+    logging.info("Webhook registered at %s", url)
+
+
+def load_recorded_updates(path: str) -> List[Dict[str, Any]]:
+    """Read updates saved one-per-line, or as a whole getUpdates response."""
+    with open(path, encoding="utf-8") as f:
+        text = f.read().strip()
+    if text.startswith("["):
+        return json.loads(text)
+    if "\n" not in text:
+        data = json.loads(text)
+        return data["result"] if "result" in data else [data]
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def replay_updates(url: str, updates: List[Dict[str, Any]], secret: str = "") -> Dict[int, int]:
+    """POST updates the way Telegram would, retrying on 429; returns status counts."""
+    headers = {SECRET_HEADER: secret} if secret else {}
+    counts: Dict[int, int] = {}
+    for update in updates:
+        while True:
+            response = requests.post(url, json=update, headers=headers, timeout=config.REQUEST_TIMEOUT)
+            counts[response.status_code] = counts.get(response.status_code, 0) + 1
+            if response.status_code != 429:
+                break
+            time.sleep(int(response.headers.get("Retry-After", "1")))
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--replay", metavar="FILE", help="POST recorded updates to a running server")
+    parser.add_argument("--url", default=f"http://127.0.0.1:{config.WEBHOOK_PORT}{config.WEBHOOK_PATH}")
+    args = parser.parse_args()
+
+    if args.replay:
+        counts = replay_updates(args.url, load_recorded_updates(args.replay), config.WEBHOOK_SECRET)
+        logging.info("Replay finished: %s", counts)
+        return
+
+    try:
+        check_secret(config.WEBHOOK_HOST, config.WEBHOOK_SECRET)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    bot = BotPolling()
+    server = WebhookServer(
+        bot,
+        host=config.WEBHOOK_HOST,
+        port=config.WEBHOOK_PORT,
+        path=config.WEBHOOK_PATH,
+        secret=config.WEBHOOK_SECRET,
+        queue_size=config.WEBHOOK_QUEUE_SIZE,
+    )
+    metrics.serve_from_config()
+    if config.WEBHOOK_URL:
+        set_webhook(config.WEBHOOK_URL, config.WEBHOOK_SECRET)
+
+    stopper = threading.Thread(target=server.shutdown, name="webhook-shutdown")
+
+    def stop(signum: int, frame: Any) -> None:
+        # httpd.shutdown() blocks until serve_forever returns, so run it elsewhere.
+        if not stopper.is_alive() and not server.draining:
+            stopper.start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    try:
+        server.serve_forever()
+        stopper.join()
+    finally:
+        bot.close_storage()
+
+
+if __name__ == "__main__":
+    main()
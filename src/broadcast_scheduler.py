@@ -0,0 +1,225 @@
+"""Resident replacement for running daily_broadcast.py from cron.
+
+Groups are loaded once and kept in a min-heap ordered by each group's next
+send time (its minute-precise ``notification_time`` in its own timezone).
+The process sleeps until the earliest entry is due, sends everything due
+through the same prepare/deliver path as ``daily_broadcast.main``, and
+pushes each group's next occurrence. The groups sheet is re-read every
+``SCHEDULER_RESYNC_SECONDS``; when it changed the heap is rebuilt.
+
+    python src/broadcast_scheduler.py
+"""
+import datetime
+import heapq
+import itertools
+import logging
+import threading
+import time
+from typing import Optional, List, Dict, Any, Tuple
+
+import config
+import daily_broadcast
+import metrics
+from google_sheets_client import GoogleSheetsClient
+from plan_repository import PlanRepository
+from rate_limiter import TelegramRateLimiter
+from retry import RetryPolicy
+from sent_ledger import SentLedger
+
+HeapEntry = Tuple[datetime.datetime, int, Dict[str, Any]]
+
+
+def parse_notification_time(value: str) -> datetime.time:
+    try:
+        return datetime.datetime.strptime(value.strip(), "%H:%M").time()
+    except (ValueError, AttributeError):
+        logging.warning("Invalid notification_time %r; using 08:00", value)
+        return datetime.time(8, 0)
+
+
+def next_fire_time(
+    notification_time: str,
+    tz: Optional[datetime.tzinfo],
+    after: datetime.datetime,
+    grace: float = 0,
+) -> datetime.datetime:
+    """Earliest local occurrence of notification_time not before ``after - grace``."""
+    at = parse_notification_time(notification_time)
+    tz = tz or after.astimezone().tzinfo
+    local_after = after.astimezone(tz)
+    earliest = local_after - datetime.timedelta(seconds=grace)
+    date = local_after.date()
+    while True:
+        # Combining per date keeps the wall-clock time right across DST changes.
+        candidate = datetime.datetime.combine(date, at, tzinfo=tz)
+        if candidate >= earliest:
+            return candidate.astimezone(datetime.timezone.utc)
+        date += datetime.timedelta(days=1)
+
+
+# Pause after an unexpected error in the loop before the next pass
+ERROR_BACKOFF_SECONDS = 5.0
+
+
+class BroadcastScheduler:
+    def __init__(
+        self,
+        sheets_client: GoogleSheetsClient,
+        resync_interval: float = 300,
+        grace: float = 60,
+        plan_ttl: float = 3600,
+        ledger: Optional[SentLedger] = None,
+    ) -> None:
+        self.sheets_client = sheets_client
+        self.ledger = ledger
+        self.resync_interval = resync_interval
+        self.grace = grace
+        self.plan_ttl = plan_ttl
+        self.limiter = TelegramRateLimiter(
+            global_rate=config.TELEGRAM_GLOBAL_RATE,
+            per_chat_rate=config.TELEGRAM_CHAT_RATE,
+            per_group_per_minute=config.TELEGRAM_GROUP_PER_MINUTE,
+        )
+        self.plan_repos: Dict[str, PlanRepository] = {}
+        self._plans_loaded_at = 0.0
+        self._heap: List[HeapEntry] = []
+        self._seq = itertools.count()
+        self._signature: Optional[Tuple[Any, ...]] = None
+        self._next_resync = 0.0
+        self._stop = threading.Event()
+
+    @staticmethod
+    def _signature_of(groups: List[Dict[str, Any]]) -> Tuple[Any, ...]:
+        return tuple(
+            (g["chat_id"], g["plan_sheet"], g["start_date"], str(g["timezone"]), g["notification_time"])
+            for g in groups
+        )
+
+    def resync(self, now: datetime.datetime) -> None:
+        """Reload the groups sheet and rebuild the heap if anything changed."""
+        self._next_resync = time.monotonic() + self.resync_interval
+        try:
+            groups = daily_broadcast.load_groups(self.sheets_client)
+        except Exception:
+            logging.error("Failed to reload groups; keeping current schedule", exc_info=True)
+            return
+        signature = self._signature_of(groups)
+        if signature == self._signature:
+            return
+        first_sync = self._signature is None
+        self._signature = signature
+        # On the first load allow a little grace so a restart right at the
+        # send minute still sends; later rebuilds only schedule the future.
+        grace = self.grace if first_sync else 0
+        self._heap = [
+            (next_fire_time(g["notification_time"], g["timezone"], now, grace), next(self._seq), g)
+            for g in groups
+        ]
+        heapq.heapify(self._heap)
+        logging.info("Scheduled %s groups; next send at %s", len(self._heap), self.next_due())
+
+    def next_due(self) -> Optional[datetime.datetime]:
+        return self._heap[0][0] if self._heap else None
+
+    def _plans(self) -> Dict[str, PlanRepository]:
+        if time.monotonic() - self._plans_loaded_at > self.plan_ttl:
+            self.plan_repos.clear()
+            self._plans_loaded_at = time.monotonic()
+        return self.plan_repos
+
+    def fire_due(self, now: datetime.datetime) -> List[Dict[str, Any]]:
+        """Send to every group that is due and reschedule them."""
+        due: List[HeapEntry] = []
+        while self._heap and self._heap[0][0] <= now:
+            due.append(heapq.heappop(self._heap))
+        if not due:
+            return []
+
+        plan_repos = self._plans()
+        jobs = []
+        for fire_at, _, group in due:
+            # Reschedule first: a group whose job fails to build must still
+            # be on the heap for tomorrow.
+            following = next_fire_time(
+                group["notification_time"], group["timezone"], fire_at + datetime.timedelta(seconds=1)
+            )
+            heapq.heappush(self._heap, (following, next(self._seq), group))
+            try:
+                job = daily_broadcast.prepare_job(
+                    group, now, self.sheets_client, plan_repos, force_send=True
+                )
+            except Exception:
+                logging.error("Failed to prepare broadcast for chat_id=%s", group["chat_id"], exc_info=True)
+                continue
+            if job and daily_broadcast.DRY_RUN:
+                logging.info("[DRY_RUN] Would send day %s to chat_id=%s", job["day"], job["chat_id_raw"])
+            elif job:
+                jobs.append(job)
+
+        results = daily_broadcast.run_broadcast(
+            jobs, self.limiter, workers=config.BROADCAST_WORKERS, ledger=self.ledger
+        )
+        for r in results:
+            logging.info(
+                "Broadcast result chat_id=%s day=%s status=%s elapsed=%.2fs",
+                r["chat_id"], r["day"], r["status"], r["elapsed"],
+            )
+        return results
+
+    def run(self) -> None:
+        while not self._stop.is_set():
+            now = datetime.datetime.now(datetime.timezone.utc)
+            try:
+                # Fire before a resync so a rebuilt heap cannot skip a due group.
+                self.fire_due(now)
+                if time.monotonic() >= self._next_resync:
+                    self.resync(now)
+                    self.fire_due(now)
+            except Exception:
+                logging.error("Scheduler pass failed; retrying in %ss", ERROR_BACKOFF_SECONDS, exc_info=True)
+                self._stop.wait(ERROR_BACKOFF_SECONDS)
+                continue
+
+            sleep_for = self._next_resync - time.monotonic()
+            due = self.next_due()
+            if due is not None:
+                until_due = (due - datetime.datetime.now(datetime.timezone.utc)).total_seconds()
+                sleep_for = min(sleep_for, until_due)
+            self._stop.wait(max(0.0, sleep_for))
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+def main() -> None:
+    sheets_client = GoogleSheetsClient(
+        spreadsheet_id=config.SPREADSHEET_ID,
+        credentials_file=config.service_account_file(),
+        retry_policy=RetryPolicy(
+            max_attempts=config.RETRY_MAX_ATTEMPTS,
+            base_delay=config.RETRY_BASE_DELAY,
+            max_delay=config.RETRY_MAX_DELAY,
+            deadline=config.SHEETS_CALL_DEADLINE,
+        ),
+    )
+    scheduler = BroadcastScheduler(
+        sheets_client,
+        resync_interval=config.SCHEDULER_RESYNC_SECONDS,
+        grace=config.SCHEDULER_GRACE_SECONDS,
+        plan_ttl=config.SCHEDULER_PLAN_TTL_SECONDS,
+        ledger=None if daily_broadcast.IGNORE_LEDGER else SentLedger(
+            config.SENT_LEDGER_PATH, claim_timeout=config.SENT_LEDGER_CLAIM_TIMEOUT_SECONDS
+        ),
+    )
+    metrics.serve_from_config()
+    try:
+        scheduler.run()
+    except KeyboardInterrupt:
+        scheduler.stop()
+    finally:
+        if scheduler.ledger is not None:
+            scheduler.ledger.close()
+
+
+if __name__ == "__main__":
+    main()
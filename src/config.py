@@ -26,37 +26,65 @@ TELEGRAM_BOT_TOKEN: str = _get_env_or_raise("TELEGRAM_BOT_TOKEN")
 
 GOOGLE_SERVICE_ACCOUNT_FILE: str = os.environ.get("GOOGLE_SERVICE_ACCOUNT_FILE", "")
 
-# 1. Check if file exists as-is
-if not os.path.exists(GOOGLE_SERVICE_ACCOUNT_FILE):
-    # 2. Check in config/ directory using BASE_DIR
-    _config_dir = os.path.join(BASE_DIR, "config")
-    _candidate = os.path.join(_config_dir, GOOGLE_SERVICE_ACCOUNT_FILE)
-    
-    if os.path.exists(_candidate):
-        GOOGLE_SERVICE_ACCOUNT_FILE = _candidate
-    else:
-        # 3. Fallback: Find any json file in config/ that looks like a key
-        _found = False
-        if os.path.exists(_config_dir):
-            for _f in os.listdir(_config_dir):
-                if _f.endswith(".json") and "readtogether" in _f:
-                    GOOGLE_SERVICE_ACCOUNT_FILE = os.path.join(_config_dir, _f)
-                    _found = True
-                    break
-        
-        if not _found:
-            print(f"!! Critical Error: Service Account Key file not found.")
-            print(f"   - Env var value: '{os.environ.get('GOOGLE_SERVICE_ACCOUNT_FILE')}'")
-            print(f"   - Searched in: {_config_dir}")
-
-if not GOOGLE_SERVICE_ACCOUNT_FILE:
-     raise RuntimeError("GOOGLE_SERVICE_ACCOUNT_FILE not set or file not found.")
+_service_account_file: Optional[str] = None
+
+
+def service_account_file() -> str:
+    """Resolve the service account key file on first use.
+
+    Checked in order: the env value as given, the same name under config/,
+    then any ``*readtogether*.json`` in config/. Resolution is deferred so
+    importing config never scans directories.
+    """
+    global _service_account_file
+    if _service_account_file is not None:
+        return _service_account_file
+
+    # 1. Check if file exists as-is
+    path = GOOGLE_SERVICE_ACCOUNT_FILE
+    if not os.path.isfile(path):
+        # 2. Check in config/ directory using BASE_DIR
+        config_dir = os.path.join(BASE_DIR, "config")
+        candidate = os.path.join(config_dir, path)
+
+        if path and os.path.isfile(candidate):
+            path = candidate
+        else:
+            # 3. Fallback: Find any json file in config/ that looks like a key
+            found = False
+            if os.path.exists(config_dir):
+                for name in os.listdir(config_dir):
+                    if name.endswith(".json") and "readtogether" in name:
+                        path = os.path.join(config_dir, name)
+                        found = True
+                        break
+
+            if not found:
+                print(f"!! Critical Error: Service Account Key file not found.")
+                print(f"   - Env var value: '{os.environ.get('GOOGLE_SERVICE_ACCOUNT_FILE')}'")
+                print(f"   - Searched in: {config_dir}")
+
+    if not path:
+        raise RuntimeError("GOOGLE_SERVICE_ACCOUNT_FILE not set or file not found.")
+    _service_account_file = path
+    return path
+
 
 SPREADSHEET_ID: str = _get_env_or_raise("SPREADSHEET_ID")
 
 PLAN_SHEET_NAME: str = os.environ.get("PLAN_SHEET_NAME", "plan")
 PROGRESS_SHEET_NAME: str = os.environ.get("PROGRESS_SHEET_NAME", "progress")
 GROUPS_SHEET_NAME: str = os.environ.get("GROUPS_SHEET_NAME", "groups")
+PROGRESS_MISS_TTL: float = float(os.environ.get("PROGRESS_MISS_TTL_SECONDS", "30"))
+# Shard progress across tabs by crc32(user_id) (see progress_shards.py): a
+# number N for tabs "<PROGRESS_SHEET_NAME>_0".."_<N-1>", or a comma-separated
+# list of tabs, each optionally "<spreadsheet_id>:<tab>". Empty keeps one tab.
+# Run src/rebalance_progress.py after changing it.
+PROGRESS_SHARDS: str = os.environ.get("PROGRESS_SHARDS", "")
+# Reconcile the progress index with hand edits to the sheet (0 disables)
+PROGRESS_SYNC_INTERVAL: float = float(os.environ.get("PROGRESS_SYNC_INTERVAL_SECONDS", "300"))
+GROUPS_CACHE_TTL: float = float(os.environ.get("GROUPS_CACHE_TTL_SECONDS", "300"))
+GROUPS_MISS_TTL: float = float(os.environ.get("GROUPS_MISS_TTL_SECONDS", "30"))
 GROUPS_FROM_SHEET: bool = os.environ.get("GROUPS_FROM_SHEET", "false").lower() == "true"
 LOG_SHEET_NAME: str = os.environ.get("LOG_SHEET_NAME", "logs")
 
@@ -68,11 +96,112 @@ START_DATE: datetime.date = datetime.datetime.strptime(
 TIMEZONE_NAME: str = os.environ.get("TIMEZONE", "Asia/Seoul")
 TIMEZONE = ZoneInfo(TIMEZONE_NAME) if ZoneInfo else None
 
-TELEGRAM_API_BASE_URL: str = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}"
+# Overridable so the bot can be pointed at a local Bot API server (or bench/fake_telegram.py)
+TELEGRAM_API_ROOT: str = os.environ.get("TELEGRAM_API_ROOT", "https://api.telegram.org").rstrip("/")
+TELEGRAM_API_BASE_URL: str = f"{TELEGRAM_API_ROOT}/bot{TELEGRAM_BOT_TOKEN}"
 
 REQUEST_TIMEOUT: int = int(os.environ.get("REQUEST_TIMEOUT_SECONDS", "15"))
 POLL_TIMEOUT: int = int(os.environ.get("POLL_TIMEOUT_SECONDS", "20"))
 BOT_USERNAME: str = os.environ.get("BOT_USERNAME", "")
 
+# Local state (log spill, caches, ledgers) lives here
+DATA_DIR: str = os.environ.get("DATA_DIR", os.path.join(BASE_DIR, "data"))
+
+# Shared Telegram HTTP session (see telegram_client.py)
+TELEGRAM_POOL_SIZE: int = int(os.environ.get("TELEGRAM_POOL_SIZE", "20"))
+# Per-method overrides, e.g. "sendPhoto=30,getMe=5"
+TELEGRAM_METHOD_TIMEOUTS: str = os.environ.get("TELEGRAM_METHOD_TIMEOUTS", "")
+
+# Start polling right away and load bot info, plan and groups in the background
+BOT_FAST_START: bool = os.environ.get("BOT_FAST_START", "false").lower() == "true"
+
+# "sync" (thread pool around blocking requests) or "async" (asyncio + httpx)
+BOT_ENGINE: str = os.environ.get("BOT_ENGINE", "sync").lower()
+
+# Parallel update handling (see UpdateDispatcher); 0 handles updates serially
+BOT_WORKERS: int = int(os.environ.get("BOT_WORKERS", "4"))
+BOT_WORKER_QUEUE_SIZE: int = int(os.environ.get("BOT_WORKER_QUEUE_SIZE", "1000"))
+
+# Repeated taps on the same inline button within this window run once (see debouncer.py)
+CALLBACK_DEBOUNCE_SECONDS: float = float(os.environ.get("CALLBACK_DEBOUNCE_SECONDS", "2"))
+
+# Webhook mode (src/bot_webhook.py)
+WEBHOOK_URL: str = os.environ.get("WEBHOOK_URL", "")  # public URL registered via setWebhook
+WEBHOOK_HOST: str = os.environ.get("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT: int = int(os.environ.get("WEBHOOK_PORT", "8443"))
+WEBHOOK_PATH: str = os.environ.get("WEBHOOK_PATH", "/telegram")
+# Required unless WEBHOOK_HOST is a loopback address (see bot_webhook.check_secret)
+WEBHOOK_SECRET: str = os.environ.get("WEBHOOK_SECRET", "")
+WEBHOOK_QUEUE_SIZE: int = int(os.environ.get("WEBHOOK_QUEUE_SIZE", "1000"))
+
+# Broadcast fan-out and Telegram send limits (see rate_limiter.py)
+BROADCAST_WORKERS: int = int(os.environ.get("BROADCAST_WORKERS", "8"))
+TELEGRAM_GLOBAL_RATE: float = float(os.environ.get("TELEGRAM_GLOBAL_RATE", "30"))
+TELEGRAM_CHAT_RATE: float = float(os.environ.get("TELEGRAM_CHAT_RATE", "1"))
+TELEGRAM_GROUP_PER_MINUTE: float = float(os.environ.get("TELEGRAM_GROUP_PER_MINUTE", "20"))
+
+# Resident broadcast scheduler (src/broadcast_scheduler.py)
+SCHEDULER_RESYNC_SECONDS: float = float(os.environ.get("SCHEDULER_RESYNC_SECONDS", "300"))
+SCHEDULER_GRACE_SECONDS: float = float(os.environ.get("SCHEDULER_GRACE_SECONDS", "60"))
+SCHEDULER_PLAN_TTL_SECONDS: float = float(os.environ.get("SCHEDULER_PLAN_TTL_SECONDS", "3600"))
+
+# Group "아멘 / 읽음" taps and /stats (see read_stats.py)
+READ_STATS_PATH: str = os.environ.get("READ_STATS_PATH", os.path.join(DATA_DIR, "read_stats.json"))
+READ_STATS_RETENTION_DAYS: int = int(os.environ.get("READ_STATS_RETENTION_DAYS", "90"))
+READ_STATS_CHECKPOINT_SECONDS: float = float(os.environ.get("READ_STATS_CHECKPOINT_SECONDS", "30"))
+
+# Exactly-once daily delivery (see sent_ledger.py)
+SENT_LEDGER_PATH: str = os.environ.get("SENT_LEDGER_PATH", os.path.join(DATA_DIR, "sent_ledger.sqlite3"))
+# A "sending" claim older than this is assumed to belong to a run that died mid-send.
+SENT_LEDGER_CLAIM_TIMEOUT_SECONDS: float = float(os.environ.get("SENT_LEDGER_CLAIM_TIMEOUT_SECONDS", "600"))
+
+# On-disk plan snapshots shared by the bot and broadcasts (see PlanRepository);
+# empty disables them. Broadcasts wait up to PLAN_SNAPSHOT_MAX_WAIT seconds for
+# the snapshot to be revalidated against Sheets before sending.
+PLAN_SNAPSHOT_DIR: str = os.environ.get("PLAN_SNAPSHOT_DIR", os.path.join(DATA_DIR, "plan_snapshots"))
+PLAN_SNAPSHOT_MAX_WAIT: float = float(os.environ.get("PLAN_SNAPSHOT_MAX_WAIT_SECONDS", "10"))
+
+# Storage backend: "sheets" (Google Sheets directly) or "sqlite" (local
+# database, with Sheets as an asynchronous mirror; see sqlite_storage.py)
+STORAGE_BACKEND: str = os.environ.get("STORAGE_BACKEND", "sheets").lower()
+SQLITE_PATH: str = os.environ.get("SQLITE_PATH", os.path.join(DATA_DIR, "bot.sqlite3"))
+SQLITE_MIRROR_TO_SHEETS: bool = os.environ.get("SQLITE_MIRROR_TO_SHEETS", "true").lower() == "true"
+SQLITE_MIRROR_INTERVAL: float = float(os.environ.get("SQLITE_MIRROR_INTERVAL_SECONDS", "2"))
+
+# Plan sheets kept in memory by the bot (see plan_registry.py)
+PLAN_REGISTRY_SIZE: int = int(os.environ.get("PLAN_REGISTRY_SIZE", "16"))
+PLAN_REGISTRY_TTL: float = float(os.environ.get("PLAN_REGISTRY_TTL_SECONDS", "3600"))
+
+# Telegram file_id cache for broadcast images (see photo_cache.py)
+PHOTO_CACHE_PATH: str = os.environ.get("PHOTO_CACHE_PATH", os.path.join(DATA_DIR, "photo_file_ids.json"))
+PHOTO_CACHE_URL_MAX_AGE: float = float(os.environ.get("PHOTO_CACHE_URL_MAX_AGE_SECONDS", str(7 * 24 * 3600)))
+
+# Retries for Telegram and Sheets calls (see retry.py)
+RETRY_MAX_ATTEMPTS: int = int(os.environ.get("RETRY_MAX_ATTEMPTS", "5"))
+RETRY_BASE_DELAY: float = float(os.environ.get("RETRY_BASE_DELAY_SECONDS", "0.5"))
+RETRY_MAX_DELAY: float = float(os.environ.get("RETRY_MAX_DELAY_SECONDS", "30"))
+TELEGRAM_SEND_DEADLINE: float = float(os.environ.get("TELEGRAM_SEND_DEADLINE_SECONDS", "120"))
+SHEETS_CALL_DEADLINE: float = float(os.environ.get("SHEETS_CALL_DEADLINE_SECONDS", "60"))
+
+# Write-behind batching of Sheets writes (bot only; see GoogleSheetsClient)
+SHEETS_WRITE_BEHIND: bool = os.environ.get("SHEETS_WRITE_BEHIND", "true").lower() == "true"
+SHEETS_FLUSH_INTERVAL: float = float(os.environ.get("SHEETS_FLUSH_INTERVAL_SECONDS", "2"))
+SHEETS_BATCH_SIZE: int = int(os.environ.get("SHEETS_BATCH_SIZE", "50"))
+SHEETS_MAX_PENDING_WRITES: int = int(os.environ.get("SHEETS_MAX_PENDING_WRITES", "1000"))
+
+# Buffered log sink (see LogRepository)
+LOG_FLUSH_SIZE: int = int(os.environ.get("LOG_FLUSH_SIZE", "20"))
+LOG_FLUSH_INTERVAL: float = float(os.environ.get("LOG_FLUSH_INTERVAL_SECONDS", "5"))
+LOG_BUFFER_SIZE: int = int(os.environ.get("LOG_BUFFER_SIZE", "1000"))
+LOG_SPILL_PATH: str = os.environ.get("LOG_SPILL_PATH", os.path.join(DATA_DIR, "logs_spill.jsonl"))
+
+# Instrumentation (see metrics.py). The bot and the scheduler serve /metrics on
+# METRICS_HOST:METRICS_PORT (0 disables); daily_broadcast.py writes the metrics
+# to METRICS_DUMP_PATH when it finishes, or logs a summary if that is empty.
+METRICS_ENABLED: bool = os.environ.get("METRICS_ENABLED", "true").lower() == "true"
+METRICS_HOST: str = os.environ.get("METRICS_HOST", "127.0.0.1")
+METRICS_PORT: int = int(os.environ.get("METRICS_PORT", "9464"))
+METRICS_DUMP_PATH: str = os.environ.get("METRICS_DUMP_PATH", "")
+
 # Note: Group configuration is now handled exclusively via Google Sheets (GroupRepository).
 # TELEGRAM_GROUP_CHAT_IDS and TELEGRAM_GROUP_CONFIG are deprecated.
@@ -4,6 +4,9 @@ PROGRESS_SHEET_NAME = "progress"
 GROUPS_SHEET_NAME = "groups"
 LOG_SHEET_NAME = "logs"
 
+# Length of the reading plan (progress is shown as n/TOTAL_DAYS)
+TOTAL_DAYS = 66
+
 # Column Headers (Plan Sheet)
 COL_DAY = "Day"
 COL_REF = "Ref"
@@ -43,6 +46,12 @@ MSG_NOT_STARTED = "아직 요한복음 퀘스트를 시작하지 않으셨습니
 MSG_STATUS_HEADER = "🔎 나의 요한복음 퀘스트 현황\n\n"
 MSG_STATUS_BODY = "- 완료한 퀘스트: DAY {finished_day}\n- 다음 퀘스트: DAY {next_day} – {ref} ({title})"
 MSG_STATUS_FINISHED = "- 완료한 퀘스트: DAY {finished_day}\n이미 준비된 모든 퀘스트를 완료하셨습니다. 🎉"
+MSG_READ_RECORDED = "오늘 읽음으로 기록했어요. 🙏"
+MSG_READ_ALREADY_RECORDED = "오늘은 이미 읽음으로 기록되어 있어요."
+MSG_STATS_TODAY = "📊 오늘({date}) 읽은 분: {count}명\n"
+MSG_STATS_TOTAL = "누적 읽음: {total}회\n"
+MSG_STATS_LEADERS_HEADER = "\n🏆 읽음 순위\n"
+MSG_NEXT_ALREADY_TAKEN = "DAY {day} 다음 퀘스트는 이미 받으셨어요. 가장 최근 메시지에서 이어가 주세요."
 
 # Emojis
 EMOJI_REACTION = "👍"
@@ -1,17 +1,29 @@
 import datetime
+import json
 import logging
 import os
-import html
-from typing import Optional
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Dict, Any
 
 import requests
 
 import config
-import constants
+import telegram_client
 import utils
+import message_builder
+import metrics
+from message_builder import build_message  # noqa: F401  (re-exported)
+import retry
 from google_sheets_client import GoogleSheetsClient
+from retry import RetryPolicy
 from plan_repository import PlanRepository
 from group_repository import GroupRepository
+from photo_cache import PhotoCache, file_id_from_response, is_stale_file_id_error
+from rate_limiter import TelegramRateLimiter
+from sent_ledger import SentLedger
+from sqlite_storage import SqliteStorage
 
 logging.basicConfig(
     level=logging.INFO,
@@ -19,6 +31,8 @@ logging.basicConfig(
 )
 
 DRY_RUN = os.environ.get("DRY_RUN", "").lower() == "true"
+# Send even to groups the ledger says already got today's message
+IGNORE_LEDGER = os.environ.get("IGNORE_LEDGER", "").lower() == "true"
 
 
 def _now() -> datetime.datetime:
@@ -34,63 +48,27 @@ def calculate_day(today: datetime.datetime, start_date: datetime.date) -> Option
     return day_index + 1
 
 
-TOTAL_DAYS = 66  # Based on the screenshot (n/66)
-
-
-def build_message(plan_row: dict, day: int, youtube_link: str = "") -> str:
-    ref = html.escape(plan_row.get("ref", ""))
-    title = html.escape(plan_row.get("title", ""))
-    summary = html.escape(plan_row.get("summary", ""))
-    verse_text = html.escape(plan_row.get("verse_text", ""))
-    verse_ref = html.escape(plan_row.get("verse_ref", ""))
-    
-    # Calculate progress
-    progress_percent = int((day / TOTAL_DAYS) * 100)
-    
-    msg = f"[요한복음 함께 읽기 DAY {day}]\n\n"
-    msg += "오늘의 범위는\n"
-    msg += f"{constants.EMOJI_RAINBOW} <b>{ref} ({title})</b>입니다.\n\n"
-
-
-    if verse_text:
-        msg += f"📖 <b>오늘의 말씀</b>\n<blockquote>\"{verse_text}\"{verse_ref}</blockquote>\n\n"
-    
-    # Summary temporarily disabled
-    # msg += "📖 <b>무슨 내용인가요?</b>\n"
-    # msg += f"{summary}\n\n"
-
-    # Youtube link moved to References
-    # if youtube_link:
-    #     msg += f"🎧 <a href=\"{youtube_link}\">오늘 말씀 듣기 (Youtube)</a>\n\n"
-    
-    msg += "읽고 퀴즈를 내거나, 인상깊은 구절을 공유하는 등 자유롭게 인증해주세요. 🙌\n\n"
-    
-    msg += f"진도율 : {day}/{TOTAL_DAYS} ({progress_percent}% 완료!)\n\n"
-    
-    msg += f"📚 <b>참고자료</b>\n"
-    if youtube_link:
-        msg += f"{constants.EMOJI_HEADPHONE} <a href=\"{youtube_link}\">오늘 말씀 듣기 (Youtube)</a>\n"
-    msg += f'{constants.EMOJI_MAP} <a href="https://t.me/c/1829333998/244/361?single">[지도] 예수님 당시의 이스라엘</a>\n'
-    msg += f'{constants.EMOJI_COMPASS} <a href="http://www.biblemap.or.kr/biblemapMobile.html">성경 지도(추천)</a>\n'
-    msg += f'{constants.EMOJI_JOYSTICK} <a href="https://john.rtl.kr/">요한복음 기억하기 게임</a>'
-    
-    return msg
-
-
 def send_message(chat_id: str, text: str, message_thread_id: Optional[int] = None, reply_markup: Optional[dict] = None) -> None:
-    url = f"{config.TELEGRAM_API_BASE_URL}/sendMessage"
     payload = {"chat_id": chat_id, "text": text, "parse_mode": "HTML"}
     if message_thread_id is not None:
         payload["message_thread_id"] = message_thread_id
     if reply_markup:
         payload["reply_markup"] = reply_markup
-    response = requests.post(url, json=payload, timeout=config.REQUEST_TIMEOUT)
+    response = telegram_client.get_client().post("sendMessage", json=payload)
     response.raise_for_status()
 
 
+_photo_cache: Optional[PhotoCache] = None
+
+
+def get_photo_cache() -> PhotoCache:
+    global _photo_cache
+    if _photo_cache is None:
+        _photo_cache = PhotoCache(config.PHOTO_CACHE_PATH, url_max_age=config.PHOTO_CACHE_URL_MAX_AGE)
+    return _photo_cache
+
+
 def send_photo(chat_id: str, photo_url: str, caption: str, message_thread_id: Optional[int] = None, reply_markup: Optional[dict] = None) -> None:
-    url = f"{config.TELEGRAM_API_BASE_URL}/sendPhoto"
-    
     # Handle local file paths
     if photo_url.startswith("file://"):
         photo_path = photo_url[7:]  # Strip 'file://'
@@ -98,8 +76,76 @@ def send_photo(chat_id: str, photo_url: str, caption: str, message_thread_id: Op
         photo_path = photo_url
     else:
         photo_path = None
+    if photo_path and not os.path.exists(photo_path):
+        photo_path = None
+
+    cache = get_photo_cache()
+    source = photo_path or photo_url
+    fingerprint = cache.fingerprint(source, photo_path)
+
+    if _send_cached_photo(cache, source, fingerprint, chat_id, caption, message_thread_id, reply_markup):
+        return
+    # Only the first send of an image uploads it; concurrent sends of the
+    # same image wait here and then reuse the file_id it produced.
+    with cache.source_lock(source):
+        if _send_cached_photo(cache, source, fingerprint, chat_id, caption, message_thread_id, reply_markup):
+            return
+        response = _upload_photo(chat_id, photo_path, photo_url, caption, message_thread_id, reply_markup)
+        response.raise_for_status()
+        # The photo is posted; failing to cache its file_id must not fail the send.
+        try:
+            file_id = file_id_from_response(response.json())
+            if file_id:
+                cache.put(source, fingerprint, file_id)
+        except Exception:
+            logging.warning("Sent %s but could not cache its file_id", source, exc_info=True)
+
+
+def _send_cached_photo(
+    cache: PhotoCache,
+    source: str,
+    fingerprint: str,
+    chat_id: str,
+    caption: str,
+    message_thread_id: Optional[int],
+    reply_markup: Optional[dict],
+) -> bool:
+    """Send by cached file_id; False when there is none or Telegram rejects it."""
+    file_id = cache.get(source, fingerprint)
+    if not file_id:
+        return False
+    payload = {"chat_id": chat_id, "photo": file_id, "caption": caption, "parse_mode": "HTML"}
+    if message_thread_id is not None:
+        payload["message_thread_id"] = message_thread_id
+    if reply_markup:
+        payload["reply_markup"] = reply_markup
+    response = telegram_client.get_client().post("sendPhoto", json=payload)
+    if response.status_code == 400 and _stale_file_id(response):
+        # Telegram no longer knows this file_id; upload it again. Other 400s
+        # (caption too long, bad HTML, bad thread) would fail the upload too.
+        logging.warning("Cached file_id for %s was rejected; re-uploading", source)
+        cache.forget(source)
+        return False
+    response.raise_for_status()
+    return True
+
 
-    if photo_path and os.path.exists(photo_path):
+def _stale_file_id(response: requests.Response) -> bool:
+    try:
+        return is_stale_file_id_error(response.json())
+    except ValueError:
+        return False
+
+
+def _upload_photo(
+    chat_id: str,
+    photo_path: Optional[str],
+    photo_url: str,
+    caption: str,
+    message_thread_id: Optional[int],
+    reply_markup: Optional[dict],
+) -> requests.Response:
+    if photo_path:
         # Send local file
         with open(photo_path, "rb") as f:
             files = {"photo": f}
@@ -108,142 +154,317 @@ def send_photo(chat_id: str, photo_url: str, caption: str, message_thread_id: Op
                 data["message_thread_id"] = str(message_thread_id)
             if reply_markup:
                 data["reply_markup"] = json.dumps(reply_markup)
-            
-            response = requests.post(url, data=data, files=files, timeout=config.REQUEST_TIMEOUT + 10)
-            response.raise_for_status()
+
+            return telegram_client.get_client().post("sendPhoto", data=data, files=files)
+
+    # Send URL (convert if Google Drive)
+    final_photo_url = utils.convert_google_drive_url(photo_url)
+
+    payload = {
+        "chat_id": chat_id,
+        "photo": final_photo_url,
+        "caption": caption,
+        "parse_mode": "HTML"
+    }
+    if message_thread_id is not None:
+        payload["message_thread_id"] = message_thread_id
+    if reply_markup:
+        payload["reply_markup"] = reply_markup
+    return telegram_client.get_client().post("sendPhoto", json=payload)
+
+
+def load_groups(sheets_client: GoogleSheetsClient) -> List[Dict[str, Any]]:
+    """Read the groups sheet (or the bot's database) and fill in defaults from config."""
+    if config.STORAGE_BACKEND == "sqlite":
+        # The bot owns the groups table. With the Sheets client an empty or
+        # new database (another host, or the bot has not run yet) is first
+        # imported from the groups sheet instead of yielding no groups.
+        storage = SqliteStorage(config.SQLITE_PATH, sheets_client)
+        try:
+            raw_groups = storage.group_repository(config.GROUPS_SHEET_NAME).list_groups()
+        finally:
+            storage.close()
+        if not raw_groups:
+            logging.error(
+                "Groups table in %s is empty and the '%s' sheet had nothing to import",
+                config.SQLITE_PATH, config.GROUPS_SHEET_NAME,
+            )
     else:
-        # Send URL (convert if Google Drive)
-        final_photo_url = utils.convert_google_drive_url(photo_url)
-        
-        payload = {
-            "chat_id": chat_id, 
-            "photo": final_photo_url, 
-            "caption": caption, 
-            "parse_mode": "HTML"
+        raw_groups = GroupRepository(sheets_client, config.GROUPS_SHEET_NAME).list_groups()
+    return [
+        {
+            "chat_id": g["chat_id"],
+            "plan_sheet": g.get("plan_sheet") or config.PLAN_SHEET_NAME,
+            "start_date": g.get("start_date") or config.START_DATE,
+            "timezone": (
+                config.ZoneInfo(g["timezone"])
+                if g.get("timezone") and config.ZoneInfo
+                else config.TIMEZONE
+            ),
+            "notification_time": g.get("notification_time", "08:00"),
         }
-        if message_thread_id is not None:
-            payload["message_thread_id"] = message_thread_id
-        if reply_markup:
-            payload["reply_markup"] = reply_markup
-        response = requests.post(url, json=payload, timeout=config.REQUEST_TIMEOUT)
-        response.raise_for_status()
+        for g in raw_groups
+    ]
+
+
+def get_plan_repo(
+    plan_repos: Dict[str, PlanRepository],
+    sheets_client: GoogleSheetsClient,
+    plan_sheet: str,
+) -> PlanRepository:
+    """Return the repository for plan_sheet, loading it on first use.
+
+    A plan is served from its disk snapshot when there is one. The snapshot is
+    still revalidated before use, but for at most PLAN_SNAPSHOT_MAX_WAIT
+    seconds, so an unreachable Sheets API does not block the broadcast.
+    """
+    plan_repo = plan_repos.get(plan_sheet)
+    if plan_repo is None:
+        plan_repo = PlanRepository(sheets_client, plan_sheet, snapshot_dir=config.PLAN_SNAPSHOT_DIR or None)
+        if not plan_repo.wait_revalidated(config.PLAN_SNAPSHOT_MAX_WAIT):
+            logging.warning("Plan '%s' not revalidated in time; using snapshot %s", plan_sheet, plan_repo.version)
+        plan_repos[plan_sheet] = plan_repo
+    return plan_repo
+
+
+def prepare_job(
+    group: Dict[str, Any],
+    today: datetime.datetime,
+    sheets_client: GoogleSheetsClient,
+    plan_repos: Dict[str, PlanRepository],
+    force_send: bool = False,
+) -> Optional[Dict[str, Any]]:
+    """Work out what (if anything) a group should receive right now."""
+    chat_id_raw = group["chat_id"]
+    chat_id, thread_id = utils.parse_chat_destination(chat_id_raw)
+    start_date = group.get("start_date") or config.START_DATE
+    plan_sheet = group.get("plan_sheet") or config.PLAN_SHEET_NAME
+    tz = group.get("timezone") or config.TIMEZONE
+    notification_time = group.get("notification_time", "08:00")
+
+    now_local = datetime.datetime.now(tz=tz) if tz else today
+
+    # Time Check
+    if not force_send:
+        try:
+            target_hour = int(notification_time.split(":")[0])
+            current_server_time = datetime.datetime.now()
+            logging.debug(
+                "ChatID=%s, Timezone=%s. ServerTime=%s, LocalTime=%s. TargetHour=%s",
+                chat_id, tz, current_server_time, now_local, target_hour
+            )
+
+            if now_local.hour != target_hour:
+                logging.info(
+                    "Skipping chat_id=%s: Current hour %s (Loc: %s) != Target %s",
+                    chat_id, now_local.hour, now_local.strftime("%H:%M"), target_hour
+                )
+                return None
+        except Exception:
+            logging.warning("Invalid notification_time %s for chat_id=%s", notification_time, chat_id)
+
+    day = calculate_day(now_local, start_date)
+    if day is None:
+        logging.info(
+            "Start date is in the future for chat_id=%s; skipping.", chat_id
+        )
+        return None
+
+    plan_repo = get_plan_repo(plan_repos, sheets_client, plan_sheet)
+    plan_row = plan_repo.get_plan_by_day(day)
+    rendered = plan_repo.get_rendered(day, message_builder.MODE_BROADCAST)
+    if not plan_row or not rendered:
+        logging.warning(
+            "No plan found for day=%s in sheet=%s; chat_id=%s; nothing sent.",
+            day,
+            plan_sheet,
+            chat_id,
+        )
+        return None
+
+    return {
+        "chat_id_raw": chat_id_raw,
+        "chat_id": chat_id,
+        "thread_id": thread_id,
+        "day": day,
+        "local_date": now_local.date().isoformat(),
+        "plan_sheet": plan_sheet,
+        "start_date": start_date,
+        "message": rendered["text"],
+        "reply_markup": rendered["reply_markup"],
+        "image_url": plan_row.get("image_url", "").strip(),
+    }
+
+
+def deliver(job: Dict[str, Any]) -> None:
+    """Send one prepared job; returns once Telegram accepted it and raises otherwise."""
+    chat_id, thread_id = job["chat_id"], job["thread_id"]
+    if job["image_url"]:
+        logging.info("Attempting to send photo to %s. URL/Path: '%s'", chat_id, job["image_url"])
+        send_photo(chat_id, job["image_url"], job["message"], thread_id, job.get("reply_markup"))
+        logging.info(
+            "Sent day %s photo+message to chat_id=%s (sheet=%s)", job["day"], job["chat_id_raw"], job["plan_sheet"]
+        )
+    else:
+        send_message(chat_id, job["message"], thread_id, job.get("reply_markup"))
+        logging.info(
+            "Sent day %s message to chat_id=%s (sheet=%s)", job["day"], job["chat_id_raw"], job["plan_sheet"]
+        )
+
+
+def run_broadcast(
+    jobs: List[Dict[str, Any]],
+    limiter: TelegramRateLimiter,
+    workers: int = 8,
+    ledger: Optional[SentLedger] = None,
+) -> List[Dict[str, Any]]:
+    """Deliver jobs concurrently under the rate limiter; one result per job.
+
+    With a ledger, each job is claimed before sending; jobs already sent (or
+    being sent by an overlapping run) are reported as "already_sent", and a
+    failed send gives its claim back.
+    """
+
+    def skipped(job: Dict[str, Any], started: float) -> Dict[str, Any]:
+        logging.info(
+            "Day %s already sent to chat_id=%s on %s; skipping", job["day"], job["chat_id_raw"], job["local_date"]
+        )
+        metrics.registry.inc("broadcast_results_total", status="already_sent")
+        return {
+            "chat_id": job["chat_id_raw"],
+            "day": job["day"],
+            "waited": 0.0,
+            "status": "already_sent",
+            "elapsed": time.monotonic() - started,
+        }
+
+    def send(job: Dict[str, Any]) -> Dict[str, Any]:
+        started = time.monotonic()
+        result = {"chat_id": job["chat_id_raw"], "day": job["day"], "waited": 0.0}
+        if ledger is not None:
+            try:
+                if not ledger.claim(job):
+                    return skipped(job, started)
+            except sqlite3.Error as exc:
+                logging.error("Sent ledger unavailable for chat_id=%s: %s", job["chat_id"], exc, exc_info=True)
+                metrics.registry.inc("broadcast_results_total", status="failed")
+                result.update(status="failed", error=str(exc), elapsed=time.monotonic() - started)
+                return result
+        waited = limiter.acquire(job["chat_id"])
+        metrics.registry.observe("broadcast_wait_seconds", waited)
+        result["waited"] = waited
+        sending = time.monotonic()
+        # deliver() returns once Telegram accepted the message. A read timeout
+        # leaves that unknown, so the claim is kept rather than released and
+        # a rerun does not post again before claim_timeout.
+        maybe_delivered = False
+        try:
+            deliver(job)
+            result["status"] = "sent"
+        except Exception as exc:  # noqa: BLE001
+            logging.error(
+                "Failed to send message to chat_id=%s: %s", job["chat_id"], exc, exc_info=True
+            )
+            result["status"] = "failed"
+            result["error"] = str(exc)
+            maybe_delivered = isinstance(exc, requests.exceptions.ReadTimeout)
+        if ledger is not None:
+            try:
+                if result["status"] == "sent":
+                    ledger.mark_sent(job)
+                elif maybe_delivered:
+                    logging.warning(
+                        "Send to chat_id=%s timed out and may have been delivered; keeping its ledger claim",
+                        job["chat_id"],
+                    )
+                else:
+                    ledger.release(job)
+            except sqlite3.Error:
+                # A claim that cannot be marked stays "sending", which still
+                # keeps other runs off the group until claim_timeout.
+                logging.error("Failed to update sent ledger for chat_id=%s", job["chat_id"], exc_info=True)
+        metrics.registry.observe("broadcast_send_seconds", time.monotonic() - sending)
+        metrics.registry.inc("broadcast_results_total", status=result["status"])
+        result["elapsed"] = time.monotonic() - started
+        return result
+
+    if not jobs:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="broadcast") as pool:
+        return list(pool.map(send, jobs))
 
 
 def main() -> None:
     sheets_client = GoogleSheetsClient(
         spreadsheet_id=config.SPREADSHEET_ID,
-        credentials_file=config.GOOGLE_SERVICE_ACCOUNT_FILE,
+        credentials_file=config.service_account_file(),
+        retry_policy=RetryPolicy(
+            max_attempts=config.RETRY_MAX_ATTEMPTS,
+            base_delay=config.RETRY_BASE_DELAY,
+            max_delay=config.RETRY_MAX_DELAY,
+            deadline=config.SHEETS_CALL_DEADLINE,
+        ),
     )
-    
+
     # Always fetch groups from the sheet
-    group_repo = GroupRepository(sheets_client, config.GROUPS_SHEET_NAME)
-    sheet_groups = group_repo.list_groups()
-    
-    groups = []
-    if sheet_groups:
-        groups = [
-            {
-                "chat_id": g["chat_id"],
-                "plan_sheet": g.get("plan_sheet") or config.PLAN_SHEET_NAME,
-                "start_date": g.get("start_date") or config.START_DATE,
-                "timezone": (
-                    config.ZoneInfo(g["timezone"])
-                    if g.get("timezone") and config.ZoneInfo
-                    else config.TIMEZONE
-                ),
-                "notification_time": g.get("notification_time", "08:00"),
-            }
-            for g in sheet_groups
-        ]
-    
+    groups = load_groups(sheets_client)
     if not groups:
-        logging.error("No group configuration found in Google Sheets.")
+        logging.error("No group configuration found.")
         return
 
     today = _now()
-    plan_repos = {}
-    
+    plan_repos: Dict[str, PlanRepository] = {}
     force_send = os.environ.get("FORCE_SEND", "").lower() == "true"
 
+    jobs = []
     for group in groups:
-        chat_id_raw = group["chat_id"]
-        chat_id, thread_id = utils.parse_chat_destination(chat_id_raw)
-        start_date = group.get("start_date") or config.START_DATE
-        plan_sheet = group.get("plan_sheet") or config.PLAN_SHEET_NAME
-        tz = group.get("timezone") or config.TIMEZONE
-        notification_time = group.get("notification_time", "08:00")
-
-        now_local = datetime.datetime.now(tz=tz) if tz else today
-        
-        # Time Check
-        if not force_send:
-            try:
-                target_hour = int(notification_time.split(":")[0])
-                current_server_time = datetime.datetime.now()
-                logging.debug(
-                    "ChatID=%s, Timezone=%s. ServerTime=%s, LocalTime=%s. TargetHour=%s", 
-                    chat_id, tz, current_server_time, now_local, target_hour
-                )
-
-                if now_local.hour != target_hour:
-                    logging.info(
-                        "Skipping chat_id=%s: Current hour %s (Loc: %s) != Target %s", 
-                        chat_id, now_local.hour, now_local.strftime("%H:%M"), target_hour
-                    )
-                    continue
-            except Exception:
-                logging.warning("Invalid notification_time %s for chat_id=%s", notification_time, chat_id)
-
-        day = calculate_day(now_local, start_date)
-        if day is None:
-            logging.info(
-                "Start date is in the future for chat_id=%s; skipping.", chat_id
-            )
+        job = prepare_job(group, today, sheets_client, plan_repos, force_send)
+        if job is None:
             continue
-
-        if plan_sheet not in plan_repos:
-            plan_repos[plan_sheet] = PlanRepository(sheets_client, plan_sheet)
-        plan_repo = plan_repos[plan_sheet]
-        plan_row = plan_repo.get_plan_by_day(day)
-        if not plan_row:
-            logging.warning(
-                "No plan found for day=%s in sheet=%s; chat_id=%s; nothing sent.",
-                day,
-                plan_sheet,
-                chat_id,
-            )
-            continue
-
-        message = build_message(plan_row, day, youtube_link=plan_row.get("youtube_link", "").strip())
-        image_url = plan_row.get("image_url", "").strip()
-        
         if DRY_RUN:
             logging.info(
                 "[DRY_RUN] Would send to chat_id=%s (sheet=%s, start=%s):\n%s\n[Image]: %s",
-                chat_id_raw,
-                plan_sheet,
-                start_date,
-                message,
-                image_url,
+                job["chat_id_raw"],
+                job["plan_sheet"],
+                job["start_date"],
+                job["message"],
+                job["image_url"],
             )
             continue
+        jobs.append(job)
 
-        try:
-            if image_url:
-                logging.info("Attempting to send photo to %s. URL/Path: '%s'", chat_id, image_url)
-                send_photo(chat_id, image_url, message, thread_id)
-                logging.info(
-                    "Sent day %s photo+message to chat_id=%s (sheet=%s)", day, chat_id_raw, plan_sheet
-                )
-            else:
-                send_message(chat_id, message, thread_id)
-                logging.info(
-                    "Sent day %s message to chat_id=%s (sheet=%s)", day, chat_id_raw, plan_sheet
-                )
-        except requests.RequestException as exc:
-            logging.error(
-                "Failed to send message to chat_id=%s: %s", chat_id, exc, exc_info=True
-            )
+    limiter = TelegramRateLimiter(
+        global_rate=config.TELEGRAM_GLOBAL_RATE,
+        per_chat_rate=config.TELEGRAM_CHAT_RATE,
+        per_group_per_minute=config.TELEGRAM_GROUP_PER_MINUTE,
+    )
+    ledger = None if IGNORE_LEDGER else SentLedger(
+        config.SENT_LEDGER_PATH, claim_timeout=config.SENT_LEDGER_CLAIM_TIMEOUT_SECONDS
+    )
+    started = time.monotonic()
+    try:
+        results = run_broadcast(jobs, limiter, workers=config.BROADCAST_WORKERS, ledger=ledger)
+    finally:
+        if ledger is not None:
+            ledger.close()
+    for r in results:
+        logging.info(
+            "Broadcast result chat_id=%s day=%s status=%s elapsed=%.2fs (rate-limit wait %.2fs)",
+            r["chat_id"], r["day"], r["status"], r["elapsed"], r["waited"],
+        )
+    if results:
+        logging.info(
+            "Broadcast finished: %s sent, %s already sent, %s failed, %s groups skipped, %.2fs total",
+            sum(1 for r in results if r["status"] == "sent"),
+            sum(1 for r in results if r["status"] == "already_sent"),
+            sum(1 for r in results if r["status"] == "failed"),
+            len(groups) - len(results),
+            time.monotonic() - started,
+        )
+    retry_stats = retry.stats.snapshot()
+    if retry_stats:
+        logging.info("Retry stats: %s", retry_stats)
+    metrics.registry.dump(config.METRICS_DUMP_PATH)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,41 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, Set
+
+
+class Debouncer:
+    """Collapses repeated events (e.g. double-tapped inline buttons) into one.
+
+    ``begin(key)`` returns True when the caller should handle the event and
+    False while the same key is still being handled or finished less than
+    ``window`` seconds ago. Every successful ``begin`` must be paired with
+    ``end`` once handling is done.
+    """
+
+    def __init__(self, window: float = 2.0) -> None:
+        self.window = window
+        self._in_flight: Set[Hashable] = set()
+        # key -> monotonic time it finished, oldest first
+        self._recent: "OrderedDict[Hashable, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def begin(self, key: Hashable) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            while self._recent:
+                oldest, finished = next(iter(self._recent.items()))
+                if now - finished < self.window:
+                    break
+                del self._recent[oldest]
+            if key in self._in_flight or key in self._recent:
+                return False
+            self._in_flight.add(key)
+            return True
+
+    def end(self, key: Hashable) -> None:
+        with self._lock:
+            self._in_flight.discard(key)
+            if self.window > 0:
+                self._recent.pop(key, None)
+                self._recent[key] = time.monotonic()
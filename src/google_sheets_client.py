@@ -1,48 +1,364 @@
-from typing import List, Any
+import atexit
+import logging
+import re
+import socket
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Any, Optional, Callable, Dict, Tuple
 
+import google_auth_httplib2
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from googleapiclient.http import build_http
+
+import metrics
+from retry import RetryPolicy, call_with_retry
 
 SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
 
+AppendCallback = Callable[[Optional[int]], None]
+
+
+def classify_sheets_outcome(outcome: Any) -> Optional[float]:
+    """Retry quota errors, server errors and dropped connections."""
+    if isinstance(outcome, HttpError):
+        return 0.0 if outcome.resp.status in (429, 500, 502, 503, 504) else None
+    if isinstance(outcome, OSError):
+        return 0.0
+    return None
+
+
+def classify_append_outcome(outcome: Any) -> Optional[float]:
+    """Retry only failures where the append cannot have been written.
+
+    values.append is not idempotent: after a timeout or a 5xx the rows may
+    already be in the sheet, so those are not retried here (see append_rows).
+    """
+    if isinstance(outcome, HttpError):
+        return 0.0 if outcome.resp.status == 429 else None
+    if isinstance(outcome, (ConnectionRefusedError, socket.gaierror)):
+        return 0.0
+    return None
+
+
+def append_may_have_landed(exc: BaseException) -> bool:
+    """True when a failed append may still have written its rows."""
+    if isinstance(exc, HttpError):
+        return exc.resp.status >= 500
+    return isinstance(exc, OSError) and not isinstance(exc, (ConnectionRefusedError, socket.gaierror))
+
+
+def _cells(row: List[Any]) -> List[str]:
+    """A row as the Sheets API returns it: strings, trailing blanks dropped."""
+    cells = ["" if v is None else str(v) for v in row]
+    while cells and cells[-1] == "":
+        cells.pop()
+    return cells
+
+
+def _first_row_of(updated_range: str) -> Optional[int]:
+    """Extract the first row number from an A1 range like 'progress!A57:E57'."""
+    match = re.search(r"![A-Z]+(\d+)", updated_range or "")
+    return int(match.group(1)) if match else None
+
 
 class GoogleSheetsClient:
-    def __init__(self, spreadsheet_id: str, credentials_file: str) -> None:
-        credentials = service_account.Credentials.from_service_account_file(
-            credentials_file, scopes=SCOPES
-        )
-        self._service = build("sheets", "v4", credentials=credentials)
+    """Thin wrapper around the Sheets values API.
+
+    With ``write_behind=True`` row updates and appends are queued instead of
+    being sent immediately. A background thread flushes the queue every
+    ``flush_interval`` seconds (or as soon as ``batch_size`` writes are
+    pending): all updates go out in one ``values.batchUpdate`` and appends
+    to the same range go out as one multi-row ``values.append``. Updates to
+    the same range collapse, so only the last value queued for a row is
+    written. When ``max_pending`` writes are queued the caller flushes
+    inline, which bounds memory at the cost of blocking that caller.
+
+    httplib2 connections are not thread-safe, so every thread executes its
+    requests over its own authorized connection. With a ``retry_policy``,
+    requests failing with 429/5xx or a network error are retried, except
+    that appends are only retried when they cannot have been written.
+
+    Credentials and the API service object are created on first use, from
+    the discovery document bundled with google-api-python-client, so
+    constructing a client does no I/O; call ``warm_up`` to pay that cost
+    ahead of time.
+    """
+
+    def __init__(
+        self,
+        spreadsheet_id: str,
+        credentials_file: str,
+        write_behind: bool = False,
+        flush_interval: float = 2.0,
+        batch_size: int = 50,
+        max_pending: int = 1000,
+        retry_policy: Optional[RetryPolicy] = None,
+    ) -> None:
+        self.credentials_file = credentials_file
+        self._credentials_obj: Optional[service_account.Credentials] = None
+        self._service_obj: Any = None
+        self._init_lock = threading.Lock()
         self.spreadsheet_id = spreadsheet_id
+        self._local = threading.local()
+        self.retry_policy = retry_policy
+
+        self.write_behind = write_behind
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self._pending_updates: "OrderedDict[str, List[Any]]" = OrderedDict()
+        self._pending_appends: List[Tuple[str, List[Any], Optional[AppendCallback]]] = []
+        self._queue_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._flusher: Optional[threading.Thread] = None
+        if write_behind:
+            self._flusher = threading.Thread(
+                target=self._flush_loop, name="sheets-write-behind", daemon=True
+            )
+            self._flusher.start()
+            atexit.register(self.close)
+
+    @property
+    def _credentials(self) -> service_account.Credentials:
+        if self._credentials_obj is None:
+            with self._init_lock:
+                if self._credentials_obj is None:
+                    self._credentials_obj = service_account.Credentials.from_service_account_file(
+                        self.credentials_file, scopes=SCOPES
+                    )
+        return self._credentials_obj
+
+    @property
+    def _service(self) -> Any:
+        if self._service_obj is None:
+            credentials = self._credentials
+            with self._init_lock:
+                if self._service_obj is None:
+                    # static_discovery reads the bundled document instead of fetching it.
+                    self._service_obj = build(
+                        "sheets", "v4", credentials=credentials, static_discovery=True, cache_discovery=False
+                    )
+        return self._service_obj
+
+    def warm_up(self) -> None:
+        """Load credentials and build the service now rather than on the first call."""
+        self._service  # noqa: B018
+
+    def _http(self) -> google_auth_httplib2.AuthorizedHttp:
+        http = getattr(self._local, "http", None)
+        if http is None:
+            http = google_auth_httplib2.AuthorizedHttp(self._credentials, http=build_http())
+            self._local.http = http
+        return http
+
+    def _execute(
+        self,
+        name: str,
+        request: Any,
+        classify: Callable[[Any], Optional[float]] = classify_sheets_outcome,
+    ) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            if self.retry_policy is None:
+                return request.execute(http=self._http())
+            return call_with_retry(
+                f"sheets.{name}",
+                lambda: request.execute(http=self._http()),
+                self.retry_policy,
+                classify,
+            )
+        except Exception as exc:
+            error = str(exc.resp.status) if isinstance(exc, HttpError) else type(exc).__name__
+            metrics.registry.inc("sheets_errors_total", op=name, error=error)
+            raise
+        finally:
+            metrics.registry.observe("sheets_request_seconds", time.perf_counter() - started, op=name)
 
     def get_values(self, range_: str) -> List[List[Any]]:
         """Fetch values for a given A1 range; returns empty list on errors."""
         try:
-            response = (
+            response = self._execute(
+                "get",
                 self._service.spreadsheets()
                 .values()
-                .get(spreadsheetId=self.spreadsheet_id, range=range_)
-                .execute()
+                .get(spreadsheetId=self.spreadsheet_id, range=range_),
             )
             return response.get("values", [])
         except HttpError:
             return []
 
-    def append_row(self, range_: str, row_values: List[Any]) -> None:
-        """Append a single row to the specified range."""
-        self._service.spreadsheets().values().append(
-            spreadsheetId=self.spreadsheet_id,
-            range=range_,
-            valueInputOption="RAW",
-            insertDataOption="INSERT_ROWS",
-            body={"values": [row_values]},
-        ).execute()
+    def append_row(
+        self,
+        range_: str,
+        row_values: List[Any],
+        callback: Optional[AppendCallback] = None,
+    ) -> Optional[int]:
+        """Append a single row; returns the sheet row number it landed on, if reported.
+
+        In write-behind mode the row is queued and None is returned; ``callback``
+        receives the row number once the append has been flushed.
+        """
+        if self.write_behind and not self._closed:
+            with self._queue_lock:
+                self._pending_appends.append((range_, list(row_values), callback))
+            self._after_enqueue()
+            return None
+        row_index = self.append_rows(range_, [row_values])
+        if callback:
+            callback(row_index)
+        return row_index
+
+    def append_rows(self, range_: str, rows: List[List[Any]]) -> Optional[int]:
+        """Append several rows in one request, bypassing the write-behind queue.
+
+        When the request times out or fails with a 5xx, the range is read back
+        and the append counts as done if the rows are already at its end, so
+        callers that re-send failed appends do not write them twice.
+        """
+        try:
+            response = self._execute("append", self._service.spreadsheets().values().append(
+                spreadsheetId=self.spreadsheet_id,
+                range=range_,
+                valueInputOption="RAW",
+                insertDataOption="INSERT_ROWS",
+                body={"values": rows},
+            ), classify_append_outcome)
+        except Exception as exc:
+            if not append_may_have_landed(exc):
+                raise
+            try:
+                first_row = self._appended_at(range_, rows)
+            except Exception:
+                logging.warning("Could not check whether the append to %s was written", range_, exc_info=True)
+                raise exc
+            if first_row is None:
+                raise
+            logging.warning("Append to %s failed with %r but its rows are in the sheet", range_, exc)
+            return first_row
+        return _first_row_of(response.get("updates", {}).get("updatedRange", ""))
+
+    def _appended_at(self, range_: str, rows: List[List[Any]]) -> Optional[int]:
+        """Row number where rows sit at the end of range_, or None if they are not there."""
+        response = self._execute(
+            "get", self._service.spreadsheets().values().get(spreadsheetId=self.spreadsheet_id, range=range_)
+        )
+        values = response.get("values", [])
+        if not rows or len(values) < len(rows):
+            return None
+        if [_cells(r) for r in values[-len(rows):]] != [_cells(r) for r in rows]:
+            return None
+        match = re.search(r"^[A-Z]+(\d+)", range_.rpartition("!")[2])
+        start = int(match.group(1)) if match else 1
+        return start + len(values) - len(rows)
 
     def update_row(self, range_: str, row_values: List[Any]) -> None:
         """Update a range (typically a full row) with new values."""
-        self._service.spreadsheets().values().update(
+        if self.write_behind and not self._closed:
+            with self._queue_lock:
+                # Last writer wins: re-inserting moves the range to the back.
+                self._pending_updates.pop(range_, None)
+                self._pending_updates[range_] = list(row_values)
+            self._after_enqueue()
+            return
+        self._execute("update", self._service.spreadsheets().values().update(
             spreadsheetId=self.spreadsheet_id,
             range=range_,
             valueInputOption="RAW",
             body={"values": [row_values]},
-        ).execute()
+        ))
+
+    def batch_update(self, data: Dict[str, List[Any]]) -> None:
+        """Write several single-row ranges in one values.batchUpdate request."""
+        if not data:
+            return
+        self._execute("batchUpdate", self._service.spreadsheets().values().batchUpdate(
+            spreadsheetId=self.spreadsheet_id,
+            body={
+                "valueInputOption": "RAW",
+                "data": [{"range": r, "values": [v]} for r, v in data.items()],
+            },
+        ))
+
+    # --- write-behind queue -------------------------------------------------
+
+    def pending_writes(self) -> int:
+        with self._queue_lock:
+            return len(self._pending_updates) + len(self._pending_appends)
+
+    def _after_enqueue(self) -> None:
+        pending = self.pending_writes()
+        if pending >= self.max_pending:
+            logging.warning("Sheets write queue full (%s); flushing inline", pending)
+            self.flush()
+        elif pending >= self.batch_size:
+            self._wake.set()
+
+    def _flush_loop(self) -> None:
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logging.error("Sheets write-behind flush failed", exc_info=True)
+
+    def flush(self) -> None:
+        """Send every queued write now."""
+        with self._flush_lock:
+            with self._queue_lock:
+                updates = self._pending_updates
+                appends = self._pending_appends
+                self._pending_updates = OrderedDict()
+                self._pending_appends = []
+            if not updates and not appends:
+                return
+
+            try:
+                self.batch_update(updates)
+            except Exception:
+                with self._queue_lock:
+                    # Keep anything written after the snapshot; it is newer.
+                    for range_, values in updates.items():
+                        self._pending_updates.setdefault(range_, values)
+                    self._pending_appends[:0] = appends
+                raise
+
+            # Appends are grouped by consecutive range so row order is preserved.
+            start = 0
+            while start < len(appends):
+                range_ = appends[start][0]
+                end = start
+                while end < len(appends) and appends[end][0] == range_:
+                    end += 1
+                batch = appends[start:end]
+                try:
+                    first_row = self.append_rows(range_, [values for _, values, _ in batch])
+                except Exception:
+                    with self._queue_lock:
+                        self._pending_appends[:0] = appends[start:]
+                    raise
+                for offset, (_, _, callback) in enumerate(batch):
+                    if callback:
+                        try:
+                            callback(first_row + offset if first_row else None)
+                        except Exception:
+                            logging.error("Append callback failed", exc_info=True)
+                start = end
+
+    def close(self) -> None:
+        """Stop the background flusher and write out anything still queued."""
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        if self._flusher:
+            self._flusher.join(timeout=self.flush_interval + 5)
+        try:
+            self.flush()
+        except Exception:
+            logging.error("Final Sheets flush failed; %s writes lost", self.pending_writes(), exc_info=True)
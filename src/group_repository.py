@@ -1,6 +1,10 @@
-from typing import List, Dict, Any, Optional
 import datetime
+import logging
+import threading
+import time
+from typing import List, Dict, Any, Optional, Set
 
+import utils
 from google_sheets_client import GoogleSheetsClient
 
 
@@ -8,35 +12,131 @@ class GroupRepository:
     """Load group configurations from a Google Sheet.
 
     Expected columns (with header in row 1):
-    chat_id | plan_sheet | start_date (YYYY-MM-DD) | timezone
+    chat_id | plan_sheet | start_date (YYYY-MM-DD) | timezone | notification_time
+
+    The sheet is read once into an index of chat_id -> record (with its row
+    number) and re-read when the index is older than ``ttl`` seconds or a
+    lookup misses; a chat that is still missing after that re-read is not
+    looked for again for ``miss_ttl`` seconds. ``list_groups`` is served from the index, appends update
+    it, and edits write just the one cell they change.
     """
 
-    def __init__(self, sheets_client: GoogleSheetsClient, sheet_name: str) -> None:
+    def __init__(
+        self, sheets_client: GoogleSheetsClient, sheet_name: str, ttl: float = 300, miss_ttl: float = 30
+    ) -> None:
         self.sheets_client = sheets_client
         self.sheet_name = sheet_name
+        self.ttl = ttl
+        self.miss_ttl = miss_ttl
+        # chat_id -> when a re-read last failed to find it
+        self._misses: Dict[str, float] = {}
+        self._index: Dict[str, Dict[str, Any]] = {}
+        # Telegram chat id -> registered ids in that chat ("<chat>" and "<chat>_<thread>")
+        self._by_chat: Dict[str, List[str]] = {}
+        self._next_row = 2
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.RLock()
+        # Groups whose append is still queued, and those changed since.
+        self._appending: Set[str] = set()
+        self._dirty_appends: Set[str] = set()
+
+    def _parse_row(self, row_index: int, row: List[Any]) -> Dict[str, Any]:
+        return {
+            "row_index": row_index,
+            "chat_id": str(row[0]).strip(),
+            "plan_sheet": row[1].strip() if len(row) > 1 and row[1] else None,
+            "start_date": self._parse_date(row[2]) if len(row) > 2 and row[2] else None,
+            "timezone": row[3].strip() if len(row) > 3 and row[3] else None,
+            "notification_time": row[4].strip() if len(row) > 4 and row[4] else "08:00",
+        }
+
+    def reload(self) -> None:
+        """Rebuild the index from a full read of the sheet."""
+        # Queued edits (/set_time, /set_start_date) must reach the sheet first,
+        # or the read would put the old values back into the index.
+        try:
+            self.sheets_client.flush()
+        except Exception:
+            with self._lock:
+                if self._loaded_at is not None:
+                    logging.warning("Sheets flush failed; keeping the group index until the next refresh", exc_info=True)
+                    self._loaded_at = time.monotonic()
+                    return
+            logging.warning("Sheets flush failed before loading groups", exc_info=True)
+        rows = self.sheets_client.get_values(f"{self.sheet_name}!A2:E")
+        with self._lock:
+            # Appends still queued are not in the sheet yet; keep them.
+            pending = {key: self._index[key] for key in self._appending if key in self._index}
+            self._index = {}
+            self._next_row = 2
+            for idx, row in enumerate(rows, start=2):
+                self._next_row = idx + 1
+                if not row or not row[0]:
+                    continue
+                record = self._parse_row(idx, row)
+                self._index.setdefault(record["chat_id"], record)
+            for key, record in pending.items():
+                self._index.setdefault(key, record)
+            self._by_chat = {}
+            for key in self._index:
+                self._index_chat(key)
+            self._misses.clear()
+            self._loaded_at = time.monotonic()
+
+    def _ensure_fresh(self) -> None:
+        with self._lock:
+            stale = self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl
+        if stale:
+            self.reload()
+
+    @staticmethod
+    def _public(record: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: value for key, value in record.items() if key != "row_index"}
 
     def list_groups(self) -> List[Dict[str, Any]]:
-        range_ = f"{self.sheet_name}!A2:D"
-        rows = self.sheets_client.get_values(range_)
-        groups: List[Dict[str, Any]] = []
-        for row in rows:
-            if not row or not row[0]:
-                continue
-            chat_id = str(row[0]).strip()
-            plan_sheet = row[1].strip() if len(row) > 1 and row[1] else None
-            start_date = self._parse_date(row[2]) if len(row) > 2 and row[2] else None
-            timezone = row[3].strip() if len(row) > 3 and row[3] else None
-            notification_time = row[4].strip() if len(row) > 4 and row[4] else "08:00"
-            groups.append(
-                {
-                    "chat_id": chat_id,
-                    "plan_sheet": plan_sheet,
-                    "start_date": start_date,
-                    "timezone": timezone,
-                    "notification_time": notification_time,
-                }
-            )
-        return groups
+        self._ensure_fresh()
+        with self._lock:
+            records = sorted(self._index.values(), key=lambda r: r["row_index"] or self._next_row)
+            return [self._public(r) for r in records]
+
+    def get_group(self, chat_id: str) -> Optional[Dict[str, Any]]:
+        record = self._lookup(str(chat_id))
+        return self._public(record) if record else None
+
+    def find_by_chat(self, chat_id: str, thread_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Group registered for a Telegram chat, from the index only.
+
+        Prefers the topic's own "<chat>_<thread>" registration, then the chat
+        itself, then the first of its topics. A miss does not re-read the sheet.
+        """
+        self._ensure_fresh()
+        chat = str(chat_id)
+        with self._lock:
+            keys = ([f"{chat}_{thread_id}"] if thread_id is not None else []) + [chat] + self._by_chat.get(chat, [])
+            for key in keys:
+                record = self._index.get(key)
+                if record is not None:
+                    return self._public(record)
+        return None
+
+    def _index_chat(self, key: str) -> None:
+        keys = self._by_chat.setdefault(utils.parse_chat_destination(key)[0], [])
+        if key not in keys:
+            keys.append(key)
+
+    def _lookup(self, chat_id: str) -> Optional[Dict[str, Any]]:
+        """Index record for chat_id; a miss re-reads the sheet at most once per miss_ttl."""
+        self._ensure_fresh()
+        with self._lock:
+            record = self._index.get(chat_id)
+            missed_at = self._misses.get(chat_id)
+        if record is None and (missed_at is None or time.monotonic() - missed_at > self.miss_ttl):
+            self.reload()
+            with self._lock:
+                record = self._index.get(chat_id)
+                if record is None:
+                    self._misses[chat_id] = time.monotonic()
+        return record
 
     @staticmethod
     def _parse_date(value: str) -> Optional[datetime.date]:
@@ -45,6 +145,17 @@ class GroupRepository:
         except Exception:
             return None
 
+    @staticmethod
+    def _values(record: Dict[str, Any]) -> List[Any]:
+        start_date = record["start_date"]
+        return [
+            record["chat_id"],
+            record["plan_sheet"] or "",
+            start_date.isoformat() if start_date else "",
+            record["timezone"] or "",
+            record["notification_time"],
+        ]
+
     def append_group(
         self,
         chat_id: str,
@@ -53,48 +164,58 @@ class GroupRepository:
         timezone: Optional[str],
         notification_time: str = "08:00",
     ) -> None:
-        plan_sheet = plan_sheet or ""
-        start_date_str = start_date.isoformat() if start_date else ""
-        tz = timezone or ""
+        key = str(chat_id).strip()
+        record = {
+            "row_index": None,
+            "chat_id": key,
+            "plan_sheet": plan_sheet or None,
+            "start_date": start_date,
+            "timezone": timezone or None,
+            "notification_time": notification_time,
+        }
+        with self._lock:
+            self._index[key] = record
+            self._index_chat(key)
+            self._misses.pop(key, None)
+            self._appending.add(key)
         range_ = f"{self.sheet_name}!A:E"
-        self.sheets_client.append_row(range_, [chat_id, plan_sheet, start_date_str, tz, notification_time])
+        self.sheets_client.append_row(
+            range_, self._values(record), callback=lambda row: self._on_appended(key, row)
+        )
 
-    def update_start_date(self, chat_id: str, new_date: datetime.date) -> bool:
-        """Update the start_date for a given chat_id."""
-        # 1. Find the row index
-        range_ = f"{self.sheet_name}!A2:A" # Read only chat_ids
-        rows = self.sheets_client.get_values(range_)
-        
-        row_index = -1
-        for idx, row in enumerate(rows):
-            if row and str(row[0]).strip() == str(chat_id):
-                row_index = idx + 2 # +2 because 0-based index + 1 header row + 1 for 1-based sheet
-                break
-        
-        if row_index == -1:
+    def _on_appended(self, key: str, row_index: Optional[int]) -> None:
+        with self._lock:
+            self._appending.discard(key)
+            record = self._index.get(key)
+            if record is None:
+                return
+            record["row_index"] = row_index or self._next_row
+            self._next_row = max(self._next_row, record["row_index"] + 1)
+            if key not in self._dirty_appends:
+                return
+            self._dirty_appends.discard(key)
+            values = self._values(record)
+            range_ = f"{self.sheet_name}!A{record['row_index']}:E{record['row_index']}"
+        self.sheets_client.update_row(range_, values)
+
+    def _update_field(self, chat_id: str, field: str, column: str, value: Any, cell_value: str) -> bool:
+        record = self._lookup(str(chat_id))
+        if record is None:
             return False
-            
-        # 2. Update the cell (Column C is start_date)
-        cell_range = f"{self.sheet_name}!C{row_index}"
-        self.sheets_client.update_row(cell_range, [new_date.isoformat()])
+        with self._lock:
+            record[field] = value
+            if record["row_index"] is None:
+                # Row number unknown until the append lands; rewrite it then.
+                self._dirty_appends.add(record["chat_id"])
+                return True
+            cell_range = f"{self.sheet_name}!{column}{record['row_index']}"
+        self.sheets_client.update_row(cell_range, [cell_value])
         return True
 
+    def update_start_date(self, chat_id: str, new_date: datetime.date) -> bool:
+        """Update the start_date for a given chat_id (column C)."""
+        return self._update_field(chat_id, "start_date", "C", new_date, new_date.isoformat())
+
     def update_notification_time(self, chat_id: str, new_time: str) -> bool:
-        """Update the notification_time for a given chat_id."""
-        # 1. Find the row index
-        range_ = f"{self.sheet_name}!A2:A"
-        rows = self.sheets_client.get_values(range_)
-        
-        row_index = -1
-        for idx, row in enumerate(rows):
-            if row and str(row[0]).strip() == str(chat_id):
-                row_index = idx + 2
-                break
-        
-        if row_index == -1:
-            return False
-            
-        # 2. Update the cell (Column E is notification_time)
-        cell_range = f"{self.sheet_name}!E{row_index}"
-        self.sheets_client.update_row(cell_range, [new_time])
-        return True
+        """Update the notification_time for a given chat_id (column E)."""
+        return self._update_field(chat_id, "notification_time", "E", new_time, new_time)
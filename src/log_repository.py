@@ -1,15 +1,52 @@
+import atexit
 import datetime
-from typing import Optional
+import json
+import logging
+import os
+import threading
+from collections import deque
+from typing import Optional, List, Any, Deque, Dict
 
 from google_sheets_client import GoogleSheetsClient
 
 
 class LogRepository:
-    """Append-only log sheet."""
+    """Append-only log sheet fed from an in-memory buffer.
 
-    def __init__(self, sheets_client: GoogleSheetsClient, sheet_name: str) -> None:
+    ``append_log`` only enqueues the row; a background thread appends queued
+    rows to the sheet in chunks of up to ``flush_size`` every
+    ``flush_interval`` seconds (sooner once a full chunk is waiting). When
+    the buffer holds ``buffer_size`` rows new events are dropped and counted
+    instead of blocking the caller. Chunks that cannot be written are
+    spilled to a local JSONL file and replayed after the next successful
+    write.
+    """
+
+    def __init__(
+        self,
+        sheets_client: GoogleSheetsClient,
+        sheet_name: str,
+        flush_size: int = 20,
+        flush_interval: float = 5.0,
+        buffer_size: int = 1000,
+        spill_path: Optional[str] = None,
+    ) -> None:
         self.sheets_client = sheets_client
         self.sheet_name = sheet_name
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.buffer_size = buffer_size
+        self.spill_path = spill_path
+        self.stats: Dict[str, int] = {"queued": 0, "written": 0, "dropped": 0, "spilled": 0}
+
+        self._buffer: Deque[List[Any]] = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._flusher = threading.Thread(target=self._flush_loop, name="log-flusher", daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
 
     def append_log(
         self,
@@ -21,8 +58,140 @@ class LogRepository:
         note: Optional[str] = "",
     ) -> None:
         ts = datetime.datetime.utcnow().isoformat()
-        range_ = f"{self.sheet_name}!A:F"
-        self.sheets_client.append_row(
-            range_,
-            [ts, chat_id, chat_type, username or "", command, status, note or ""],
-        )
+        row = [ts, chat_id, chat_type, username or "", command, status, note or ""]
+        with self._lock:
+            if len(self._buffer) >= self.buffer_size:
+                self.stats["dropped"] += 1
+                return
+            self._buffer.append(row)
+            self.stats["queued"] += 1
+            full_chunk = len(self._buffer) >= self.flush_size
+        if full_chunk:
+            self._wake.set()
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._buffer)
+
+    def _flush_loop(self) -> None:
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def _take_chunk(self) -> List[List[Any]]:
+        with self._lock:
+            count = min(self.flush_size, len(self._buffer))
+            return [self._buffer.popleft() for _ in range(count)]
+
+    def flush(self) -> None:
+        """Write everything currently buffered, chunk by chunk."""
+        with self._flush_lock:
+            wrote_any = False
+            while True:
+                chunk = self._take_chunk()
+                if not chunk:
+                    break
+                if not self._write(chunk):
+                    self._spill(chunk)
+                    # Sheets is unhealthy; park the rest on disk as well.
+                    while True:
+                        chunk = self._take_chunk()
+                        if not chunk:
+                            break
+                        self._spill(chunk)
+                    return
+                wrote_any = True
+            if wrote_any:
+                self._replay_spill()
+
+    def _write(self, rows: List[List[Any]]) -> bool:
+        try:
+            self.sheets_client.append_rows(f"{self.sheet_name}!A:F", rows)
+        except Exception:
+            logging.warning("Failed to append %s log rows", len(rows), exc_info=True)
+            return False
+        self.stats["written"] += len(rows)
+        return True
+
+    def _spill(self, rows: List[List[Any]]) -> None:
+        if not self.spill_path:
+            self.stats["dropped"] += len(rows)
+            return
+        try:
+            os.makedirs(os.path.dirname(self.spill_path) or ".", exist_ok=True)
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps(row, ensure_ascii=False) + "\n")
+            self.stats["spilled"] += len(rows)
+        except OSError:
+            logging.error("Failed to spill %s log rows", len(rows), exc_info=True)
+            self.stats["dropped"] += len(rows)
+
+    def _replay_spill(self) -> None:
+        """Send spilled rows to the sheet.
+
+        The spill file is renamed to ``.replay`` while it is being sent. A
+        ``.replay`` left by an interrupted replay is sent first and never
+        overwritten; lines that do not parse (e.g. torn by a crash) are moved
+        to ``.bad`` instead of blocking the rest.
+        """
+        if not self.spill_path:
+            return
+        replay_path = self.spill_path + ".replay"
+        for _ in range(2):
+            if not os.path.exists(replay_path):
+                if not os.path.exists(self.spill_path):
+                    return
+                try:
+                    os.replace(self.spill_path, replay_path)
+                except OSError:
+                    logging.error("Failed to move log spill file aside", exc_info=True)
+                    return
+            if not self._replay_file(replay_path):
+                return
+
+    def _replay_file(self, replay_path: str) -> bool:
+        """Replay one file and delete it; False when replaying should stop for now."""
+        rows: List[List[Any]] = []
+        bad: List[str] = []
+        try:
+            with open(replay_path, encoding="utf-8", errors="replace") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        rows.append(json.loads(line))
+                    except ValueError:
+                        bad.append(line if line.endswith("\n") else line + "\n")
+        except OSError:
+            logging.error("Failed to read log spill file %s", replay_path, exc_info=True)
+            return False
+        if bad:
+            try:
+                with open(self.spill_path + ".bad", "a", encoding="utf-8") as f:
+                    f.writelines(bad)
+                logging.warning("Moved %s unreadable spilled log lines to %s.bad", len(bad), self.spill_path)
+            except OSError:
+                logging.error("Failed to quarantine %s unreadable log lines", len(bad), exc_info=True)
+                return False
+        written = True
+        for start in range(0, len(rows), self.flush_size):
+            chunk = rows[start:start + self.flush_size]
+            if not self._write(chunk):
+                self._spill(rows[start:])
+                written = False
+                break
+        else:
+            logging.info("Replayed %s spilled log rows", len(rows))
+        os.remove(replay_path)
+        return written
+
+    def close(self) -> None:
+        """Stop the flusher and write (or spill) whatever is still buffered."""
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._flusher.join(timeout=self.flush_interval + 5)
+        self.flush()
@@ -0,0 +1,112 @@
+import html
+import re
+from typing import Optional, Dict, Any, Tuple
+
+import constants
+import keyboard_factory
+
+# Render modes cached per plan day (see render_plan)
+MODE_PERSONAL = "personal"  # /next, /repeat, /previous
+MODE_GROUP = "group"  # /today_group
+MODE_BROADCAST = "broadcast"  # daily_broadcast caption/message
+
+RenderKey = Tuple[int, str]
+
+
+def _is_valid_parallel(text: str) -> bool:
+    """A parallel ref is valid when it has content and is not "독자 기록" or "-"."""
+    return bool(text) and text not in ("-", "독자 기록")
+
+
+def build_plan_text(day: int, plan_row: dict, personal: bool = True, header_prefix: Optional[str] = None) -> str:
+    prefix = header_prefix if header_prefix else ("개인" if personal else "공동체")
+    ref = plan_row.get("ref", "")
+    title = plan_row.get("title", "")
+    summary = plan_row.get("summary", "")
+    verse_text = plan_row.get("verse_text", "")
+
+    parallels = [
+        (label, text)
+        for label, text in (
+            ("마태(Mt)", plan_row.get("mt", "").strip()),
+            ("마가(Mk)", plan_row.get("mk", "").strip()),
+            ("누가(Lk)", plan_row.get("lk", "").strip()),
+        )
+        if _is_valid_parallel(text)
+    ]
+
+    parts = [f"[{prefix} DAY {day}] {ref} ({title})\n\n"]
+    if verse_text:
+        parts.append(f"<blockquote>{verse_text}</blockquote>\n\n")
+    if parallels:
+        parts.append("📖 함께 읽어보면 좋은 평행본문입니다:\n")
+        parts.extend(f"• {label}: {text}\n" for label, text in parallels)
+        parts.append("\n")
+    if not personal:
+        # For community mode, keep original behavior (Summary)
+        parts.append(f"{constants.EMOJI_BOOK} 이런 내용입니다:\n{summary}\n\n")
+    parts.append("인상 깊은 구절이나 한 줄 소감을 보내주셔도 좋습니다.\n")
+    if personal:
+        parts.append("다음 퀘스트는 /next 로, 진행 현황은 /status 로 확인할 수 있어요.")
+    else:
+        progress_percent = int((day / constants.TOTAL_DAYS) * 100)
+        parts.append(f"진도율 : {day}/{constants.TOTAL_DAYS} ({progress_percent}% 완료!)")
+    return "".join(parts)
+
+
+def shown_day(text: str, prefix: str = "개인") -> Optional[int]:
+    """Day from the "[개인 DAY n]" header build_plan_text puts on a message, if present."""
+    match = re.match(rf"\[{re.escape(prefix)} DAY (\d+)\]", text or "")
+    return int(match.group(1)) if match else None
+
+
+def build_message(plan_row: dict, day: int, youtube_link: str = "") -> str:
+    ref = html.escape(plan_row.get("ref", ""))
+    title = html.escape(plan_row.get("title", ""))
+    verse_text = html.escape(plan_row.get("verse_text", ""))
+    verse_ref = html.escape(plan_row.get("verse_ref", ""))
+    progress_percent = int((day / constants.TOTAL_DAYS) * 100)
+
+    parts = [
+        f"[요한복음 함께 읽기 DAY {day}]\n\n",
+        "오늘의 범위는\n",
+        f"{constants.EMOJI_RAINBOW} <b>{ref} ({title})</b>입니다.\n\n",
+    ]
+    if verse_text:
+        parts.append(f"📖 <b>오늘의 말씀</b>\n<blockquote>\"{verse_text}\"{verse_ref}</blockquote>\n\n")
+    # Summary is temporarily left out; the Youtube link lives under References.
+    parts.append("읽고 퀴즈를 내거나, 인상깊은 구절을 공유하는 등 자유롭게 인증해주세요. 🙌\n\n")
+    parts.append(f"진도율 : {day}/{constants.TOTAL_DAYS} ({progress_percent}% 완료!)\n\n")
+    parts.append("📚 <b>참고자료</b>\n")
+    if youtube_link:
+        parts.append(f"{constants.EMOJI_HEADPHONE} <a href=\"{youtube_link}\">오늘 말씀 듣기 (Youtube)</a>\n")
+    parts.append(f'{constants.EMOJI_MAP} <a href="https://t.me/c/1829333998/244/361?single">[지도] 예수님 당시의 이스라엘</a>\n')
+    parts.append(f'{constants.EMOJI_COMPASS} <a href="http://www.biblemap.or.kr/biblemapMobile.html">성경 지도(추천)</a>\n')
+    parts.append(f'{constants.EMOJI_JOYSTICK} <a href="https://john.rtl.kr/">요한복음 기억하기 게임</a>')
+    return "".join(parts)
+
+
+def render_plan(plan: Dict[int, Dict[str, Any]]) -> Dict[RenderKey, Dict[str, Any]]:
+    """Render every day of a plan in every mode.
+
+    Returns {(day, mode): {"text": ..., "reply_markup": ...}}. The whole set
+    is a few hundred short strings, so PlanRepository builds it on reload and
+    handlers only do a dict lookup.
+    """
+    quest_keyboard = keyboard_factory.get_quest_keyboard()
+    read_keyboard = keyboard_factory.get_group_read_keyboard()
+    rendered: Dict[RenderKey, Dict[str, Any]] = {}
+    for day, row in plan.items():
+        rendered[(day, MODE_PERSONAL)] = {
+            "text": build_plan_text(day, row, personal=True),
+            "reply_markup": quest_keyboard,
+        }
+        rendered[(day, MODE_GROUP)] = {
+            "text": build_plan_text(day, row, personal=True, header_prefix="모임"),
+            "reply_markup": None,
+        }
+        rendered[(day, MODE_BROADCAST)] = {
+            "text": build_message(row, day, youtube_link=row.get("youtube_link", "").strip()),
+            "reply_markup": read_keyboard,
+        }
+    return rendered
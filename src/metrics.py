@@ -0,0 +1,263 @@
+"""In-process metrics: counters, gauges and latency histograms.
+
+Recording is a dict lookup plus a short lock, cheap enough to leave on in
+the hot path. ``render`` produces the Prometheus text format, ``serve``
+exposes it on a local ``/metrics`` endpoint and ``dump`` writes it to a file
+(or a summary to the log) for short-lived runs such as daily_broadcast.py.
+"""
+import bisect
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Dict, Any, Callable, Iterator, List, Tuple
+
+import config
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# HELP text for the metrics the bot records.
+DESCRIPTIONS: Dict[str, str] = {
+    "bot_update_seconds": "Time to handle one update, by handler",
+    "bot_update_errors_total": "Updates whose handler raised, by handler",
+    "bot_update_age_seconds": "Time from Telegram creating a message to the bot starting to handle it",
+    "bot_callback_debounced_total": "Repeated button taps dropped by the debouncer, by callback data",
+    "bot_group_reads_total": "Reads recorded from the group read button",
+    "bot_dispatcher_wait_seconds": "Time an update waited in the worker queue",
+    "bot_dispatcher_queue_depth": "Updates accepted but not yet picked up by a worker",
+    "telegram_request_seconds": "Bot API call latency including retries, by method",
+    "telegram_errors_total": "Failed Bot API calls, by method and status code or exception",
+    "sheets_request_seconds": "Sheets API call latency including retries, by operation",
+    "sheets_errors_total": "Failed Sheets API calls, by operation and exception",
+    "retry_calls_total": "Calls made through call_with_retry, by operation",
+    "retry_attempts_total": "Attempts including the first, by operation",
+    "retry_retries_total": "Attempts that failed and were retried, by operation",
+    "retry_giveups_total": "Calls that failed after retrying stopped, by operation",
+    "progress_sync_rows_scanned_total": "Progress sheet rows read by syncs",
+    "progress_sync_rows_changed_total": "Progress sheet rows that differed from memory during syncs",
+    "progress_sync_seconds": "Duration of one progress sync",
+    "sheets_pending_writes": "Writes waiting in the Sheets write-behind queue",
+    "log_buffer_depth": "Log rows waiting to be written",
+    "sqlite_mirror_pending": "Rows waiting to be mirrored from SQLite to Sheets",
+    "webhook_queue_depth": "Webhook updates accepted but not yet dispatched",
+    "broadcast_send_seconds": "Time to deliver the daily message to one group, excluding rate-limit waits",
+    "broadcast_wait_seconds": "Time one group's send waited on the rate limiter",
+    "broadcast_results_total": "Broadcast outcomes, by status",
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for k, v in labels
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th observation."""
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets + (float("inf"),), self.counts):
+            seen += n
+            if seen >= rank and seen:
+                return bound
+        return 0.0
+
+
+class Registry:
+    def __init__(self, enabled: bool = True, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.enabled = enabled
+        self.buckets = buckets
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._gauges: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        # Gauges read at render time, e.g. queue depths.
+        self._gauge_fns: Dict[str, Callable[[], float]] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1.0, **labels: Any) -> None:
+        if not self.enabled:
+            return
+        key = _labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def set(self, name: str, value: float, **labels: Any) -> None:
+        if not self.enabled:
+            return
+        key = _labels(labels)
+        with self._lock:
+            self._gauges.setdefault(name, {})[key] = value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        if not self.enabled:
+            return
+        key = _labels(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = Histogram(self.buckets)
+            hist.observe(value)
+
+    @contextmanager
+    def time(self, name: str, **labels: Any) -> Iterator[None]:
+        """Observe how long the block took, whether or not it raised."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def register_gauge(self, name: str, fn: Callable[[], float]) -> None:
+        self._gauge_fns[name] = fn
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters = {}
+            self._gauges = {}
+            self._histograms = {}
+
+    def _read_gauges(self) -> Dict[str, Dict[Labels, float]]:
+        with self._lock:
+            gauges = {name: dict(series) for name, series in self._gauges.items()}
+        for name, fn in list(self._gauge_fns.items()):
+            try:
+                gauges.setdefault(name, {})[()] = float(fn())
+            except Exception:
+                logging.debug("Gauge %s failed", name, exc_info=True)
+        return gauges
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        gauges = self._read_gauges()
+        with self._lock:
+            counters = {name: dict(series) for name, series in self._counters.items()}
+            histograms = {
+                name: {k: (list(h.counts), h.sum, h.count) for k, h in series.items()}
+                for name, series in self._histograms.items()
+            }
+        lines: List[str] = []
+
+        def header(name: str, kind: str) -> None:
+            if name in DESCRIPTIONS:
+                lines.append(f"# HELP {name} {DESCRIPTIONS[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        for kind, store in (("counter", counters), ("gauge", gauges)):
+            for name in sorted(store):
+                header(name, kind)
+                for labels, value in sorted(store[name].items()):
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for name in sorted(histograms):
+            header(name, "histogram")
+            for labels, (counts, total, count) in sorted(histograms[name].items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += n
+                    le = labels + (("le", _format_value(bound)),)
+                    lines.append(f"{name}_bucket{_format_labels(le)} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> List[str]:
+        """One human-readable line per series, for logs."""
+        lines = []
+        with self._lock:
+            for name in sorted(self._histograms):
+                for labels, h in sorted(self._histograms[name].items()):
+                    lines.append(
+                        f"{name}{_format_labels(labels)} count={h.count} avg={h.sum / h.count:.3f}s "
+                        f"p50<={h.quantile(0.5)}s p95<={h.quantile(0.95)}s p99<={h.quantile(0.99)}s"
+                    )
+            for name in sorted(self._counters):
+                for labels, value in sorted(self._counters[name].items()):
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+    def dump(self, path: str = "") -> None:
+        """Write the exposition text to path, or log a summary when no path is set."""
+        if not self.enabled:
+            return
+        if not path:
+            for line in self.summary():
+                logging.info("metric %s", line)
+            return
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp, path)
+        logging.info("Metrics written to %s", path)
+
+
+registry = Registry(enabled=config.METRICS_ENABLED)
+
+
+def serve(host: str, port: int, reg: Optional[Registry] = None) -> Optional[ThreadingHTTPServer]:
+    """Serve GET /metrics in a daemon thread; returns None if the port is taken."""
+    reg = reg or registry
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:  # noqa: N802
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            body = reg.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+            pass
+
+    try:
+        httpd = ThreadingHTTPServer((host, port), Handler)
+    except OSError as exc:
+        logging.warning("Metrics endpoint on %s:%s unavailable: %s", host, port, exc)
+        return None
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, name="metrics-http", daemon=True).start()
+    logging.info("Metrics available at http://%s:%s/metrics", host, httpd.server_address[1])
+    return httpd
+
+
+def serve_from_config() -> Optional[ThreadingHTTPServer]:
+    if not registry.enabled or config.METRICS_PORT <= 0:
+        return None
+    return serve(config.METRICS_HOST, config.METRICS_PORT)
@@ -0,0 +1,112 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Optional, Dict, Any, Tuple
+
+
+class PhotoCache:
+    """Persistent map from a broadcast image to the Telegram file_id it got.
+
+    Telegram returns a ``file_id`` for every photo it stores; sending that id
+    instead of the image avoids re-uploading local files and makes Telegram
+    skip re-fetching URLs. Entries are keyed by the image source (local path
+    or URL) and carry a fingerprint: the SHA-256 of the file contents for
+    local files, so editing the file invalidates the entry. URL contents
+    cannot be checked without downloading them, so URL entries expire after
+    ``url_max_age`` seconds instead.
+    """
+
+    def __init__(self, path: str, url_max_age: float = 7 * 24 * 3600) -> None:
+        self.path = path
+        self.url_max_age = url_max_age
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._hashes: Dict[str, Tuple[float, int, str]] = {}
+        self._lock = threading.Lock()
+        self._source_locks: Dict[str, threading.Lock] = {}
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self._entries = json.load(f)
+        except FileNotFoundError:
+            self._entries = {}
+        except (OSError, ValueError):
+            logging.warning("Ignoring unreadable photo cache %s", self.path, exc_info=True)
+            self._entries = {}
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def fingerprint(self, source: str, local_path: Optional[str] = None) -> str:
+        """Content hash for local files (memoized per mtime/size); the URL otherwise."""
+        if not local_path:
+            return "url"
+        stat = os.stat(local_path)
+        with self._lock:
+            memo = self._hashes.get(local_path)
+            if memo and memo[:2] == (stat.st_mtime, stat.st_size):
+                return memo[2]
+        digest = hashlib.sha256()
+        with open(local_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 16), b""):
+                digest.update(chunk)
+        value = "sha256:" + digest.hexdigest()
+        with self._lock:
+            self._hashes[local_path] = (stat.st_mtime, stat.st_size, value)
+        return value
+
+    def source_lock(self, source: str) -> threading.Lock:
+        """Lock held around the first upload of a source, so concurrent sends
+        wait for its file_id instead of uploading it again."""
+        with self._lock:
+            return self._source_locks.setdefault(source, threading.Lock())
+
+    def get(self, source: str, fingerprint: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(source)
+        if not entry or entry.get("fingerprint") != fingerprint:
+            return None
+        if fingerprint == "url" and time.time() - entry.get("stored_at", 0) > self.url_max_age:
+            return None
+        return entry.get("file_id")
+
+    def put(self, source: str, fingerprint: str, file_id: str) -> None:
+        with self._lock:
+            self._entries[source] = {"file_id": file_id, "fingerprint": fingerprint, "stored_at": time.time()}
+            try:
+                self._save()
+            except OSError:
+                logging.warning("Failed to persist photo cache %s", self.path, exc_info=True)
+
+    def forget(self, source: str) -> None:
+        with self._lock:
+            if self._entries.pop(source, None) is not None:
+                try:
+                    self._save()
+                except OSError:
+                    logging.warning("Failed to persist photo cache %s", self.path, exc_info=True)
+
+
+def file_id_from_response(data: Dict[str, Any]) -> Optional[str]:
+    """Pick the largest size's file_id out of a sendPhoto result."""
+    photos = (data.get("result") or {}).get("photo") or []
+    return photos[-1].get("file_id") if photos else None
+
+
+# Descriptions Telegram gives when a file_id can no longer be sent, e.g.
+# "Bad Request: wrong file identifier/HTTP URL specified".
+STALE_FILE_ID_ERRORS = ("wrong file identifier", "wrong remote file identifier", "file reference", "file_id")
+
+
+def is_stale_file_id_error(data: Dict[str, Any]) -> bool:
+    """True when a 400 response body says the file_id itself was rejected."""
+    description = str(data.get("description", "")).lower()
+    return any(marker in description for marker in STALE_FILE_ID_ERRORS)
@@ -0,0 +1,89 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, List, Set, Tuple, Callable
+
+from google_sheets_client import GoogleSheetsClient
+from plan_repository import PlanRepository
+
+
+class PlanRegistry:
+    """Bounded LRU of PlanRepository instances, one per plan sheet.
+
+    Repositories are created on first request (by ``factory`` when given)
+    and read lazily (or from their disk snapshot). At most ``max_size``
+    sheets stay in memory; the least recently used one is dropped when
+    another is needed. Entries
+    older than ``ttl`` seconds keep being served while a background thread
+    reloads them, so lookups never wait on Sheets for a refresh.
+    """
+
+    def __init__(
+        self,
+        sheets_client: GoogleSheetsClient,
+        max_size: int = 16,
+        ttl: float = 3600,
+        snapshot_dir: Optional[str] = None,
+        factory: Optional[Callable[[str], PlanRepository]] = None,
+    ) -> None:
+        self.sheets_client = sheets_client
+        self.factory = factory
+        self.max_size = max(1, max_size)
+        self.ttl = ttl
+        self.snapshot_dir = snapshot_dir
+        # sheet_name -> (repository, monotonic time of its last load)
+        self._entries: "OrderedDict[str, Tuple[PlanRepository, float]]" = OrderedDict()
+        self._refreshing: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def get(self, sheet_name: str) -> PlanRepository:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(sheet_name)
+            if entry is None:
+                if self.factory is not None:
+                    repo = self.factory(sheet_name)
+                else:
+                    repo = PlanRepository(
+                        self.sheets_client, sheet_name, preload=False, snapshot_dir=self.snapshot_dir
+                    )
+                self._entries[sheet_name] = (repo, now)
+                while len(self._entries) > self.max_size:
+                    evicted, _ = self._entries.popitem(last=False)
+                    logging.info("Evicted plan '%s' from the plan registry", evicted)
+                return repo
+            self._entries.move_to_end(sheet_name)
+            repo, loaded_at = entry
+            if now - loaded_at > self.ttl and sheet_name not in self._refreshing:
+                self._refreshing.add(sheet_name)
+                threading.Thread(
+                    target=self._refresh, args=(sheet_name, repo), name=f"plan-refresh-{sheet_name}", daemon=True
+                ).start()
+            return repo
+
+    def _refresh(self, sheet_name: str, repo: PlanRepository) -> None:
+        try:
+            repo.reload()
+        except Exception:
+            logging.warning("Background refresh of plan '%s' failed", sheet_name, exc_info=True)
+        finally:
+            with self._lock:
+                self._refreshing.discard(sheet_name)
+                if sheet_name in self._entries:
+                    self._entries[sheet_name] = (repo, time.monotonic())
+
+    def reload_all(self) -> List[str]:
+        """Reload every cached sheet now (e.g. for /reload); returns their names."""
+        with self._lock:
+            entries = list(self._entries.items())
+        for sheet_name, (repo, _) in entries:
+            repo.reload()
+            with self._lock:
+                if sheet_name in self._entries:
+                    self._entries[sheet_name] = (repo, time.monotonic())
+        return [name for name, _ in entries]
+
+    def sheets(self) -> List[str]:
+        with self._lock:
+            return list(self._entries)
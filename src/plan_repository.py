@@ -1,26 +1,125 @@
-import re
+import hashlib
+import json
 import logging
+import os
+import re
+import threading
 from typing import Optional, Dict, Any, List
 
 import constants
+import message_builder
 from google_sheets_client import GoogleSheetsClient
 
 
 class PlanRepository:
-    def __init__(self, sheets_client: GoogleSheetsClient, sheet_name: str) -> None:
+    """In-memory copy of one plan sheet, optionally backed by a disk snapshot.
+
+    With a ``snapshot_dir`` the raw sheet rows are saved as JSON together
+    with a version (a hash of the rows) after every read. A new instance
+    then starts from the snapshot without touching Sheets and revalidates it
+    in a background thread; the plan is only re-parsed and the snapshot only
+    rewritten when the version changed.
+    """
+
+    def __init__(
+        self,
+        sheets_client: GoogleSheetsClient,
+        sheet_name: str,
+        preload: bool = True,
+        snapshot_dir: Optional[str] = None,
+    ) -> None:
+        """With preload=False the sheet is read on first lookup (or an explicit reload)."""
         self.sheets_client = sheets_client
         self.sheet_name = sheet_name
         self.cache: Dict[int, Dict[str, Any]] = {}
-        self.reload()
+        self.rendered: Dict[message_builder.RenderKey, Dict[str, Any]] = {}
+        self.version: Optional[str] = None
+        self.snapshot_path: Optional[str] = None
+        if snapshot_dir:
+            safe_name = re.sub(r"[^\w.-]", "_", sheet_name)
+            self.snapshot_path = os.path.join(snapshot_dir, f"plan_{safe_name}.json")
+        self._loaded = False
+        self._load_lock = threading.Lock()
+        self._revalidated = threading.Event()
+        if self._load_snapshot():
+            threading.Thread(
+                target=self._revalidate, name=f"plan-revalidate-{sheet_name}", daemon=True
+            ).start()
+            return
+        self._revalidated.set()
+        if preload:
+            self.reload()
+
+    @staticmethod
+    def _version_of(rows: List[List[Any]]) -> str:
+        return hashlib.sha256(json.dumps(rows, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+    def _load_snapshot(self) -> bool:
+        if not self.snapshot_path:
+            return False
+        try:
+            with open(self.snapshot_path, encoding="utf-8") as f:
+                snapshot = json.load(f)
+            self._apply(snapshot["rows"], snapshot["version"])
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError, KeyError, TypeError):
+            logging.warning("Ignoring unreadable plan snapshot %s", self.snapshot_path, exc_info=True)
+            return False
+        logging.info("Loaded plan '%s' from snapshot (version %s)", self.sheet_name, self.version)
+        return True
+
+    def _save_snapshot(self, rows: List[List[Any]], version: str) -> None:
+        if not self.snapshot_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.snapshot_path) or ".", exist_ok=True)
+            tmp_path = self.snapshot_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"sheet": self.sheet_name, "version": version, "rows": rows}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.snapshot_path)
+        except OSError:
+            logging.warning("Failed to write plan snapshot %s", self.snapshot_path, exc_info=True)
+
+    def _revalidate(self) -> None:
+        try:
+            self.reload()
+        except Exception:
+            logging.warning("Failed to revalidate plan '%s'; keeping snapshot", self.sheet_name, exc_info=True)
+        finally:
+            self._revalidated.set()
+
+    def wait_revalidated(self, timeout: Optional[float] = None) -> bool:
+        """Wait for the background check of a snapshot; True once it finished."""
+        return self._revalidated.wait(timeout)
 
     def reload(self) -> None:
         """Load all plan data from Google Sheets into memory using header mapping."""
-        self.cache.clear()
         # Fetch A1:Z to include headers and potential extra columns
         range_ = f"{self.sheet_name}!A1:Z"
         rows = self.sheets_client.get_values(range_)
+        if not rows and self.cache:
+            # get_values also returns [] when the read failed.
+            logging.warning("Plan sheet '%s' read back empty; keeping the loaded plan.", self.sheet_name)
+            return
+        version = self._version_of(rows)
+        if version == self.version:
+            self._loaded = True
+            return
+        self._apply(rows, version)
+        self._save_snapshot(rows, version)
+
+    def _apply(self, rows: List[List[Any]], version: str) -> None:
+        """Parse sheet rows and swap the result in."""
+        # Build into a fresh dict and swap it in, so concurrent readers never
+        # observe a half-loaded plan.
+        cache: Dict[int, Dict[str, Any]] = {}
         if not rows:
             logging.warning("Plan sheet '%s' is empty.", self.sheet_name)
+            self.rendered = {}
+            self.cache = cache
+            self.version = version
+            self._loaded = True
             return
 
         headers = [h.strip() for h in rows[0]]
@@ -52,7 +151,7 @@ class PlanRepository:
                     continue
                 row_day = int(match.group(0))
                 
-                self.cache[row_day] = {
+                cache[row_day] = {
                     "day": row_day,
                     "ref": get_val(row, constants.COL_REF),
                     "title": get_val(row, constants.COL_TITLE),
@@ -68,7 +167,25 @@ class PlanRepository:
             except (ValueError, IndexError):
                 continue
 
+        # Pre-render every day once per reload; the old renders go with it.
+        self.rendered = message_builder.render_plan(cache)
+        self.cache = cache
+        self.version = version
+        self._loaded = True
+
+    def ensure_loaded(self) -> None:
+        if not self._loaded:
+            with self._load_lock:
+                if not self._loaded:
+                    self.reload()
+
     def get_plan_by_day(self, day: int) -> Optional[Dict[str, Any]]:
         """Return plan row for given day from cache."""
+        self.ensure_loaded()
         return self.cache.get(day)
 
+    def get_rendered(self, day: int, mode: str) -> Optional[Dict[str, Any]]:
+        """Return the pre-rendered {"text", "reply_markup"} for a day, if any."""
+        self.ensure_loaded()
+        return self.rendered.get((day, mode))
+
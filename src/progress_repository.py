@@ -1,37 +1,135 @@
 import datetime
-from typing import Optional, Dict, Any, List
+import logging
+import threading
+import time
+from typing import Optional, Dict, Any, Callable, List, Set
 
+import metrics
 from google_sheets_client import GoogleSheetsClient
 
 
 class ProgressRepository:
-    """Simple sheet-backed progress store."""
+    """Sheet-backed progress store with a write-through in-memory index.
 
-    def __init__(self, sheets_client: GoogleSheetsClient, sheet_name: str) -> None:
+    The whole sheet is read once; afterwards lookups are served from an index
+    keyed by user_id and every upsert updates the index before writing to the
+    sheet. Rows appended to the sheet by someone else are picked up by reading
+    only the tail of the sheet when a lookup misses.
+
+    When the sheets client defers writes, a new user's row number is only
+    known once its append is flushed; upserts made in the meantime are folded
+    into a single row update issued after the append lands.
+
+    A user that is not in the sheet is remembered as missing for
+    ``miss_ttl`` seconds, so repeated lookups (e.g. every message of a
+    group member who never started) do not re-read the tail each time.
+
+    Hand edits to the sheet are picked up by ``sync`` (see its docstring),
+    which ``start_sync`` runs periodically.
+    """
+
+    def __init__(self, sheets_client: GoogleSheetsClient, sheet_name: str, miss_ttl: float = 30) -> None:
         self.sheets_client = sheets_client
         self.sheet_name = sheet_name
+        self.miss_ttl = miss_ttl
+        self._misses: Dict[str, float] = {}
+        self._index: Dict[str, Dict[str, Any]] = {}
+        self._next_row = 2
+        self._loaded = False
+        self._lock = threading.RLock()
+        # Users whose append is still queued, and those changed since.
+        self._appending: Set[str] = set()
+        self._dirty_appends: Set[str] = set()
+        # Hash of each sheet row as last read or written, and users changed
+        # locally since the last sync.
+        self._row_hashes: Dict[int, int] = {}
+        self._dirty: Set[str] = set()
+        self._sync_thread: Optional[threading.Thread] = None
 
-    def _rows(self) -> List[List[Any]]:
-        range_ = f"{self.sheet_name}!A2:E"
-        return self.sheets_client.get_values(range_)
+    @staticmethod
+    def _parse_row(row_index: int, row: List[Any]) -> Dict[str, Any]:
+        group_ids_str = row[4] if len(row) > 4 else ""
+        group_ids = [g.strip() for g in str(group_ids_str).split(",") if g.strip()]
+        return {
+            "row_index": row_index,
+            "user_id": str(row[0]).strip(),
+            "username": row[1] if len(row) > 1 else "",
+            "current_day": int(row[2]) if len(row) > 2 and str(row[2]).isdigit() else 1,
+            "last_read_at": row[3] if len(row) > 3 else "",
+            "group_ids": group_ids,
+        }
 
-    def get_progress(self, user_id: str) -> Optional[Dict[str, Any]]:
-        rows = self._rows()
-        for idx, row in enumerate(rows, start=2):
-            if not row:
+    @staticmethod
+    def _row_hash(row: List[Any]) -> int:
+        # The sheet drops trailing empty cells and returns numbers as text.
+        cells = [str(c).strip() for c in row[:5]]
+        return hash(tuple(cells + [""] * (5 - len(cells))))
+
+    def _ingest(self, rows: List[List[Any]], start_row: int) -> None:
+        for idx, row in enumerate(rows, start=start_row):
+            self._next_row = max(self._next_row, idx + 1)
+            self._row_hashes[idx] = self._row_hash(row)
+            if not row or not str(row[0]).strip():
                 continue
-            if str(row[0]).strip() == str(user_id):
-                group_ids_str = row[4] if len(row) > 4 else ""
-                group_ids = [g.strip() for g in group_ids_str.split(",") if g.strip()]
-                return {
-                    "row_index": idx,
-                    "user_id": row[0],
-                    "username": row[1] if len(row) > 1 else "",
-                    "current_day": int(row[2]) if len(row) > 2 and str(row[2]).isdigit() else 1,
-                    "last_read_at": row[3] if len(row) > 3 else "",
-                    "group_ids": group_ids,
-                }
-        return None
+            record = self._parse_row(idx, row)
+            # First occurrence wins, matching the old linear scan.
+            self._index.setdefault(record["user_id"], record)
+
+    def reload(self) -> None:
+        """Rebuild the index from a full read of the sheet."""
+        rows = self.sheets_client.get_values(f"{self.sheet_name}!A2:E")
+        with self._lock:
+            self._index.clear()
+            self._misses.clear()
+            self._row_hashes.clear()
+            self._next_row = 2
+            self._ingest(rows, start_row=2)
+            self._loaded = True
+
+    def refresh(self) -> None:
+        """Pick up rows appended after the last known row without a full read."""
+        with self._lock:
+            start = self._next_row
+        rows = self.sheets_client.get_values(f"{self.sheet_name}!A{start}:E")
+        with self._lock:
+            self._ingest(rows, start_row=start)
+
+    def ensure_loaded(self) -> None:
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self.reload()
+
+    def get_progress(self, user_id: str) -> Optional[Dict[str, Any]]:
+        self.ensure_loaded()
+        key = str(user_id)
+        with self._lock:
+            record = self._index.get(key)
+            missed_at = self._misses.get(key)
+        if record is None and (missed_at is None or time.monotonic() - missed_at > self.miss_ttl):
+            self.refresh()
+            with self._lock:
+                record = self._index.get(key)
+                if record is None:
+                    self._misses[key] = time.monotonic()
+        if record is None:
+            return None
+        # Hand out a copy so callers can mutate group_ids freely.
+        return dict(record, group_ids=list(record["group_ids"]))
+
+    def list_progress(self) -> List[Dict[str, Any]]:
+        """Copies of every indexed record, in sheet order."""
+        self.ensure_loaded()
+        with self._lock:
+            records = sorted(self._index.values(), key=lambda r: r["row_index"] or self._next_row)
+            return [dict(r, group_ids=list(r["group_ids"])) for r in records]
+
+    def is_linked(self, user_id: str, group_id: str) -> bool:
+        """True when the user is already linked to the group; memory only."""
+        self.ensure_loaded()
+        with self._lock:
+            record = self._index.get(str(user_id))
+            return record is not None and group_id in record["group_ids"]
 
     def upsert_progress(
         self,
@@ -42,21 +140,241 @@ class ProgressRepository:
         group_ids: Optional[List[str]] = None,
     ) -> None:
         last_read_at = last_read_at or datetime.date.today().isoformat()
-        existing = self.get_progress(user_id)
-        
-        # Preserve existing group_ids if not provided
-        if group_ids is None:
-            if existing:
-                group_ids = existing.get("group_ids", [])
+
+        def change(existing: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+            # Preserve existing group_ids if not provided
+            groups = group_ids if group_ids is not None else (existing["group_ids"] if existing else [])
+            return {
+                "username": username or "",
+                "current_day": current_day,
+                "last_read_at": last_read_at,
+                "group_ids": list(groups),
+            }
+
+        self._write(user_id, change)
+
+    def add_group(self, user_id: str, username: str, group_id: str) -> bool:
+        """Link the user to a group, keeping their progress; False if already linked.
+
+        The record is read and changed under the index lock, so a concurrent
+        upsert (e.g. /next from the private chat) is never undone.
+        """
+        added = False
+
+        def change(existing: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+            nonlocal added
+            if existing is None:
+                existing = {"username": "", "current_day": 1, "last_read_at": "", "group_ids": []}
+            elif group_id in existing["group_ids"]:
+                return None
+            added = True
+            return {
+                "username": username or existing["username"],
+                "current_day": existing["current_day"],
+                "last_read_at": existing["last_read_at"],
+                "group_ids": existing["group_ids"] + [group_id],
+            }
+
+        self._write(user_id, change)
+        return added
+
+    def _write(
+        self,
+        user_id: str,
+        change: Callable[[Optional[Dict[str, Any]]], Optional[Dict[str, Any]]],
+    ) -> None:
+        """Apply change(existing record) atomically and queue the sheet write.
+
+        change returns the new username/current_day/last_read_at/group_ids,
+        or None to leave the record alone.
+        """
+        # Loads the index and picks up a row another process appended.
+        self.get_progress(user_id)
+        key = str(user_id)
+        with self._lock:
+            existing = self._index.get(key)
+            fields = change(existing)
+            if fields is None:
+                return
+            record = dict(fields, row_index=existing["row_index"] if existing else None, user_id=key)
+            self._index[key] = record
+            self._misses.pop(key, None)
+            self._dirty.add(key)
+            values = self._values(record)
+            row_index = record["row_index"]
+            if row_index:
+                self._row_hashes[row_index] = self._row_hash(values)
+            elif key in self._appending:
+                self._dirty_appends.add(key)
+                return
             else:
-                group_ids = []
-        
-        group_ids_str = ",".join(group_ids)
-        values = [str(user_id), username or "", current_day, last_read_at, group_ids_str]
-        
-        if existing and existing.get("row_index"):
-            range_ = f"{self.sheet_name}!A{existing['row_index']}:E{existing['row_index']}"
+                self._appending.add(key)
+
+        if row_index:
+            range_ = f"{self.sheet_name}!A{row_index}:E{row_index}"
             self.sheets_client.update_row(range_, values)
         else:
             range_ = f"{self.sheet_name}!A:E"
-            self.sheets_client.append_row(range_, values)
+            self.sheets_client.append_row(
+                range_,
+                values,
+                callback=lambda row: self._on_appended(key, row),
+            )
+
+    @staticmethod
+    def _values(record: Dict[str, Any]) -> List[Any]:
+        return [
+            record["user_id"],
+            record["username"],
+            record["current_day"],
+            record["last_read_at"],
+            ",".join(record["group_ids"]),
+        ]
+
+    def _on_appended(self, key: str, row_index: Optional[int]) -> None:
+        with self._lock:
+            self._appending.discard(key)
+            record = self._index.get(key)
+            if record is None:
+                return
+            record["row_index"] = row_index or self._next_row
+            self._next_row = max(self._next_row, record["row_index"] + 1)
+            self._row_hashes[record["row_index"]] = self._row_hash(self._values(record))
+            if key not in self._dirty_appends:
+                return
+            self._dirty_appends.discard(key)
+            values = self._values(record)
+            range_ = f"{self.sheet_name}!A{record['row_index']}:E{record['row_index']}"
+        self.sheets_client.update_row(range_, values)
+
+    # --- reconciliation with the sheet ---------------------------------------
+
+    def sync(self) -> Dict[str, Any]:
+        """Reconcile the index with the sheet, which admins may edit by hand.
+
+        Queued writes are flushed, then the sheet is read in one request and
+        each row's hash is compared with the last one seen or written at that
+        position; only rows that differ are parsed and applied, including
+        users moved by inserted or deleted rows. Users changed locally since
+        the last sync win over the sheet: those rows that still differ are
+        written back together in a single batchUpdate. Returns rows_scanned,
+        rows_changed, rows_pushed and seconds.
+        """
+        started = time.perf_counter()
+        if not self._loaded:
+            self.ensure_loaded()
+            with self._lock:
+                scanned = len(self._index)
+            return self._sync_stats(started, scanned, scanned, 0)
+
+        with self._lock:
+            synced_dirty = set(self._dirty)
+        self.sheets_client.flush()
+        rows = self.sheets_client.get_values(f"{self.sheet_name}!A2:E")
+        if not rows and self._index:
+            # get_values returns [] on errors; never treat that as "everyone left".
+            logging.warning("Progress sync read no rows from '%s'; keeping the index", self.sheet_name)
+            return self._sync_stats(started, 0, 0, 0)
+
+        pushed: Dict[str, List[Any]] = {}
+        pushed_rows: List[int] = []
+        reappend: List[str] = []
+        changed = 0
+        with self._lock:
+            row_users = {r["row_index"]: uid for uid, r in self._index.items() if r["row_index"]}
+            hashes: Dict[int, int] = {}
+            first_row: Dict[str, int] = {}
+            displaced: Set[str] = set()
+            for idx, row in enumerate(rows, start=2):
+                row_hash = self._row_hash(row)
+                hashes[idx] = row_hash
+                uid = str(row[0]).strip() if row else ""
+                if uid:
+                    first_row.setdefault(uid, idx)
+                if self._row_hashes.get(idx) == row_hash:
+                    continue
+                changed += 1
+                previous = row_users.get(idx)
+                if previous and previous != uid:
+                    displaced.add(previous)
+                if not uid or first_row[uid] != idx:
+                    continue
+                local = self._index.get(uid)
+                if local is not None and uid in self._dirty:
+                    local["row_index"] = idx
+                    values = self._values(local)
+                    if self._row_hash(values) != row_hash:
+                        pushed[f"{self.sheet_name}!A{idx}:E{idx}"] = values
+                        pushed_rows.append(idx)
+                        hashes[idx] = self._row_hash(values)
+                else:
+                    self._index[uid] = self._parse_row(idx, row)
+                    self._misses.pop(uid, None)
+
+            # Rows past the end of the sheet were deleted.
+            for idx, uid in row_users.items():
+                if idx >= len(rows) + 2:
+                    changed += 1
+                    displaced.add(uid)
+            for uid in displaced:
+                local = self._index.get(uid)
+                if local is None:
+                    continue
+                if uid in first_row:
+                    local["row_index"] = first_row[uid]
+                elif uid in self._dirty:
+                    local["row_index"] = None
+                    self._appending.add(uid)
+                    reappend.append(uid)
+                else:
+                    del self._index[uid]
+
+            self._row_hashes = hashes
+            self._next_row = max([len(rows) + 2] + [r["row_index"] + 1 for r in self._index.values() if r["row_index"]])
+
+        if pushed:
+            try:
+                self.sheets_client.batch_update(pushed)
+            except Exception:
+                logging.error("Progress sync failed to write back %s rows", len(pushed), exc_info=True)
+                with self._lock:
+                    for idx in pushed_rows:
+                        self._row_hashes.pop(idx, None)
+                pushed = {}
+                synced_dirty = set()
+        for uid in reappend:
+            with self._lock:
+                values = self._values(self._index[uid])
+            self.sheets_client.append_row(
+                f"{self.sheet_name}!A:E", values, callback=lambda row, uid=uid: self._on_appended(uid, row)
+            )
+        with self._lock:
+            self._dirty -= synced_dirty - self._appending
+        return self._sync_stats(started, len(rows), changed, len(pushed))
+
+    def _sync_stats(self, started: float, scanned: int, changed: int, pushed: int) -> Dict[str, Any]:
+        seconds = time.perf_counter() - started
+        metrics.registry.inc("progress_sync_rows_scanned_total", scanned)
+        metrics.registry.inc("progress_sync_rows_changed_total", changed)
+        metrics.registry.observe("progress_sync_seconds", seconds)
+        logging.info(
+            "Progress sync of '%s': %s of %s rows changed, %s written back in %.2fs",
+            self.sheet_name, changed, scanned, pushed, seconds,
+        )
+        return {"rows_scanned": scanned, "rows_changed": changed, "rows_pushed": pushed, "seconds": seconds}
+
+    def start_sync(self, interval: float) -> None:
+        """Run ``sync`` every ``interval`` seconds in a daemon thread (0 disables)."""
+        if interval <= 0 or self._sync_thread is not None:
+            return
+
+        def loop() -> None:
+            while True:
+                time.sleep(interval)
+                try:
+                    self.sync()
+                except Exception:
+                    logging.error("Progress sync failed", exc_info=True)
+
+        self._sync_thread = threading.Thread(target=loop, name="progress-sync", daemon=True)
+        self._sync_thread.start()
@@ -0,0 +1,116 @@
+import threading
+import zlib
+from typing import Optional, Dict, Any, List, Tuple
+
+from progress_repository import ProgressRepository
+
+# (spreadsheet_id or None for the main spreadsheet, tab name)
+ShardLocation = Tuple[Optional[str], str]
+
+
+def parse_shards(spec: str, default_sheet: str) -> List[ShardLocation]:
+    """Parse PROGRESS_SHARDS.
+
+    "" keeps the single default tab, a number N means tabs
+    "<default>_0" .. "<default>_<N-1>", and anything else is a comma-separated
+    list of tabs, each optionally prefixed with "<spreadsheet_id>:".
+    """
+    spec = spec.strip()
+    if not spec:
+        return [(None, default_sheet)]
+    if spec.isdigit():
+        return [(None, f"{default_sheet}_{i}") for i in range(max(1, int(spec)))]
+    shards: List[ShardLocation] = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        spreadsheet_id, _, tab = item.rpartition(":")
+        shards.append((spreadsheet_id or None, tab))
+    return shards
+
+
+def shard_index(user_id: str, count: int) -> int:
+    """Stable shard number for a user (the same crc32 the dispatcher uses)."""
+    return zlib.crc32(str(user_id).encode()) % count
+
+
+class ShardedProgressRepository:
+    """Routes each user to one of several ProgressRepository shards.
+
+    Shards are separate tabs (possibly in other spreadsheets), each with its
+    own index loaded on first use, so a lookup, a tail refresh after a miss or
+    an append only touches the shard that owns the user. Routing depends on
+    the number and order of shards; run rebalance_progress.py after changing
+    PROGRESS_SHARDS.
+    """
+
+    def __init__(self, shards: List[ProgressRepository]) -> None:
+        if not shards:
+            raise ValueError("at least one progress shard is required")
+        self.shards = shards
+
+    def shard_for(self, user_id: str) -> ProgressRepository:
+        return self.shards[shard_index(user_id, len(self.shards))]
+
+    def _each(self, method: str) -> List[Any]:
+        """Call a method on every shard in parallel; shards load independently."""
+        results: List[Any] = [None] * len(self.shards)
+        errors: List[BaseException] = []
+
+        def run(i: int) -> None:
+            try:
+                results[i] = getattr(self.shards[i], method)()
+            except Exception as exc:  # noqa: BLE001
+                errors.append(exc)
+
+        threads = [
+            threading.Thread(target=run, args=(i,), name=f"progress-shard-{i}", daemon=True)
+            for i in range(len(self.shards))
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        if errors:
+            raise errors[0]
+        return results
+
+    def ensure_loaded(self) -> None:
+        self._each("ensure_loaded")
+
+    def reload(self) -> None:
+        self._each("reload")
+
+    def get_progress(self, user_id: str) -> Optional[Dict[str, Any]]:
+        return self.shard_for(user_id).get_progress(user_id)
+
+    def is_linked(self, user_id: str, group_id: str) -> bool:
+        return self.shard_for(user_id).is_linked(user_id, group_id)
+
+    def upsert_progress(
+        self,
+        user_id: str,
+        username: str,
+        current_day: int,
+        last_read_at: Optional[str] = None,
+        group_ids: Optional[List[str]] = None,
+    ) -> None:
+        self.shard_for(user_id).upsert_progress(user_id, username, current_day, last_read_at, group_ids)
+
+    def add_group(self, user_id: str, username: str, group_id: str) -> bool:
+        return self.shard_for(user_id).add_group(user_id, username, group_id)
+
+    def list_progress(self) -> List[Dict[str, Any]]:
+        return [record for shard_records in self._each("list_progress") for record in shard_records]
+
+    def sync(self) -> Dict[str, Any]:
+        stats = self._each("sync")
+        return {
+            key: sum(s[key] for s in stats)
+            for key in ("rows_scanned", "rows_changed", "rows_pushed")
+        }
+
+    def start_sync(self, interval: float) -> None:
+        for shard in self.shards:
+            shard.start_sync(interval)
@@ -0,0 +1,75 @@
+import threading
+import time
+from typing import Dict, Tuple
+
+
+class TokenBucket:
+    """Thread-safe token bucket.
+
+    ``acquire`` takes a token even when none is left, driving the balance
+    negative; the caller then sleeps until its token would have been earned.
+    Concurrent callers therefore queue up in order instead of all retrying
+    at once.
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token; return how long to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self) -> float:
+        """Block until a token is available; returns the time slept."""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class TelegramRateLimiter:
+    """Telegram's send limits: a global rate plus per-chat rates.
+
+    Defaults follow the Bot API FAQ: ~30 messages/s overall, 1 message/s
+    to the same chat and 20 messages/min to the same group.
+    """
+
+    def __init__(
+        self,
+        global_rate: float = 30,
+        per_chat_rate: float = 1,
+        per_group_per_minute: float = 20,
+    ) -> None:
+        self.global_bucket = TokenBucket(global_rate, capacity=global_rate)
+        self.per_chat_rate = per_chat_rate
+        self.per_group_per_minute = per_group_per_minute
+        self._chats: Dict[str, Tuple[TokenBucket, TokenBucket]] = {}
+        self._lock = threading.Lock()
+
+    def _chat_buckets(self, chat_id: str) -> Tuple[TokenBucket, TokenBucket]:
+        with self._lock:
+            buckets = self._chats.get(chat_id)
+            if buckets is None:
+                buckets = (
+                    TokenBucket(self.per_chat_rate, capacity=1),
+                    TokenBucket(self.per_group_per_minute / 60.0, capacity=self.per_group_per_minute),
+                )
+                self._chats[chat_id] = buckets
+            return buckets
+
+    def acquire(self, chat_id: str) -> float:
+        """Block until one message may be sent to chat_id; returns the time slept."""
+        per_second, per_minute = self._chat_buckets(str(chat_id))
+        # Wait out the chat's own limits first so a busy chat does not hold
+        # global tokens it cannot use yet.
+        waited = per_second.acquire() + per_minute.acquire()
+        return waited + self.global_bucket.acquire()
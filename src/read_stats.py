@@ -0,0 +1,146 @@
+import datetime
+import heapq
+import json
+import logging
+import os
+import threading
+from typing import Dict, Any, List, Tuple
+
+
+class ReadStats:
+    """Per-group, per-day record of who tapped "✅ 아멘 / 읽음".
+
+    Each group keeps a set of user ids per local date, a running read count
+    per user, a running total and a display name per user, all updated in
+    place on every tap. "How many read today" and the total are O(1); only
+    the leaderboard looks at the group's own members. Nothing is read back from the logs
+    or progress sheets.
+
+    State is checkpointed as compact JSON (user ids as sorted lists) to
+    ``path`` every ``checkpoint_interval`` seconds when it changed, and on
+    close; it is loaded from there on startup. Day sets older than
+    ``retention_days`` are dropped; the running counts are kept.
+    """
+
+    def __init__(self, path: str, retention_days: int = 90, checkpoint_interval: float = 30) -> None:
+        self.path = path
+        self.retention_days = retention_days
+        self.checkpoint_interval = checkpoint_interval
+        # group_id -> {"days": {date: {user_id}}, "counts": {user_id: n}, "total": n, "names": {user_id: name}}
+        self._groups: Dict[str, Dict[str, Any]] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._load()
+        self._thread = threading.Thread(target=self._checkpoint_loop, name="read-stats-checkpoint", daemon=True)
+        self._thread.start()
+
+    def _group(self, group_id: str) -> Dict[str, Any]:
+        group = self._groups.get(group_id)
+        if group is None:
+            group = self._groups[group_id] = {"days": {}, "counts": {}, "total": 0, "names": {}}
+        return group
+
+    def record(self, group_id: str, user_id: str, name: str, date: datetime.date) -> bool:
+        """Count a read; False when the user already read in this group that day."""
+        day = date.isoformat()
+        with self._lock:
+            group = self._group(str(group_id))
+            readers = group["days"].get(day)
+            if readers is None:
+                readers = group["days"][day] = set()
+                self._prune(group, date)
+            if user_id in readers:
+                return False
+            readers.add(user_id)
+            group["counts"][user_id] = group["counts"].get(user_id, 0) + 1
+            group["total"] += 1
+            if name:
+                group["names"][user_id] = name
+            self._dirty = True
+            return True
+
+    def _prune(self, group: Dict[str, Any], today: datetime.date) -> None:
+        cutoff = (today - datetime.timedelta(days=self.retention_days)).isoformat()
+        for day in [d for d in group["days"] if d < cutoff]:
+            del group["days"][day]
+
+    def summary(self, group_id: str, date: datetime.date, top: int = 5) -> Dict[str, Any]:
+        """Today's readers, total reads and the top readers of a group."""
+        with self._lock:
+            group = self._groups.get(str(group_id))
+            if group is None:
+                return {"today": 0, "today_names": [], "total": 0, "leaders": []}
+            names = group["names"]
+            readers = group["days"].get(date.isoformat(), set())
+            leaders: List[Tuple[str, int]] = [
+                (names.get(uid, uid), n)
+                for uid, n in heapq.nlargest(top, group["counts"].items(), key=lambda item: item[1])
+            ]
+            return {
+                "today": len(readers),
+                "today_names": sorted(names.get(uid, uid) for uid in readers),
+                "total": group["total"],
+                "leaders": leaders,
+            }
+
+    # --- checkpoint ---------------------------------------------------------
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError):
+            logging.warning("Ignoring unreadable read stats checkpoint %s", self.path, exc_info=True)
+            return
+        for group_id, group in data.get("groups", {}).items():
+            counts = dict(group.get("counts", {}))
+            self._groups[group_id] = {
+                "days": {day: set(uids) for day, uids in group.get("days", {}).items()},
+                "counts": counts,
+                # Checkpoints written before the running total existed lack it.
+                "total": group.get("total", sum(counts.values())),
+                "names": dict(group.get("names", {})),
+            }
+        logging.info("Loaded read stats for %s groups from %s", len(self._groups), self.path)
+
+    def checkpoint(self) -> None:
+        """Write the aggregate to disk if it changed since the last checkpoint."""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {
+                "version": 1,
+                "groups": {
+                    group_id: {
+                        "days": {day: sorted(uids) for day, uids in group["days"].items()},
+                        "counts": group["counts"],
+                        "total": group["total"],
+                        "names": group["names"],
+                    }
+                    for group_id, group in self._groups.items()
+                },
+            }
+            payload = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+            self._dirty = False
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(payload)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            logging.warning("Failed to write read stats checkpoint %s", self.path, exc_info=True)
+            with self._lock:
+                self._dirty = True
+
+    def _checkpoint_loop(self) -> None:
+        while not self._stop.wait(self.checkpoint_interval):
+            self.checkpoint()
+
+    def close(self) -> None:
+        self._stop.set()
+        self._thread.join(timeout=5)
+        self.checkpoint()
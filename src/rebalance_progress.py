@@ -0,0 +1,127 @@
+"""Move progress rows to the shard that owns them (see progress_shards.py).
+
+Reads every shard in PROGRESS_SHARDS plus any --from tabs (e.g. the unsharded
+"progress" tab when sharding is first turned on), merges users that appear
+more than once and rewrites each shard with exactly the users routed to it;
+--from tabs are emptied. Every tab must already exist with its header row.
+Stop the bot first: its indexes hold row numbers. Without --apply the plan is
+only printed.
+
+    python src/rebalance_progress.py --from progress
+    python src/rebalance_progress.py --from progress --apply
+"""
+import argparse
+import logging
+from typing import Optional, Dict, Any, List
+
+import config
+from google_sheets_client import GoogleSheetsClient
+from progress_repository import ProgressRepository
+from progress_shards import ShardLocation, parse_shards, shard_index
+from retry import RetryPolicy
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(message)s",
+)
+
+# Ranges per values.batchUpdate request
+WRITE_CHUNK = 500
+
+
+def _client_for(clients: Dict[Optional[str], GoogleSheetsClient], spreadsheet_id: Optional[str]) -> GoogleSheetsClient:
+    if spreadsheet_id not in clients:
+        clients[spreadsheet_id] = GoogleSheetsClient(
+            spreadsheet_id=spreadsheet_id or config.SPREADSHEET_ID,
+            credentials_file=config.service_account_file(),
+            retry_policy=RetryPolicy(
+                max_attempts=config.RETRY_MAX_ATTEMPTS,
+                base_delay=config.RETRY_BASE_DELAY,
+                max_delay=config.RETRY_MAX_DELAY,
+                deadline=config.SHEETS_CALL_DEADLINE,
+            ),
+        )
+    return clients[spreadsheet_id]
+
+
+def read_tab(client: GoogleSheetsClient, tab: str) -> List[List[Any]]:
+    """Data rows of a tab; raises when even the header cannot be read."""
+    rows = client.get_values(f"{tab}!A1:E")
+    if not rows:
+        raise RuntimeError(f"Tab '{tab}' is missing or unreadable; create it with a header row first")
+    return rows[1:]
+
+
+def merge(record: Dict[str, Any], other: Dict[str, Any]) -> Dict[str, Any]:
+    """Combine two rows of the same user: furthest progress wins, groups are unioned."""
+    ahead, behind = (record, other) if record["current_day"] >= other["current_day"] else (other, record)
+    group_ids = list(ahead["group_ids"])
+    group_ids += [g for g in behind["group_ids"] if g not in group_ids]
+    return dict(ahead, username=ahead["username"] or behind["username"], group_ids=group_ids)
+
+
+def plan_rebalance(tabs: Dict[ShardLocation, List[List[Any]]], shards: List[ShardLocation]) -> Dict[ShardLocation, List[List[Any]]]:
+    """New rows for every tab: each shard gets its users, other tabs end up empty."""
+    users: Dict[str, Dict[str, Any]] = {}
+    for rows in tabs.values():
+        for row in rows:
+            if not row or not str(row[0]).strip():
+                continue
+            record = ProgressRepository._parse_row(0, row)
+            existing = users.get(record["user_id"])
+            users[record["user_id"]] = merge(existing, record) if existing else record
+    target: Dict[ShardLocation, List[List[Any]]] = {location: [] for location in tabs}
+    for user_id, record in users.items():
+        target[shards[shard_index(user_id, len(shards))]].append(ProgressRepository._values(record))
+    return target
+
+
+def write_tab(client: GoogleSheetsClient, tab: str, rows: List[List[Any]], old_count: int) -> None:
+    """Overwrite a tab's data rows, blanking rows left over from before."""
+    data: Dict[str, List[Any]] = {f"{tab}!A{i}:E{i}": row for i, row in enumerate(rows, start=2)}
+    for i in range(len(rows) + 2, old_count + 2):
+        data[f"{tab}!A{i}:E{i}"] = ["", "", "", "", ""]
+    items = list(data.items())
+    for start in range(0, len(items), WRITE_CHUNK):
+        client.batch_update(dict(items[start:start + WRITE_CHUNK]))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--from", dest="sources", action="append", default=[], metavar="TAB",
+        help="extra tab to drain, optionally '<spreadsheet_id>:<tab>' (repeatable)",
+    )
+    parser.add_argument("--apply", action="store_true", help="write the changes (default: dry run)")
+    args = parser.parse_args()
+
+    shards = parse_shards(config.PROGRESS_SHARDS, config.PROGRESS_SHEET_NAME)
+    locations = list(shards)
+    for source in parse_shards(",".join(args.sources), config.PROGRESS_SHEET_NAME) if args.sources else []:
+        if source not in locations:
+            locations.append(source)
+
+    clients: Dict[Optional[str], GoogleSheetsClient] = {}
+    tabs = {location: read_tab(_client_for(clients, location[0]), location[1]) for location in locations}
+    target = plan_rebalance(tabs, shards)
+
+    for location in locations:
+        current = {str(r[0]).strip() for r in tabs[location] if r and str(r[0]).strip()}
+        wanted = {str(r[0]) for r in target[location]}
+        logging.info(
+            "%s%s: %s users -> %s users (+%s, -%s)",
+            f"{location[0]}:" if location[0] else "", location[1],
+            len(current), len(wanted), len(wanted - current), len(current - wanted),
+        )
+    if not args.apply:
+        logging.info("Dry run; pass --apply to write")
+        return
+
+    # Fill the shards before draining the sources, so no user is ever missing.
+    for location in sorted(locations, key=lambda loc: loc not in shards):
+        write_tab(_client_for(clients, location[0]), location[1], target[location], len(tabs[location]))
+        logging.info("Wrote %s", location[1])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import logging
+import random
+import threading
+import time
+from typing import Callable, Optional, Dict, Any, TypeVar
+
+import metrics
+
+T = TypeVar("T")
+
+# Returns None when the outcome is final, or a delay hint in seconds when
+# the call should be retried (0 means "use the policy's backoff").
+RetryClassifier = Callable[[Any], Optional[float]]
+
+
+class RetryPolicy:
+    """Capped exponential backoff with full jitter and an overall deadline."""
+
+    def __init__(
+        self,
+        max_attempts: int = 5,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+        deadline: float = 120.0,
+    ) -> None:
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+
+class RetryStats:
+    """Per-operation attempt/retry counters, safe to share between threads.
+
+    Every increment is also recorded as the ``retry_<field>_total{op}``
+    counter in the metrics registry, so /metrics shows them.
+    """
+
+    FIELDS = ("calls", "attempts", "retries", "giveups")
+
+    def __init__(self) -> None:
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def incr(self, name: str, field: str) -> None:
+        with self._lock:
+            counts = self._counts.setdefault(name, dict.fromkeys(self.FIELDS, 0))
+            counts[field] += 1
+        metrics.registry.inc(f"retry_{field}_total", op=name)
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {name: dict(counts) for name, counts in self._counts.items()}
+
+
+stats = RetryStats()
+
+
+def call_with_retry(
+    name: str,
+    fn: Callable[[], T],
+    policy: RetryPolicy,
+    classify: RetryClassifier,
+) -> T:
+    """Call fn until classify says the outcome is final, the attempts run out
+    or the next wait would pass the policy deadline.
+
+    classify receives either fn's return value or the exception it raised.
+    When retrying stops, the last exception is re-raised or the last return
+    value is returned as-is (e.g. a 429 response for the caller to report).
+    Waiting only blocks the calling thread.
+    """
+    started = time.monotonic()
+    attempt = 0
+    stats.incr(name, "calls")
+    while True:
+        attempt += 1
+        stats.incr(name, "attempts")
+        error: Optional[BaseException] = None
+        result: Any = None
+        try:
+            result = fn()
+        except Exception as exc:  # noqa: BLE001
+            error = exc
+        hint = classify(error if error is not None else result)
+        if hint is None:
+            if error is not None:
+                raise error
+            return result
+
+        delay = hint if hint > 0 else policy.backoff(attempt)
+        if attempt >= policy.max_attempts or time.monotonic() - started + delay > policy.deadline:
+            stats.incr(name, "giveups")
+            logging.warning("%s: giving up after %s attempts", name, attempt)
+            if error is not None:
+                raise error
+            return result
+
+        stats.incr(name, "retries")
+        logging.info("%s: attempt %s failed, retrying in %.2fs", name, attempt, delay)
+        time.sleep(delay)
@@ -0,0 +1,105 @@
+import datetime
+import os
+import sqlite3
+import threading
+from typing import Optional, Any, Dict
+
+SENDING = "sending"
+SENT = "sent"
+
+
+class SentLedger:
+    """Durable record of which group got which day's broadcast.
+
+    Rows are keyed by (chat_id, thread_id, local_date, day), so checking a
+    group is a single primary-key lookup. Before sending, the broadcaster
+    claims the key with an ``INSERT OR IGNORE`` in the "sending" state and
+    only sends when its insert won; the row becomes "sent" once Telegram
+    accepted the message and is deleted again if the send failed. Two
+    overlapping runs (cron overlap, FORCE_SEND, or a restart after a crash)
+    therefore never post to the same group twice. A claim left behind by a
+    run that died mid-send can be taken over after ``claim_timeout`` seconds.
+    """
+
+    def __init__(self, path: str, claim_timeout: float = 600, busy_timeout: float = 30) -> None:
+        self.path = path
+        self.claim_timeout = claim_timeout
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=busy_timeout, check_same_thread=False, isolation_level=None)
+        self._conn.execute(f"PRAGMA busy_timeout={int(busy_timeout * 1000)}")
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sent (
+                chat_id TEXT NOT NULL,
+                thread_id INTEGER NOT NULL,
+                local_date TEXT NOT NULL,
+                day INTEGER NOT NULL,
+                sent_at TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'sent',
+                PRIMARY KEY (chat_id, thread_id, local_date, day)
+            )
+            """
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(sent)")}
+        if "status" not in columns:
+            # Ledgers created before claims existed only hold finished sends.
+            self._conn.execute("ALTER TABLE sent ADD COLUMN status TEXT NOT NULL DEFAULT 'sent'")
+
+    @staticmethod
+    def _key(job: Dict[str, Any]) -> tuple:
+        # SQLite treats NULLs as distinct in a primary key, so "no topic" is 0.
+        return (str(job["chat_id"]), job.get("thread_id") or 0, job["local_date"], job["day"])
+
+    @staticmethod
+    def _stamp(at: Optional[datetime.datetime] = None) -> str:
+        return (at or datetime.datetime.now(datetime.timezone.utc)).isoformat()
+
+    def was_sent(self, job: Dict[str, Any]) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM sent WHERE chat_id=? AND thread_id=? AND local_date=? AND day=? AND status=?",
+                self._key(job) + (SENT,),
+            ).fetchone()
+        return row is not None
+
+    def claim(self, job: Dict[str, Any], now: Optional[datetime.datetime] = None) -> bool:
+        """Reserve the job for this run; False when it is sent or being sent elsewhere."""
+        now = now or datetime.datetime.now(datetime.timezone.utc)
+        stale = self._stamp(now - datetime.timedelta(seconds=self.claim_timeout))
+        key = self._key(job)
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT OR IGNORE INTO sent (chat_id, thread_id, local_date, day, sent_at, status) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                key + (self._stamp(now), SENDING),
+            )
+            if cur.rowcount == 1:
+                return True
+            cur = self._conn.execute(
+                "UPDATE sent SET sent_at=? WHERE chat_id=? AND thread_id=? AND local_date=? AND day=? "
+                "AND status=? AND sent_at<?",
+                (self._stamp(now),) + key + (SENDING, stale),
+            )
+            return cur.rowcount == 1
+
+    def mark_sent(self, job: Dict[str, Any], sent_at: Optional[datetime.datetime] = None) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE sent SET status=?, sent_at=? WHERE chat_id=? AND thread_id=? AND local_date=? AND day=?",
+                (SENT, self._stamp(sent_at)) + self._key(job),
+            )
+
+    def release(self, job: Dict[str, Any]) -> None:
+        """Drop this run's claim after a failed send so a later run can retry."""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM sent WHERE chat_id=? AND thread_id=? AND local_date=? AND day=? AND status=?",
+                self._key(job) + (SENDING,),
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
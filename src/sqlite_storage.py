@@ -0,0 +1,513 @@
+"""SQLite implementations of the plan/progress/group/log repositories.
+
+With ``STORAGE_BACKEND=sqlite`` the bot reads and writes a local SQLite
+database (WAL mode, one indexed table per repository) instead of calling
+Google Sheets on the request path. Sheets becomes an optional mirror:
+
+- plans are still edited by humans in Sheets, so each plan sheet is copied
+  into SQLite and revalidated in the background (like the disk snapshots
+  of PlanRepository);
+- progress, groups and logs are written to SQLite first and replayed onto
+  their sheets by a background SheetsMirror.
+
+On first start with an empty database, progress and groups are imported
+from their sheets. Without a sheets client everything runs locally, which
+also makes the repositories usable without Google credentials.
+"""
+import datetime
+import json
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Callable, Hashable
+
+from google_sheets_client import GoogleSheetsClient
+from group_repository import GroupRepository
+from plan_repository import PlanRepository
+from progress_repository import ProgressRepository
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS plan_snapshots (
+    sheet TEXT PRIMARY KEY,
+    version TEXT NOT NULL,
+    rows TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS progress (
+    user_id TEXT PRIMARY KEY,
+    username TEXT NOT NULL DEFAULT '',
+    current_day INTEGER NOT NULL DEFAULT 1,
+    last_read_at TEXT NOT NULL DEFAULT '',
+    group_ids TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS groups (
+    chat_id TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    plan_sheet TEXT,
+    start_date TEXT,
+    timezone TEXT,
+    notification_time TEXT NOT NULL DEFAULT '08:00'
+);
+CREATE TABLE IF NOT EXISTS logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    row TEXT NOT NULL,
+    mirrored INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS logs_unmirrored ON logs (mirrored, id);
+"""
+
+
+class SqliteStore:
+    """One shared connection; statements are serialized by a lock."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def execute(self, sql: str, params: tuple = ()) -> List[sqlite3.Row]:
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def executemany(self, sql: str, rows: List[tuple]) -> None:
+        with self.lock:
+            self.conn.execute("BEGIN")
+            try:
+                self.conn.executemany(sql, rows)
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    def close(self) -> None:
+        with self.lock:
+            self.conn.close()
+
+
+class SheetsMirror:
+    """Replays local writes onto Google Sheets from a background thread.
+
+    Jobs are keyed; a newer job for the same key replaces one that has not
+    run yet, so only the latest state of a record is pushed. A failed job
+    is retried on the next pass unless it was superseded meanwhile.
+    """
+
+    def __init__(self, interval: float = 2.0) -> None:
+        self.interval = interval
+        self._pending: "OrderedDict[Hashable, Callable[[], None]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._loop, name="sheets-mirror", daemon=True)
+        self._thread.start()
+
+    def submit(self, key: Hashable, job: Callable[[], None]) -> None:
+        with self._lock:
+            self._pending.pop(key, None)
+            self._pending[key] = job
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def _loop(self) -> None:
+        while not self._closed:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self) -> None:
+        with self._flush_lock:
+            with self._lock:
+                jobs = list(self._pending.items())
+                self._pending.clear()
+            for key, job in jobs:
+                try:
+                    job()
+                except Exception:
+                    logging.warning("Sheets mirror job %s failed; will retry", key, exc_info=True)
+                    with self._lock:
+                        self._pending.setdefault(key, job)
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._thread.join(timeout=self.interval + 5)
+        self.flush()
+
+
+class SqlitePlanRepository(PlanRepository):
+    """PlanRepository whose snapshot lives in SQLite instead of a JSON file."""
+
+    def __init__(self, store: SqliteStore, sheets_client: Optional[GoogleSheetsClient], sheet_name: str) -> None:
+        self.store = store
+        super().__init__(sheets_client, sheet_name, preload=False)  # type: ignore[arg-type]
+
+    def _load_snapshot(self) -> bool:
+        rows = self.store.execute("SELECT version, rows FROM plan_snapshots WHERE sheet=?", (self.sheet_name,))
+        if not rows:
+            return False
+        self._apply(json.loads(rows[0]["rows"]), rows[0]["version"])
+        return True
+
+    def _save_snapshot(self, rows: List[List[Any]], version: str) -> None:
+        self.store.execute(
+            "INSERT OR REPLACE INTO plan_snapshots (sheet, version, rows) VALUES (?, ?, ?)",
+            (self.sheet_name, version, json.dumps(rows, ensure_ascii=False)),
+        )
+
+    def reload(self) -> None:
+        if self.sheets_client is None:
+            if not self._load_snapshot():
+                logging.warning("Plan '%s' is not in the local database and there is no Sheets mirror", self.sheet_name)
+            self._loaded = True
+            return
+        super().reload()
+
+
+class SqliteProgressRepository:
+    """Progress table keyed by user_id; same interface as ProgressRepository."""
+
+    def __init__(
+        self,
+        store: SqliteStore,
+        mirror_repo: Optional[ProgressRepository] = None,
+        mirror: Optional[SheetsMirror] = None,
+    ) -> None:
+        self.store = store
+        self.mirror_repo = mirror_repo
+        self.mirror = mirror
+
+    def import_from(self, source: ProgressRepository) -> int:
+        records = source.list_progress()
+        self.store.executemany(
+            "INSERT OR IGNORE INTO progress (user_id, username, current_day, last_read_at, group_ids) VALUES (?, ?, ?, ?, ?)",
+            [self._values(r) for r in records],
+        )
+        return len(records)
+
+    def is_empty(self) -> bool:
+        return not self.store.execute("SELECT 1 FROM progress LIMIT 1")
+
+    def reload(self) -> None:
+        """Nothing to reload; the local table is authoritative."""
+
+    def ensure_loaded(self) -> None:
+        pass
+
+    @staticmethod
+    def _values(record: Dict[str, Any]) -> tuple:
+        return (
+            record["user_id"],
+            record["username"] or "",
+            record["current_day"],
+            record["last_read_at"] or "",
+            ",".join(record["group_ids"]),
+        )
+
+    def get_progress(self, user_id: str) -> Optional[Dict[str, Any]]:
+        rows = self.store.execute("SELECT * FROM progress WHERE user_id=?", (str(user_id),))
+        if not rows:
+            return None
+        row = rows[0]
+        return {
+            "row_index": None,
+            "user_id": row["user_id"],
+            "username": row["username"],
+            "current_day": row["current_day"],
+            "last_read_at": row["last_read_at"],
+            "group_ids": [g for g in row["group_ids"].split(",") if g],
+        }
+
+    def is_linked(self, user_id: str, group_id: str) -> bool:
+        progress = self.get_progress(user_id)
+        return progress is not None and group_id in progress["group_ids"]
+
+    def upsert_progress(
+        self,
+        user_id: str,
+        username: str,
+        current_day: int,
+        last_read_at: Optional[str] = None,
+        group_ids: Optional[List[str]] = None,
+    ) -> None:
+        last_read_at = last_read_at or datetime.date.today().isoformat()
+        with self.store.lock:
+            if group_ids is None:
+                existing = self.get_progress(user_id)
+                group_ids = existing["group_ids"] if existing else []
+            self._save({
+                "user_id": str(user_id),
+                "username": username or "",
+                "current_day": current_day,
+                "last_read_at": last_read_at,
+                "group_ids": list(group_ids),
+            })
+
+    def add_group(self, user_id: str, username: str, group_id: str) -> bool:
+        """Link the user to a group, keeping their progress; False if already linked."""
+        with self.store.lock:
+            existing = self.get_progress(user_id)
+            if existing is not None and group_id in existing["group_ids"]:
+                return False
+            if existing is None:
+                existing = {"username": "", "current_day": 1, "last_read_at": "", "group_ids": []}
+            self._save({
+                "user_id": str(user_id),
+                "username": username or existing["username"],
+                "current_day": existing["current_day"],
+                "last_read_at": existing["last_read_at"],
+                "group_ids": existing["group_ids"] + [group_id],
+            })
+        return True
+
+    def _save(self, record: Dict[str, Any]) -> None:
+        self.store.execute(
+            """
+            INSERT INTO progress (user_id, username, current_day, last_read_at, group_ids) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET username=excluded.username, current_day=excluded.current_day,
+                last_read_at=excluded.last_read_at, group_ids=excluded.group_ids
+            """,
+            self._values(record),
+        )
+        if self.mirror is not None and self.mirror_repo is not None:
+            mirror_repo = self.mirror_repo
+            self.mirror.submit(("progress", record["user_id"]), lambda: mirror_repo.upsert_progress(**record))
+
+
+class SqliteGroupRepository:
+    """Groups table keyed by chat_id; same interface as GroupRepository."""
+
+    def __init__(
+        self,
+        store: SqliteStore,
+        mirror_repo: Optional[GroupRepository] = None,
+        mirror: Optional[SheetsMirror] = None,
+    ) -> None:
+        self.store = store
+        self.mirror_repo = mirror_repo
+        self.mirror = mirror
+
+    def import_from(self, source: GroupRepository) -> int:
+        groups = source.list_groups()
+        self.store.executemany(
+            "INSERT OR IGNORE INTO groups (chat_id, position, plan_sheet, start_date, timezone, notification_time)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            [self._values(g, position) for position, g in enumerate(groups)],
+        )
+        return len(groups)
+
+    def is_empty(self) -> bool:
+        return not self.store.execute("SELECT 1 FROM groups LIMIT 1")
+
+    def reload(self) -> None:
+        """Nothing to reload; the local table is authoritative."""
+
+    @staticmethod
+    def _values(group: Dict[str, Any], position: int) -> tuple:
+        start_date = group.get("start_date")
+        return (
+            str(group["chat_id"]),
+            position,
+            group.get("plan_sheet") or None,
+            start_date.isoformat() if start_date else None,
+            group.get("timezone") or None,
+            group.get("notification_time") or "08:00",
+        )
+
+    @staticmethod
+    def _record(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "chat_id": row["chat_id"],
+            "plan_sheet": row["plan_sheet"],
+            "start_date": GroupRepository._parse_date(row["start_date"]) if row["start_date"] else None,
+            "timezone": row["timezone"],
+            "notification_time": row["notification_time"],
+        }
+
+    def list_groups(self) -> List[Dict[str, Any]]:
+        return [self._record(row) for row in self.store.execute("SELECT * FROM groups ORDER BY position")]
+
+    def get_group(self, chat_id: str) -> Optional[Dict[str, Any]]:
+        rows = self.store.execute("SELECT * FROM groups WHERE chat_id=?", (str(chat_id),))
+        return self._record(rows[0]) if rows else None
+
+    def find_by_chat(self, chat_id: str, thread_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Group registered for a Telegram chat: its topic, the chat itself, then any of its topics."""
+        chat = str(chat_id)
+        topic = f"{chat}_{thread_id}" if thread_id is not None else ""
+        rows = self.store.execute(
+            "SELECT * FROM groups WHERE chat_id IN (?, ?) OR chat_id LIKE ? ESCAPE '\\'"
+            " ORDER BY chat_id<>?, chat_id<>?, position LIMIT 1",
+            (topic, chat, chat + "\\_%", topic, chat),
+        )
+        return self._record(rows[0]) if rows else None
+
+    def _mirror(self, chat_id: str) -> None:
+        if self.mirror is None or self.mirror_repo is None:
+            return
+        mirror_repo = self.mirror_repo
+
+        def push() -> None:
+            group = self.get_group(chat_id)
+            if group is None:
+                return
+            if mirror_repo.get_group(chat_id) is None:
+                mirror_repo.append_group(
+                    chat_id, group["plan_sheet"], group["start_date"], group["timezone"], group["notification_time"]
+                )
+                return
+            if group["start_date"]:
+                mirror_repo.update_start_date(chat_id, group["start_date"])
+            mirror_repo.update_notification_time(chat_id, group["notification_time"])
+
+        self.mirror.submit(("group", chat_id), push)
+
+    def append_group(
+        self,
+        chat_id: str,
+        plan_sheet: Optional[str],
+        start_date: Optional[datetime.date],
+        timezone: Optional[str],
+        notification_time: str = "08:00",
+    ) -> None:
+        group = {
+            "chat_id": str(chat_id).strip(),
+            "plan_sheet": plan_sheet,
+            "start_date": start_date,
+            "timezone": timezone,
+            "notification_time": notification_time,
+        }
+        with self.store.lock:
+            position = self.store.execute("SELECT COALESCE(MAX(position), -1) + 1 FROM groups")[0][0]
+            self.store.execute(
+                "INSERT OR REPLACE INTO groups (chat_id, position, plan_sheet, start_date, timezone, notification_time)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                self._values(group, position),
+            )
+        self._mirror(group["chat_id"])
+
+    def _update(self, chat_id: str, column: str, value: str) -> bool:
+        with self.store.lock:
+            self.store.execute(f"UPDATE groups SET {column}=? WHERE chat_id=?", (value, str(chat_id)))
+            changed = self.store.execute("SELECT changes()")[0][0]
+        if changed:
+            self._mirror(str(chat_id))
+        return bool(changed)
+
+    def update_start_date(self, chat_id: str, new_date: datetime.date) -> bool:
+        return self._update(chat_id, "start_date", new_date.isoformat())
+
+    def update_notification_time(self, chat_id: str, new_time: str) -> bool:
+        return self._update(chat_id, "notification_time", new_time)
+
+
+class SqliteLogRepository:
+    """Log table; rows are mirrored to the log sheet in chunks when enabled."""
+
+    def __init__(
+        self,
+        store: SqliteStore,
+        sheets_client: Optional[GoogleSheetsClient] = None,
+        sheet_name: str = "",
+        mirror: Optional[SheetsMirror] = None,
+        chunk_size: int = 100,
+    ) -> None:
+        self.store = store
+        self.sheets_client = sheets_client
+        self.sheet_name = sheet_name
+        self.mirror = mirror
+        self.chunk_size = chunk_size
+        self.stats: Dict[str, int] = {"queued": 0, "written": 0, "dropped": 0, "spilled": 0}
+        self._schedule_mirror()
+
+    def append_log(
+        self,
+        chat_id: str,
+        chat_type: str,
+        username: str,
+        command: str,
+        status: str,
+        note: Optional[str] = "",
+    ) -> None:
+        ts = datetime.datetime.utcnow().isoformat()
+        row = [ts, chat_id, chat_type, username or "", command, status, note or ""]
+        self.store.execute("INSERT INTO logs (row) VALUES (?)", (json.dumps(row, ensure_ascii=False),))
+        self.stats["queued"] += 1
+        self._schedule_mirror()
+
+    def pending(self) -> int:
+        return self.store.execute("SELECT COUNT(*) FROM logs WHERE mirrored=0")[0][0]
+
+    def _schedule_mirror(self) -> None:
+        if self.mirror is not None and self.sheets_client is not None:
+            self.mirror.submit(("logs",), self._push)
+
+    def _push(self) -> None:
+        """Append unmirrored rows to the log sheet, oldest first."""
+        assert self.sheets_client is not None
+        while True:
+            rows = self.store.execute(
+                "SELECT id, row FROM logs WHERE mirrored=0 ORDER BY id LIMIT ?", (self.chunk_size,)
+            )
+            if not rows:
+                return
+            self.sheets_client.append_rows(f"{self.sheet_name}!A:F", [json.loads(r["row"]) for r in rows])
+            self.store.execute("UPDATE logs SET mirrored=1 WHERE mirrored=0 AND id<=?", (rows[-1]["id"],))
+            self.stats["written"] += len(rows)
+
+    def flush(self) -> None:
+        if self.mirror is not None:
+            self.mirror.flush()
+
+    def close(self) -> None:
+        self.flush()
+
+
+class SqliteStorage:
+    """Opens the database and builds the four SQLite repositories."""
+
+    def __init__(
+        self,
+        path: str,
+        sheets_client: Optional[GoogleSheetsClient] = None,
+        mirror_interval: float = 2.0,
+    ) -> None:
+        self.store = SqliteStore(path)
+        self.sheets_client = sheets_client
+        self.mirror = SheetsMirror(mirror_interval) if sheets_client is not None else None
+
+    def plan_repository(self, sheet_name: str) -> SqlitePlanRepository:
+        return SqlitePlanRepository(self.store, self.sheets_client, sheet_name)
+
+    def progress_repository(self, sheet_name: str) -> SqliteProgressRepository:
+        sheet_repo = ProgressRepository(self.sheets_client, sheet_name) if self.sheets_client else None
+        repo = SqliteProgressRepository(self.store, sheet_repo, self.mirror)
+        if sheet_repo is not None and repo.is_empty():
+            logging.info("Imported %s progress rows from Sheets", repo.import_from(sheet_repo))
+        return repo
+
+    def group_repository(self, sheet_name: str) -> SqliteGroupRepository:
+        sheet_repo = GroupRepository(self.sheets_client, sheet_name) if self.sheets_client else None
+        repo = SqliteGroupRepository(self.store, sheet_repo, self.mirror)
+        if sheet_repo is not None and repo.is_empty():
+            logging.info("Imported %s groups from Sheets", repo.import_from(sheet_repo))
+        return repo
+
+    def log_repository(self, sheet_name: str) -> SqliteLogRepository:
+        return SqliteLogRepository(self.store, self.sheets_client, sheet_name, self.mirror)
+
+    def close(self) -> None:
+        if self.mirror is not None:
+            self.mirror.close()
+        self.store.close()
@@ -0,0 +1,152 @@
+import threading
+import time
+from typing import Optional, Dict, Any, Callable, FrozenSet
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import config
+import metrics
+from retry import RetryPolicy, call_with_retry
+
+# Calls that are pointless to repeat: the long poll retries by itself, and a
+# late typing indicator or callback answer is worse than none.
+NO_RETRY_METHODS: FrozenSet[str] = frozenset({"getUpdates", "sendChatAction", "answerCallbackQuery"})
+
+
+def _parse_method_timeouts(spec: str) -> Dict[str, float]:
+    """Parse 'sendPhoto=25,getMe=5' into {'sendPhoto': 25.0, 'getMe': 5.0}."""
+    timeouts: Dict[str, float] = {}
+    for item in spec.split(","):
+        if "=" in item:
+            method, value = item.split("=", 1)
+            timeouts[method.strip()] = float(value)
+    return timeouts
+
+
+def classify_telegram_outcome(outcome: Any) -> Optional[float]:
+    """Retry 429 (after parameters.retry_after), 5xx and failed connections."""
+    if isinstance(outcome, requests.exceptions.ConnectionError):
+        return 0.0
+    if isinstance(outcome, BaseException):
+        # Read timeouts included: the request may already have been delivered.
+        return None
+    if outcome.status_code == 429:
+        try:
+            return float(outcome.json().get("parameters", {}).get("retry_after", 0))
+        except ValueError:
+            return 0.0
+    if outcome.status_code >= 500:
+        return 0.0
+    return None
+
+
+class TelegramClient:
+    """Pooled, keep-alive HTTP client for the Telegram Bot API.
+
+    All calls share one ``requests.Session``, so connections to
+    api.telegram.org are reused instead of paying a TCP+TLS handshake per
+    call. ``pool_size`` caps the connections kept open (match it to the
+    number of threads sending concurrently). Timeouts can be set per Bot API
+    method; anything not listed uses ``default_timeout``.
+
+    With a ``retry_policy`` every method except NO_RETRY_METHODS is retried
+    on 429/5xx/connection errors; the final response is returned either way,
+    so callers keep using ``raise_for_status``.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        pool_size: int = 10,
+        default_timeout: float = 15,
+        method_timeouts: Optional[Dict[str, float]] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+    ) -> None:
+        self.base_url = base_url
+        self.retry_policy = retry_policy
+        self.default_timeout = default_timeout
+        self.method_timeouts = method_timeouts or {}
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def timeout_for(self, method: str) -> float:
+        return self.method_timeouts.get(method, self.default_timeout)
+
+    def _send(
+        self,
+        send: Callable[..., requests.Response],
+        method: str,
+        timeout: Optional[float],
+        kwargs: Dict[str, Any],
+    ) -> requests.Response:
+        url = f"{self.base_url}/{method}"
+        timeout = timeout or self.timeout_for(method)
+        files = kwargs.get("files")
+
+        def attempt() -> requests.Response:
+            # Rewind uploads so a retried multipart request resends the whole file.
+            for f in (files or {}).values():
+                if hasattr(f, "seek"):
+                    f.seek(0)
+            return send(url, timeout=timeout, **kwargs)
+
+        started = time.perf_counter()
+        try:
+            if self.retry_policy is None or method in NO_RETRY_METHODS:
+                response = attempt()
+            else:
+                response = call_with_retry(f"telegram.{method}", attempt, self.retry_policy, classify_telegram_outcome)
+        except Exception as exc:
+            metrics.registry.inc("telegram_errors_total", method=method, error=type(exc).__name__)
+            raise
+        finally:
+            metrics.registry.observe("telegram_request_seconds", time.perf_counter() - started, method=method)
+        if response.status_code >= 400:
+            metrics.registry.inc("telegram_errors_total", method=method, error=str(response.status_code))
+        return response
+
+    def post(self, method: str, timeout: Optional[float] = None, **kwargs: Any) -> requests.Response:
+        """POST to a Bot API method; kwargs go to requests (json=, data=, files=)."""
+        return self._send(self.session.post, method, timeout, kwargs)
+
+    def get(self, method: str, timeout: Optional[float] = None, **kwargs: Any) -> requests.Response:
+        return self._send(self.session.get, method, timeout, kwargs)
+
+    def close(self) -> None:
+        self.session.close()
+
+
+_default_client: Optional[TelegramClient] = None
+_default_lock = threading.Lock()
+
+
+def get_client() -> TelegramClient:
+    """Return the process-wide client, creating it from config on first use."""
+    global _default_client
+    if _default_client is None:
+        with _default_lock:
+            if _default_client is None:
+                timeouts = {
+                    "sendPhoto": config.REQUEST_TIMEOUT + 10,
+                    "sendChatAction": 5,
+                    "answerCallbackQuery": 5,
+                    "setMessageReaction": 5,
+                    "getMe": 10,
+                }
+                timeouts.update(_parse_method_timeouts(config.TELEGRAM_METHOD_TIMEOUTS))
+                _default_client = TelegramClient(
+                    config.TELEGRAM_API_BASE_URL,
+                    pool_size=config.TELEGRAM_POOL_SIZE,
+                    default_timeout=config.REQUEST_TIMEOUT,
+                    method_timeouts=timeouts,
+                    retry_policy=RetryPolicy(
+                        max_attempts=config.RETRY_MAX_ATTEMPTS,
+                        base_delay=config.RETRY_BASE_DELAY,
+                        max_delay=config.RETRY_MAX_DELAY,
+                        deadline=config.TELEGRAM_SEND_DEADLINE,
+                    ),
+                )
+    return _default_client
@@ -0,0 +1,69 @@
+import logging
+import queue
+import threading
+import time
+import zlib
+from typing import Callable, List, Any, Tuple
+
+import metrics
+
+_STOP = object()
+
+
+class UpdateDispatcher:
+    """Fan updates out to a pool of worker threads, keyed by chat.
+
+    Each key is pinned to one worker (by a stable hash), so updates for the
+    same chat are handled in the order they were submitted while different
+    chats run in parallel. ``submit`` blocks when the target worker already
+    has ``queue_size`` updates waiting, which throttles the poller instead of
+    buffering without bound.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Any], None],
+        workers: int = 4,
+        queue_size: int = 1000,
+    ) -> None:
+        self.handler = handler
+        self._queues: List["queue.Queue[Tuple[float, Any]]"] = [queue.Queue(maxsize=queue_size) for _ in range(workers)]
+        self._threads = [
+            threading.Thread(target=self._run, args=(q,), name=f"update-worker-{i}", daemon=True)
+            for i, q in enumerate(self._queues)
+        ]
+        for t in self._threads:
+            t.start()
+
+    def submit(self, key: str, item: Any) -> None:
+        worker = zlib.crc32(str(key).encode()) % len(self._queues)
+        self._queues[worker].put((time.monotonic(), item))
+
+    def depth(self) -> int:
+        """Number of updates accepted but not yet picked up by a worker."""
+        return sum(q.qsize() for q in self._queues)
+
+    def join(self) -> None:
+        """Block until every submitted update has been handled."""
+        for q in self._queues:
+            q.join()
+
+    def close(self) -> None:
+        """Finish queued updates, then stop the workers."""
+        for q in self._queues:
+            q.put((0.0, _STOP))
+        for t in self._threads:
+            t.join()
+
+    def _run(self, q: "queue.Queue[Tuple[float, Any]]") -> None:
+        while True:
+            queued_at, item = q.get()
+            try:
+                if item is _STOP:
+                    return
+                metrics.registry.observe("bot_dispatcher_wait_seconds", time.monotonic() - queued_at)
+                self.handler(item)
+            except Exception as exc:  # noqa: BLE001
+                logging.error("Unhandled error in update worker: %s", exc, exc_info=True)
+            finally:
+                q.task_done()
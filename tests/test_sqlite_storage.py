@@ -0,0 +1,256 @@
+"""Contract tests for the SQLite repositories (see src/sqlite_storage.py).
+
+They run against a temporary database and an in-memory stand-in for
+GoogleSheetsClient, so neither a bot token nor Google credentials are
+needed; only the packages from requirements.txt must be installed:
+
+    python -m unittest discover -s tests
+"""
+import datetime
+import os
+import re
+import sys
+import tempfile
+import unittest
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+# config requires these at import time; nothing here talks to Telegram or Sheets.
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "test-token")
+os.environ.setdefault("SPREADSHEET_ID", "test-spreadsheet")
+
+from sqlite_storage import SqliteStorage  # noqa: E402
+
+
+class FakeSheetsClient:
+    """The subset of GoogleSheetsClient the repositories use, backed by lists."""
+
+    def __init__(self, sheets: Optional[Dict[str, List[List[Any]]]] = None) -> None:
+        self.sheets = sheets or {}
+
+    @staticmethod
+    def _parse(range_: str) -> tuple:
+        name, a1 = range_.split("!")
+        match = re.match(r"([A-Z]+)(\d*)(?::([A-Z]+)(\d*))?", a1)
+        first_col = ord(match.group(1)) - ord("A")
+        last_col = ord(match.group(3) or match.group(1)) - ord("A")
+        first_row = int(match.group(2) or 1)
+        last_row = int(match.group(4)) if match.group(4) else None
+        return name, first_col, last_col, first_row, last_row
+
+    def get_values(self, range_: str) -> List[List[Any]]:
+        name, first_col, last_col, first_row, last_row = self._parse(range_)
+        rows = [[str(v) for v in row[first_col:last_col + 1]] for row in self.sheets.get(name, [])]
+        rows = rows[first_row - 1:last_row]
+        while rows and not rows[-1]:
+            rows.pop()
+        return rows
+
+    def append_rows(self, range_: str, rows: List[List[Any]]) -> Optional[int]:
+        sheet = self.sheets.setdefault(range_.split("!")[0], [])
+        sheet.extend(list(row) for row in rows)
+        return len(sheet) - len(rows) + 1
+
+    def append_row(self, range_: str, row_values: List[Any], callback: Any = None) -> Optional[int]:
+        row_index = self.append_rows(range_, [row_values])
+        if callback:
+            callback(row_index)
+        return row_index
+
+    def update_row(self, range_: str, row_values: List[Any]) -> None:
+        name, first_col, _, first_row, _ = self._parse(range_)
+        sheet = self.sheets.setdefault(name, [])
+        while len(sheet) < first_row:
+            sheet.append([])
+        row = sheet[first_row - 1]
+        while len(row) < first_col + len(row_values):
+            row.append("")
+        row[first_col:first_col + len(row_values)] = list(row_values)
+
+    def batch_update(self, data: Dict[str, List[Any]]) -> None:
+        for range_, values in data.items():
+            self.update_row(range_, values)
+
+    def flush(self) -> None:
+        pass
+
+
+class SqliteRepositoryTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "bot.sqlite3")
+        self.storages: List[SqliteStorage] = []
+
+    def tearDown(self) -> None:
+        for storage in self.storages:
+            storage.close()
+        self.tmp.cleanup()
+
+    def open(self, sheets: Optional[FakeSheetsClient] = None) -> SqliteStorage:
+        storage = SqliteStorage(self.path, sheets, mirror_interval=60)
+        self.storages.append(storage)
+        return storage
+
+
+class ProgressRepositoryContract(SqliteRepositoryTestCase):
+    def test_unknown_user(self) -> None:
+        repo = self.open().progress_repository("progress")
+        self.assertIsNone(repo.get_progress("1"))
+        self.assertFalse(repo.is_linked("1", "-100"))
+
+    def test_upsert_and_read_back(self) -> None:
+        repo = self.open().progress_repository("progress")
+        repo.upsert_progress("1", "alice", 3, "2024-01-02", ["-100"])
+        record = repo.get_progress("1")
+        self.assertEqual(record["current_day"], 3)
+        self.assertEqual(record["username"], "alice")
+        self.assertEqual(record["last_read_at"], "2024-01-02")
+        self.assertEqual(record["group_ids"], ["-100"])
+        self.assertTrue(repo.is_linked("1", "-100"))
+
+    def test_upsert_without_groups_keeps_them(self) -> None:
+        repo = self.open().progress_repository("progress")
+        repo.upsert_progress("1", "alice", 1, group_ids=["-100", "-200"])
+        repo.upsert_progress("1", "alice", 2)
+        self.assertEqual(repo.get_progress("1")["group_ids"], ["-100", "-200"])
+        self.assertEqual(repo.get_progress("1")["current_day"], 2)
+
+    def test_add_group_keeps_progress(self) -> None:
+        repo = self.open().progress_repository("progress")
+        repo.upsert_progress("1", "alice", 7, "2024-01-02", ["-100"])
+        self.assertTrue(repo.add_group("1", "", "-200"))
+        self.assertFalse(repo.add_group("1", "", "-200"))
+        record = repo.get_progress("1")
+        self.assertEqual(record["current_day"], 7)
+        self.assertEqual(record["last_read_at"], "2024-01-02")
+        self.assertEqual(record["username"], "alice")
+        self.assertEqual(record["group_ids"], ["-100", "-200"])
+
+    def test_add_group_creates_user(self) -> None:
+        repo = self.open().progress_repository("progress")
+        self.assertTrue(repo.add_group("1", "alice", "-100"))
+        self.assertEqual(repo.get_progress("1")["current_day"], 1)
+        self.assertTrue(repo.is_linked("1", "-100"))
+
+    def test_survives_reopen(self) -> None:
+        storage = self.open()
+        storage.progress_repository("progress").upsert_progress("1", "alice", 5)
+        storage.close()
+        self.storages.remove(storage)
+        self.assertEqual(self.open().progress_repository("progress").get_progress("1")["current_day"], 5)
+
+    def test_imports_from_sheet_when_empty(self) -> None:
+        sheets = FakeSheetsClient({"progress": [
+            ["user_id", "username", "current_day", "last_read_at", "group_ids"],
+            ["1", "alice", "4", "2024-01-02", "-100"],
+        ]})
+        repo = self.open(sheets).progress_repository("progress")
+        self.assertEqual(repo.get_progress("1")["current_day"], 4)
+        self.assertTrue(repo.is_linked("1", "-100"))
+
+    def test_mirrors_writes_to_sheet(self) -> None:
+        sheets = FakeSheetsClient({"progress": [["user_id", "username", "current_day", "last_read_at", "group_ids"]]})
+        storage = self.open(sheets)
+        storage.progress_repository("progress").upsert_progress("1", "alice", 2, "2024-01-02")
+        storage.mirror.flush()
+        self.assertEqual(sheets.sheets["progress"][1][:3], ["1", "alice", 2])
+
+
+class GroupRepositoryContract(SqliteRepositoryTestCase):
+    def test_append_list_and_get(self) -> None:
+        repo = self.open().group_repository("groups")
+        repo.append_group("-100", "plan", datetime.date(2024, 1, 1), "Asia/Seoul", "07:30")
+        repo.append_group("-200", None, None, None)
+        self.assertEqual([g["chat_id"] for g in repo.list_groups()], ["-100", "-200"])
+        group = repo.get_group("-100")
+        self.assertEqual(group["plan_sheet"], "plan")
+        self.assertEqual(group["start_date"], datetime.date(2024, 1, 1))
+        self.assertEqual(group["timezone"], "Asia/Seoul")
+        self.assertEqual(group["notification_time"], "07:30")
+        self.assertEqual(repo.get_group("-200")["notification_time"], "08:00")
+        self.assertIsNone(repo.get_group("-300"))
+
+    def test_find_by_chat_resolves_topics(self) -> None:
+        repo = self.open().group_repository("groups")
+        repo.append_group("-100_7", None, None, "America/New_York")
+        repo.append_group("-200", None, None, "Asia/Seoul")
+        repo.append_group("-200_3", None, None, "Europe/Berlin")
+        self.assertEqual(repo.find_by_chat("-100")["chat_id"], "-100_7")
+        self.assertEqual(repo.find_by_chat("-100", 9)["chat_id"], "-100_7")
+        self.assertEqual(repo.find_by_chat("-200")["chat_id"], "-200")
+        self.assertEqual(repo.find_by_chat("-200", 3)["chat_id"], "-200_3")
+        self.assertIsNone(repo.find_by_chat("-10"))
+
+    def test_updates(self) -> None:
+        repo = self.open().group_repository("groups")
+        repo.append_group("-100", None, None, None)
+        self.assertTrue(repo.update_start_date("-100", datetime.date(2024, 2, 1)))
+        self.assertTrue(repo.update_notification_time("-100", "21:00"))
+        self.assertFalse(repo.update_notification_time("-300", "21:00"))
+        group = repo.get_group("-100")
+        self.assertEqual(group["start_date"], datetime.date(2024, 2, 1))
+        self.assertEqual(group["notification_time"], "21:00")
+
+    def test_imports_from_sheet_when_empty(self) -> None:
+        sheets = FakeSheetsClient({"groups": [
+            ["chat_id", "plan_sheet", "start_date", "timezone", "notification_time"],
+            ["-100", "plan", "2024-01-01", "Asia/Seoul", "07:30"],
+            ["-200"],
+        ]})
+        repo = self.open(sheets).group_repository("groups")
+        self.assertEqual([g["chat_id"] for g in repo.list_groups()], ["-100", "-200"])
+        self.assertEqual(repo.get_group("-100")["notification_time"], "07:30")
+
+    def test_does_not_reimport_into_a_filled_database(self) -> None:
+        self.open().group_repository("groups").append_group("-100", None, None, None)
+        sheets = FakeSheetsClient({"groups": [["chat_id"], ["-999"]]})
+        repo = self.open(sheets).group_repository("groups")
+        self.assertEqual([g["chat_id"] for g in repo.list_groups()], ["-100"])
+
+    def test_mirrors_new_group_to_sheet(self) -> None:
+        sheets = FakeSheetsClient({"groups": [["chat_id"], ["-100"]]})
+        storage = self.open(sheets)
+        storage.group_repository("groups").append_group("-200", None, None, None)
+        storage.mirror.flush()
+        self.assertEqual([row[0] for row in sheets.sheets["groups"][1:]], ["-100", "-200"])
+
+
+class LogRepositoryContract(SqliteRepositoryTestCase):
+    def test_rows_are_kept_locally_without_sheets(self) -> None:
+        repo = self.open().log_repository("log")
+        repo.append_log("1", "private", "alice", "/next", "ok")
+        repo.append_log("1", "private", "alice", "/status", "ok")
+        self.assertEqual(repo.pending(), 2)
+        self.assertEqual(repo.stats["queued"], 2)
+
+    def test_mirror_appends_in_order_once(self) -> None:
+        sheets = FakeSheetsClient({"log": []})
+        storage = self.open(sheets)
+        repo = storage.log_repository("log")
+        repo.append_log("1", "private", "alice", "/next", "ok")
+        repo.append_log("2", "group", "bob", "/ask", "error", "boom")
+        repo.flush()
+        repo.flush()
+        self.assertEqual([row[4] for row in sheets.sheets["log"]], ["/next", "/ask"])
+        self.assertEqual(repo.pending(), 0)
+        self.assertEqual(repo.stats["written"], 2)
+
+
+class PlanRepositoryContract(SqliteRepositoryTestCase):
+    PLAN = [["Day", "Ref"], ["1", "John 1:1-18"], ["2", "John 1:19-34"]]
+
+    def test_loads_from_sheet_and_keeps_a_local_copy(self) -> None:
+        sheets = FakeSheetsClient({"plan": [list(r) for r in self.PLAN]})
+        repo = self.open(sheets).plan_repository("plan")
+        self.assertEqual(repo.get_plan_by_day(2)["ref"], "John 1:19-34")
+        self.assertIsNone(repo.get_plan_by_day(3))
+        offline = self.open().plan_repository("plan")
+        self.assertEqual(offline.get_plan_by_day(1)["ref"], "John 1:1-18")
+
+    def test_missing_plan_without_sheets_is_empty(self) -> None:
+        repo = self.open().plan_repository("plan")
+        self.assertIsNone(repo.get_plan_by_day(1))
+
+
+if __name__ == "__main__":
+    unittest.main()